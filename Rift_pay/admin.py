@@ -1,10 +1,16 @@
+from datetime import datetime, timezone as dt_timezone
+
 from django.contrib import admin
 from django.db.models import Sum, Q
 from django.utils import timezone
 from .models import (
-    User, Transaction, Account, Card, BlockchainProof, SystemActivity,
-    NFCCard, NFCTerminal, NFCPaymentTransaction,
+    User, Transaction, Account, Card, BlockchainProof, BlockchainSyncOutbox, SystemActivity,
+    MobileMoneyTransaction, NFCCard, NFCTerminal, NFCPaymentTransaction, OutboundEmail,
 )
+from .services.audit import audit_buffer
+from .services.dashboard import invalidate_dashboard
+from .services.mobile_money_client import operator_breaker
+from .services.terminal_auth import invalidate_terminal_auth
 
 
 @admin.register(User)
@@ -85,6 +91,7 @@ class SystemActivityAdmin(admin.ModelAdmin):
 			'today_events': queryset.filter(created_at__date=today).count(),
 			'failed_events': queryset.filter(status='FAILED').count(),
 			'successful_events': queryset.filter(status='SUCCESS').count(),
+			'buffered_events': audit_buffer.depth,
 		}
 
 		extra_context = extra_context or {}
@@ -102,6 +109,55 @@ class BlockchainProofAdmin(admin.ModelAdmin):
 	list_per_page = 25
 
 
+@admin.register(BlockchainSyncOutbox)
+class BlockchainSyncOutboxAdmin(admin.ModelAdmin):
+	list_display = ('transaction', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at')
+	search_fields = ('transaction__id', 'last_error')
+	list_filter = ('status', 'created_at')
+	readonly_fields = ('transaction', 'created_at', 'updated_at')
+	list_per_page = 25
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+	list_display = ('to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at')
+	search_fields = ('to_email', 'last_error')
+	list_filter = ('status', 'created_at')
+	# The body may hold an OTP: never shown.
+	exclude = ('body',)
+	readonly_fields = ('to_email', 'subject', 'created_at', 'sent_at', 'expires_at')
+	list_per_page = 25
+
+
+@admin.register(MobileMoneyTransaction)
+class MobileMoneyTransactionAdmin(admin.ModelAdmin):
+	change_list_template = 'admin/Rift_pay/mobilemoneytransaction/change_list.html'
+	list_display = ('external_reference', 'user', 'operator', 'direction', 'amount', 'status', 'response_code', 'dispatched_at', 'created_at')
+	search_fields = ('external_reference', 'operator_reference', 'user__name', 'user__prenom', 'user__email')
+	list_filter = ('operator', 'direction', 'status', 'created_at')
+	date_hierarchy = 'created_at'
+	list_select_related = ('user',)
+	readonly_fields = ('customer_phone_hash', 'dispatched_at', 'processed_at', 'created_at', 'updated_at')
+	list_per_page = 30
+
+	def changelist_view(self, request, extra_context=None):
+		circuits = []
+		for operator, label in MobileMoneyTransaction.OPERATOR_CHOICES:
+			snapshot = operator_breaker(operator).snapshot()
+			retry_at = snapshot['retry_at']
+			circuits.append({
+				'label': label,
+				'state': snapshot['state'],
+				'failures': snapshot['failures'],
+				'retry_at': timezone.localtime(datetime.fromtimestamp(retry_at, tz=dt_timezone.utc)) if retry_at else None,
+			})
+
+		extra_context = extra_context or {}
+		extra_context['circuits'] = circuits
+		extra_context['pending_count'] = self.get_queryset(request).filter(status='PENDING').count()
+		return super().changelist_view(request, extra_context=extra_context)
+
+
 # ──────────────────────────────────────────────
 #  NFC Card Payment Admin
 # ──────────────────────────────────────────────
@@ -142,10 +198,12 @@ class NFCCardAdmin(admin.ModelAdmin):
 			if obj.status in ('VIRTUAL', 'ORDERED'):
 				obj.status = 'ACTIVE'
 		super().save_model(request, obj, form, change)
+		invalidate_dashboard(obj.user_id)
 
 	@admin.action(description='Reactivate selected blocked cards')
 	def reactivate_cards(self, request, queryset):
 		blocked = queryset.filter(status='BLOCKED')
+		invalidate_dashboard(*blocked.values_list('user_id', flat=True))
 		count = blocked.update(status='ACTIVE')
 		if count:
 			self.message_user(request, f'{count} NFC card(s) reactivated.')
@@ -156,6 +214,7 @@ class NFCCardAdmin(admin.ModelAdmin):
 	def link_and_activate(self, request, queryset):
 		"""Activate ordered cards that already have a card_uid set."""
 		eligible = queryset.filter(status__in=['VIRTUAL', 'ORDERED']).exclude(card_uid__isnull=True).exclude(card_uid='')
+		invalidate_dashboard(*eligible.values_list('user_id', flat=True))
 		count = eligible.update(status='ACTIVE', linked_at=timezone.now())
 		if count:
 			self.message_user(request, f'{count} card(s) activated.')
@@ -170,6 +229,12 @@ class NFCTerminalAdmin(admin.ModelAdmin):
 	list_filter = ('is_active', 'created_at')
 	list_per_page = 25
 
+	def save_model(self, request, obj, form, change):
+		"""Forget cached terminal credentials when the key or active flag changes."""
+		super().save_model(request, obj, form, change)
+		if change and {'api_key_hash', 'is_active'} & set(form.changed_data):
+			invalidate_terminal_auth(obj.terminal_id)
+
 
 @admin.register(NFCPaymentTransaction)
 class NFCPaymentTransactionAdmin(admin.ModelAdmin):
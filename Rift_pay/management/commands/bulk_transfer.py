@@ -0,0 +1,75 @@
+"""
+Management command to pay many recipients from one account (payroll).
+
+The batch file is CSV (header: lookup_type,recipient,amount[,reference]) or
+JSON (a list of objects with the same keys). Every line gets a result; lines
+that cannot be applied are reported and skipped.
+
+Usage:
+    python manage.py bulk_transfer --sender payroll@example.com salaries.csv
+    python manage.py bulk_transfer --sender payroll@example.com salaries.json --report results.csv
+"""
+
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Rift_pay.models import Account, User
+from Rift_pay.services.bulk_transfers import bulk_transfer, parse_batch, InvalidBatch, CSV_FIELDS
+from Rift_pay.services.transfers import AccountNotFound, InsufficientFunds
+from Rift_pay.views import generate_account_number
+
+
+class Command(BaseCommand):
+    help = 'Apply a CSV/JSON batch of transfers from one sender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch_file', help='CSV or JSON batch file')
+        parser.add_argument('--sender', required=True, help='Email of the paying user')
+        parser.add_argument('--format', choices=['csv', 'json'], default=None,
+                            help='Batch format (default: from the file extension)')
+        parser.add_argument('--report', default=None,
+                            help='Write the per-line results to this CSV file')
+
+    def handle(self, *args, **options):
+        path = Path(options['batch_file'])
+        fmt = options['format'] or ('json' if path.suffix.lower() == '.json' else 'csv')
+
+        sender = User.objects.filter(email=options['sender']).first()
+        if not sender:
+            raise CommandError(f"No user found with email: {options['sender']}")
+
+        try:
+            lines = parse_batch(path.read_text(encoding='utf-8-sig'), fmt)
+            results, balance = bulk_transfer(
+                sender,
+                lines,
+                open_account=lambda user: Account(user=user, number=generate_account_number()),
+            )
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        except InvalidBatch as exc:
+            raise CommandError(f'Invalid batch: {exc}')
+        except InsufficientFunds as exc:
+            raise CommandError(f'Insufficient balance ({exc.balance} FCFA): nothing was transferred.')
+        except AccountNotFound:
+            raise CommandError('Sender account not found')
+
+        for result in results:
+            if result['status'] == 'SUCCESS':
+                self.stdout.write(f"  line {result['line']}: {result['recipient']} {result['amount']} -> #{result['transaction_id']}")
+            else:
+                self.stdout.write(self.style.WARNING(f"  line {result['line']}: {result['recipient']} FAILED ({result['error']})"))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.DictWriter(report, fieldnames=['line', *CSV_FIELDS, 'status', 'transaction_id', 'error'],
+                                        extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(results)
+
+        applied = sum(1 for result in results if result['status'] == 'SUCCESS')
+        self.stdout.write(self.style.SUCCESS(
+            f'{applied}/{len(results)} transfer(s) applied. Remaining balance: {balance} FCFA.'
+        ))
@@ -0,0 +1,63 @@
+"""
+Management command that writes a user's account statement (CSV or PDF).
+
+Operations are streamed from the database with a server-side cursor and
+written as they are read, so even very long histories use constant memory.
+
+Usage:
+    python manage.py export_statement --user 42 --start 2026-01-01 --end 2026-03-31
+    python manage.py export_statement --email jane@example.com --format pdf --output statement.pdf
+"""
+
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Rift_pay.models import Account, User
+from Rift_pay.services.statements import (
+    statement_window, statement_title, statement_operations, csv_chunks, pdf_chunks,
+)
+
+
+class Command(BaseCommand):
+    help = "Export a user's statement over a date range as CSV or PDF"
+
+    def add_arguments(self, parser):
+        who = parser.add_mutually_exclusive_group(required=True)
+        who.add_argument('--user', type=int, help='user_id of the account holder')
+        who.add_argument('--email', help='Email of the account holder')
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, required=True, help='Last day, included (YYYY-MM-DD)')
+        parser.add_argument('--format', choices=['csv', 'pdf'], default='csv', help='Output format (default: csv)')
+        parser.add_argument('--output', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows fetched per round trip (default: STATEMENT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        lookup = {'user_id': options['user']} if options['user'] is not None else {'email': options['email']}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError('User not found')
+        if options['start'] > options['end']:
+            raise CommandError('--start must not be after --end')
+
+        start, end = statement_window(options['start'], options['end'])
+        operations = statement_operations(user, start, end, chunk_size=options['chunk_size'])
+
+        if options['format'] == 'csv':
+            chunks = (chunk.encode('utf-8') for chunk in csv_chunks(operations))
+        else:
+            account = Account.objects.filter(user=user).first()
+            chunks = pdf_chunks(operations, statement_title(user, account, options['start'], options['end']))
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Statement written to {options['output']}."))
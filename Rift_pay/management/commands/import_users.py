@@ -0,0 +1,65 @@
+"""
+Management command that onboards users in bulk from a CSV file.
+
+Each valid row gets what ``register`` gives a new user: a User, an Account
+and a VIRTUAL NFC card. The CSV header is name,prenom,email,phone,password.
+Rows are validated like the registration form; invalid rows, duplicate
+emails and emails already in use are reported and skipped.
+
+Usage:
+    python manage.py import_users partners.csv
+    python manage.py import_users partners.csv --report results.csv --workers 8 --chunk-size 1000
+"""
+
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Rift_pay.services.user_import import (
+    InvalidImport, REPORT_FIELDS, import_users, password_hasher, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create users, accounts and virtual NFC cards from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV file (header: name,prenom,email,phone,password)')
+        parser.add_argument('--report', default=None, help='Write the per-row results to this CSV file')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing passwords (default: one per CPU)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per transaction (default: USER_IMPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        path = options['csv_file']
+        report = writer = None
+        created = failed = 0
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as source, \
+                    password_hasher(options['workers']) as hash_passwords:
+                if options['report']:
+                    report = open(options['report'], 'w', newline='', encoding='utf-8')
+                    writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+                    writer.writeheader()
+
+                for result in import_users(read_rows(source), hash_passwords, chunk_size=options['chunk_size']):
+                    if writer:
+                        writer.writerow(result)
+                    if result['status'] == 'CREATED':
+                        created += 1
+                    else:
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(
+                            f"  line {result['line']}: {result['email'] or '-'} FAILED ({result['error']})"
+                        ))
+        except OSError as exc:
+            raise CommandError(f'Cannot open {exc.filename or path}: {exc.strerror or exc}')
+        except InvalidImport as exc:
+            raise CommandError(f'Invalid file: {exc}')
+        finally:
+            if report:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{created} user(s) created, {failed} row(s) skipped.'))
@@ -0,0 +1,137 @@
+"""
+Management command that load-tests the NFC terminal API.
+
+Provisions N test terminals and M active cards (each on its own account,
+funded through the ledger), fires taps at ``/api/nfc/pay/`` of a running
+server at a target rate, then reports latency percentiles, throughput,
+decline reasons and lock-wait errors. It ends by checking the database: no
+account may go negative, and what the accounts lost must equal the
+successful NFC payments and what the merchants received in the ledger.
+Exits with status 1 when the check fails.
+
+The server must use the same database as this command.
+
+Usage:
+    python manage.py nfc_load_test
+    python manage.py nfc_load_test --terminals 10 --cards 500 --rps 200 --duration 30
+    python manage.py nfc_load_test --base-url http://192.168.1.50:8000 --concurrency 128
+    python manage.py nfc_load_test --cards 5 --rps 100   (hot accounts: lock contention)
+"""
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Rift_pay.management.commands.setup_nfc_test import DEFAULT_RAW_KEY
+from Rift_pay.services.ledger import verify_ledger
+from Rift_pay.services.nfc_load import provision_fleet, run_load, verify_balances
+
+
+class Command(BaseCommand):
+    help = 'Load-test /api/nfc/pay/ with a fleet of test terminals and cards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server URL (default: http://127.0.0.1:8000)')
+        parser.add_argument('--terminals', type=int, default=5, help='Terminals to provision (default: 5)')
+        parser.add_argument('--cards', type=int, default=100, help='Active cards to provision (default: 100)')
+        parser.add_argument('--balance', type=Decimal, default=Decimal('100000'),
+                            help='Balance every card account starts with (default: 100000)')
+        parser.add_argument('--daily-limit', type=Decimal, default=None,
+                            help='Daily limit set on every card (default: leave as is)')
+        parser.add_argument('--per-tap-limit', type=Decimal, default=None,
+                            help='Per-transaction limit set on every card (default: leave as is)')
+        parser.add_argument('--key', default=DEFAULT_RAW_KEY, help='Raw API key of the test terminals')
+        parser.add_argument('--rps', type=float, default=50, help='Target taps per second (default: 50)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load (default: 10)')
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Maximum taps in flight (default: 64)')
+        parser.add_argument('--min-amount', type=int, default=100, help='Smallest tap in FCFA (default: 100)')
+        parser.add_argument('--max-amount', type=int, default=1000, help='Largest tap in FCFA (default: 1000)')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-tap timeout in seconds (default: 10)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+        parser.add_argument('--skip-ledger', action='store_true',
+                            help='Do not run the full ledger verification at the end')
+
+    def handle(self, *args, **options):
+        if options['rps'] <= 0 or options['duration'] <= 0 or options['concurrency'] < 1:
+            raise CommandError('--rps, --duration and --concurrency must be positive')
+        if options['terminals'] < 1 or options['cards'] < 1:
+            raise CommandError('--terminals and --cards must be at least 1')
+        if not 0 < options['min_amount'] <= options['max_amount']:
+            raise CommandError('Expected 0 < --min-amount <= --max-amount')
+
+        balance = options['balance']
+        terminal_ids, card_uids, account_numbers = provision_fleet(
+            options['terminals'], options['cards'], options['key'], balance,
+            daily_limit=options['daily_limit'], per_transaction_limit=options['per_tap_limit'],
+        )
+        self.stdout.write(
+            f'Provisioned {len(terminal_ids)} terminal(s) and {len(card_uids)} card(s) at {balance} FCFA each.'
+        )
+
+        started_at = timezone.now()
+        self.stdout.write(
+            f"Tapping {options['base_url']} at {options['rps']:g} taps/s for {options['duration']:g}s "
+            f"(at most {options['concurrency']} in flight)..."
+        )
+        report = run_load(
+            options['base_url'], options['key'], terminal_ids, card_uids,
+            rps=options['rps'], duration=options['duration'], concurrency=options['concurrency'],
+            amounts=(options['min_amount'], options['max_amount']), timeout=options['timeout'],
+            seed=options['seed'],
+        )
+        self._print_report(report)
+
+        result = verify_balances(terminal_ids, account_numbers, balance * len(account_numbers), started_at)
+        self._print_verification(result, report)
+        failed = bool(result['negative']) or not result['reconciled']
+
+        if not options['skip_ledger']:
+            mismatches, unbalanced = verify_ledger()
+            if mismatches or unbalanced:
+                self.stdout.write(self.style.ERROR(
+                    f'Ledger: {len(mismatches)} account(s) and {len(unbalanced)} journal(s) do not match '
+                    f'(run manage.py verify_ledger for details)'
+                ))
+                failed = True
+            else:
+                self.stdout.write('Ledger matches every account balance.')
+
+        if failed:
+            raise CommandError('Balance verification failed')
+        self.stdout.write(self.style.SUCCESS('Load test finished; balances reconcile.'))
+
+    def _print_report(self, report):
+        def ms(fraction):
+            value = report.latency(fraction)
+            return '-' if value is None else f'{value * 1000:.1f} ms'
+
+        self.stdout.write('')
+        self.stdout.write(f'Sent        : {report.sent} taps in {report.elapsed:.1f}s '
+                          f'({report.throughput:.1f} taps/s), {report.skipped} skipped (client saturated)')
+        self.stdout.write(f'Latency     : p50 {ms(0.50)}, p95 {ms(0.95)}, p99 {ms(0.99)}')
+        self.stdout.write(f'Approved    : {report.approved} ({report.approved_amount.format()})')
+        self.stdout.write(f'Declined    : {sum(report.declines.values())}')
+        for reason, count in report.declines.most_common():
+            self.stdout.write(f'    {count:>8}  {reason}')
+        self.stdout.write(f'Lock waits  : {report.lock_errors} (timeouts and lock/deadlock errors)')
+        self.stdout.write(f'Errors      : {sum(report.errors.values())}')
+        for error, count in report.errors.most_common():
+            self.stdout.write(f'    {count:>8}  {error}')
+        self.stdout.write('')
+
+    def _print_verification(self, result, report):
+        if result['negative']:
+            self.stdout.write(self.style.ERROR(
+                f"{len(result['negative'])} account(s) went negative: {', '.join(result['negative'][:10])}"
+            ))
+        line = (f"Accounts debited {result['debited'].format()}, NFC payments {result['paid'].format()}, "
+                f"merchants credited {result['received'].format()}")
+        self.stdout.write(line if result['reconciled'] else self.style.ERROR(line))
+        if result['paid'] != report.approved_amount:
+            # Timed-out taps may still have been approved by the server.
+            self.stdout.write(self.style.WARNING(
+                f"Client saw {report.approved_amount.format()} approved, the database recorded {result['paid'].format()}"
+            ))
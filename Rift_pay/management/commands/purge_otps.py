@@ -0,0 +1,28 @@
+"""
+Management command that deletes expired and used email OTPs.
+
+Rows are deleted in chunks of ids taken from the ``expires_at`` index (used
+OTPs are expired when they are consumed), so each statement holds its locks
+briefly and the table stays small. Meant to run periodically (e.g. every
+few minutes).
+
+Usage:
+    python manage.py purge_otps
+    python manage.py purge_otps --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.otp import purge_expired_otps
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used email OTPs in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows deleted per statement (default: OTP_PURGE_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        count = purge_expired_otps(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired OTP(s).'))
@@ -0,0 +1,28 @@
+"""
+Management command that deletes old webhook idempotency records.
+
+``WebhookEvent`` rows only need to outlive the senders' retries. Rows
+received more than WEBHOOK_EVENT_RETENTION_DAYS ago are deleted in chunks of
+ids taken from the ``received_at`` index, so each statement holds its locks
+briefly. Meant to run periodically (e.g. daily).
+
+Usage:
+    python manage.py purge_webhook_events
+    python manage.py purge_webhook_events --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.webhooks import purge_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Delete webhook events older than the retention period in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows deleted per statement (default: WEBHOOK_EVENT_PURGE_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        count = purge_webhook_events(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} webhook event(s).'))
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the per-user running totals shown in the
+history header from the operation tables (transfers, mobile money, NFC).
+
+Usage:
+    python manage.py rebuild_user_totals
+    python manage.py rebuild_user_totals --user 1 --user 2
+"""
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.user_totals import rebuild_user_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserOperationTotals from the transfer, mobile money and NFC tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', default=None,
+                            help='Only rebuild this user_id (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows written per INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        count = rebuild_user_totals(options['user_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt totals for {count} user(s).'))
@@ -0,0 +1,45 @@
+"""
+Management command that retries operations stuck in PENDING.
+
+Blockchain proofs left with a ``local-<id>`` reference (the outbox gave up)
+are submitted to the Stellar backend again; mobile money operations whose
+webhook never arrived are looked up with the operator's status API and
+settled. Stale rows are processed in chunks with a bounded number of
+upstream calls in flight. Several workers can run side by side (chunks are
+claimed with SKIP LOCKED).
+
+Usage:
+    python manage.py reconcile
+    python manage.py reconcile --only mobile_money
+    python manage.py reconcile --chunk-size 500 --max-in-flight 16
+"""
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.reconcile import reconcile_proofs, reconcile_mobile_money
+
+
+class Command(BaseCommand):
+    help = 'Retry stale PENDING blockchain proofs and mobile money operations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=['blockchain', 'mobile_money'], default=None,
+                            help='Reconcile only one kind of operation')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows claimed per chunk (default: RECONCILE_CHUNK_SIZE)')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Concurrent upstream requests (default: RECONCILE_MAX_IN_FLIGHT)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        max_in_flight = options['max_in_flight']
+
+        if options['only'] in (None, 'blockchain'):
+            checked, synced, failed = reconcile_proofs(chunk_size, max_in_flight)
+            self.stdout.write(f'Blockchain proofs: {checked} checked, {synced} synced, {failed} still failing')
+
+        if options['only'] in (None, 'mobile_money'):
+            checked, settled = reconcile_mobile_money(chunk_size, max_in_flight)
+            self.stdout.write(f'Mobile money: {checked} checked, {settled} settled')
+
+        self.stdout.write(self.style.SUCCESS('Reconciliation finished.'))
@@ -0,0 +1,54 @@
+"""
+Management command that drains the blockchain sync outbox.
+
+Transfers are queued in ``BlockchainSyncOutbox`` inside the transfer's atomic
+block; this worker submits them to the Stellar backend in batches, with a
+bounded number of in-flight requests and exponential backoff on failure.
+Several workers can run side by side (rows are claimed with SKIP LOCKED).
+
+Usage:
+    python manage.py run_blockchain_sync
+    python manage.py run_blockchain_sync --once
+    python manage.py run_blockchain_sync --batch-size 100 --max-in-flight 8
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.blockchain_outbox import process_outbox_batch
+
+
+class Command(BaseCommand):
+    help = 'Submit queued transfers to the blockchain backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due rows once and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows claimed per batch (default: BLOCKCHAIN_SYNC_BATCH_SIZE)')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Concurrent API requests (default: BLOCKCHAIN_SYNC_MAX_IN_FLIGHT)')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to sleep when the outbox is empty (default: 5)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_in_flight = options['max_in_flight']
+
+        try:
+            while True:
+                confirmed, retried, failed = process_outbox_batch(batch_size, max_in_flight)
+                processed = confirmed + retried + failed
+
+                if processed:
+                    self.stdout.write(
+                        f'Synced {confirmed}, retrying {retried}, gave up on {failed}'
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Blockchain sync worker stopped.'))
@@ -0,0 +1,55 @@
+"""
+Management command that sends queued mobile money operations to the operators.
+
+Operations are queued in ``MobileMoneyDispatch`` by ``process_mobile_money``
+when MOBILE_MONEY_DISPATCH_MODE is 'deferred' (or when an operator's circuit
+is open and MOBILE_MONEY_CIRCUIT_OPEN_POLICY is 'queue'). This worker calls
+the operator APIs with a bounded thread pool and settles each answer exactly
+like the operator webhook does. Several workers can run side by side (rows
+are claimed with SKIP LOCKED).
+
+Usage:
+    python manage.py run_mobile_money_dispatcher
+    python manage.py run_mobile_money_dispatcher --once
+    python manage.py run_mobile_money_dispatcher --batch-size 100 --max-in-flight 16
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.mobile_money import process_dispatch_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued mobile money operations to Orange / MTN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due rows once and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows claimed per batch (default: MOBILE_MONEY_DISPATCH_BATCH_SIZE)')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Concurrent operator requests (default: MOBILE_MONEY_DISPATCH_MAX_IN_FLIGHT)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (default: 1)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_in_flight = options['max_in_flight']
+
+        try:
+            while True:
+                sent, deferred, failed = process_dispatch_batch(batch_size, max_in_flight)
+
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent}, failed {failed}, deferred {deferred} (circuit open)')
+                    continue
+                if deferred:
+                    self.stdout.write(f'Deferred {deferred} (circuit open)')
+
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Mobile money dispatcher stopped.'))
@@ -0,0 +1,62 @@
+"""
+Management command that sends the queued outbound emails.
+
+Views only insert an ``OutboundEmail`` row; this worker sends the due rows
+in batches over one SMTP connection kept open while there is mail to send
+(closed when the queue is idle), retrying failures with exponential
+backoff. Several workers can run side by side (rows are claimed with SKIP
+LOCKED). With --purge it instead deletes, in chunks, the sent and failed
+emails older than EMAIL_QUEUE_RETENTION_DAYS (run it periodically).
+
+Usage:
+    python manage.py send_queued_mail
+    python manage.py send_queued_mail --once
+    python manage.py send_queued_mail --batch-size 200 --poll-interval 1
+    python manage.py send_queued_mail --purge
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.mail_queue import MailSender, process_mail_batch, purge_finished_mail
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound emails over a reused SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due emails once and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails claimed per batch (default: EMAIL_QUEUE_BATCH_SIZE)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (default: 1)')
+        parser.add_argument('--purge', action='store_true',
+                            help='Delete old sent and failed emails and exit instead of sending')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            count = purge_finished_mail()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {count} finished email(s).'))
+            return
+
+        sender = MailSender()
+
+        try:
+            while True:
+                sent, retried, failed = process_mail_batch(sender, options['batch_size'])
+
+                if sent + retried + failed:
+                    self.stdout.write(f'Sent {sent}, retrying {retried}, gave up on {failed}')
+                    continue
+
+                # Servers drop idle sessions; reconnect when mail arrives.
+                sender.close()
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Mail worker stopped.'))
+        finally:
+            sender.close()
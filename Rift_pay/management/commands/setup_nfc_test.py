@@ -11,6 +11,7 @@ Usage:
 from django.core.management.base import BaseCommand
 from django.contrib.auth.hashers import make_password
 from Rift_pay.models import NFCTerminal
+from Rift_pay.services.nfc_load import ensure_terminal
 
 
 DEFAULT_TERMINAL_ID = 'TERM-TEST-001'
@@ -45,15 +46,7 @@ class Command(BaseCommand):
             if deleted:
                 self.stdout.write(self.style.WARNING(f'Deleted existing terminal {terminal_id}'))
 
-        terminal, created = NFCTerminal.objects.get_or_create(
-            terminal_id=terminal_id,
-            defaults={
-                'merchant_name': merchant,
-                'location': location,
-                'api_key_hash': make_password(raw_key),
-                'is_active': True,
-            }
-        )
+        terminal, created = ensure_terminal(terminal_id, merchant, location, make_password(raw_key))
 
         if not created:
             self.stdout.write(self.style.WARNING(f'Terminal {terminal_id} already exists.'))
@@ -97,4 +90,8 @@ class Command(BaseCommand):
         self.stdout.write('')
         self.stdout.write('  Option C: Tester sans carte physique')
         self.stdout.write('     Use any fake UID like "04AABBCCDD"')
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('── Load test ──'))
+        self.stdout.write('')
+        self.stdout.write('     python manage.py nfc_load_test --terminals 10 --cards 500 --rps 200 --duration 30')
         self.stdout.write(self.style.SUCCESS('═' * 56))
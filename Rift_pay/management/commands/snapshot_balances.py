@@ -0,0 +1,27 @@
+"""
+Management command that snapshots ledger balances.
+
+Stores the balance of every account that moved since the previous run in
+``BalanceSnapshot``, so point-in-time balances and statements only read the
+entries after the last snapshot. Meant to run periodically (e.g. hourly).
+
+Usage:
+    python manage.py snapshot_balances
+    python manage.py snapshot_balances --batch-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+
+from Rift_pay.services.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the ledger balance of every account that moved since the last snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Accounts per query and rows per INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        count = take_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} balance snapshot(s).'))
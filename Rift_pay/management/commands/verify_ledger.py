@@ -0,0 +1,37 @@
+"""
+Management command that checks ``Account.balance`` against the ledger.
+
+Ledger balances are read from the latest snapshots plus the entries after
+them (``--full`` sums every entry instead, which also re-checks the
+snapshots). Journals whose legs do not sum to zero are reported too. Exits
+with status 1 when anything is off.
+
+Usage:
+    python manage.py verify_ledger
+    python manage.py verify_ledger --full
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Rift_pay.services.ledger import verify_ledger
+
+
+class Command(BaseCommand):
+    help = 'Check Account.balance against the double-entry ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Sum the whole ledger instead of starting from the snapshots')
+
+    def handle(self, *args, **options):
+        mismatches, unbalanced = verify_ledger(full=options['full'])
+
+        for account, stored, expected in mismatches:
+            stored_display = 'no account' if stored is None else f'{stored}'
+            self.stdout.write(self.style.ERROR(f'{account}: balance {stored_display}, ledger {expected}'))
+        for journal in unbalanced:
+            self.stdout.write(self.style.ERROR(f'Journal {journal} does not balance'))
+
+        if mismatches or unbalanced:
+            raise CommandError(f'{len(mismatches)} account(s) and {len(unbalanced)} journal(s) do not match the ledger')
+        self.stdout.write(self.style.SUCCESS('Ledger matches every account balance.'))
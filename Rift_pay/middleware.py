@@ -0,0 +1,13 @@
+from .services.audit import audit_buffer
+
+
+class AuditFlushMiddleware:
+    """Write buffered audit events at the end of a request once they are due."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        audit_buffer.flush_if_due()
+        return response
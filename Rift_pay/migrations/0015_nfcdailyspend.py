@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def backfill_today_spend(apps, schema_editor):
+    # Only today's totals matter for limit checks; older days are history.
+    NFCPaymentTransaction = apps.get_model('Rift_pay', 'NFCPaymentTransaction')
+    NFCDailySpend = apps.get_model('Rift_pay', 'NFCDailySpend')
+
+    today = timezone.now().date()
+    totals = (
+        NFCPaymentTransaction.objects.filter(status='SUCCESS', created_at__date=today)
+        .values('nfc_card_id')
+        .annotate(total=Sum('amount'))
+    )
+    NFCDailySpend.objects.bulk_create([
+        NFCDailySpend(nfc_card_id=row['nfc_card_id'], day=today, amount=row['total'])
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0014_blockchainsyncoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NFCDailySpend',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('nfc_card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spends', to='Rift_pay.nfccard')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('nfc_card', 'day'), name='unique_nfc_daily_spend')],
+            },
+        ),
+        migrations.RunPython(backfill_today_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_user_totals(apps, schema_editor):
+    Transaction = apps.get_model('Rift_pay', 'Transaction')
+    MobileMoneyTransaction = apps.get_model('Rift_pay', 'MobileMoneyTransaction')
+    NFCPaymentTransaction = apps.get_model('Rift_pay', 'NFCPaymentTransaction')
+    UserOperationTotals = apps.get_model('Rift_pay', 'UserOperationTotals')
+
+    totals = {}
+
+    def entry(user_id):
+        return totals.setdefault(user_id, {'operation_count': 0})
+
+    for row in Transaction.objects.values('sender_id').annotate(total=Sum('amount'), count=Count('id')).order_by():
+        item = entry(row['sender_id'])
+        item['total_sent'] = row['total'] or 0
+        item['operation_count'] += row['count']
+
+    for row in Transaction.objects.values('receiver_id').annotate(total=Sum('amount'), count=Count('id')).order_by():
+        item = entry(row['receiver_id'])
+        item['total_received'] = row['total'] or 0
+        item['operation_count'] += row['count']
+
+    for row in MobileMoneyTransaction.objects.values('user_id').annotate(
+        deposit=Sum('amount', filter=Q(direction='DEPOSIT', status='SUCCESS')),
+        withdraw=Sum('amount', filter=Q(direction='WITHDRAW', status='SUCCESS')),
+        count=Count('id'),
+    ).order_by():
+        item = entry(row['user_id'])
+        item['total_deposit'] = row['deposit'] or 0
+        item['total_withdraw'] = row['withdraw'] or 0
+        item['operation_count'] += row['count']
+
+    for row in NFCPaymentTransaction.objects.values('user_id').annotate(
+        total=Sum('amount', filter=Q(status='SUCCESS')), count=Count('id'),
+    ).order_by():
+        item = entry(row['user_id'])
+        item['total_nfc'] = row['total'] or 0
+        item['operation_count'] += row['count']
+
+    UserOperationTotals.objects.bulk_create(
+        [UserOperationTotals(user_id=user_id, **values) for user_id, values in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0015_nfcdailyspend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserOperationTotals',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='operation_totals', serialize=False, to='Rift_pay.user')),
+                ('total_sent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_deposit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_withdraw', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_nfc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('operation_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0016_useroperationtotals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blockchainproof',
+            index=models.Index(fields=['local_transaction_id'], name='proof_local_tx_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', 'code', 'expires_at'], name='otp_user_code_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mobilemoneytransaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='mm_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mobilemoneytransaction',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['created_at'], name='mm_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nfcpaymenttransaction',
+            index=models.Index(fields=['nfc_card', 'status', 'created_at'], name='nfcpay_card_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nfcpaymenttransaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='nfcpay_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemactivity',
+            index=models.Index(fields=['action', 'status', '-created_at'], name='activity_action_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', '-timestamp', '-id'], name='tx_sender_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receiver', '-timestamp', '-id'], name='tx_receiver_ts_idx'),
+        ),
+    ]
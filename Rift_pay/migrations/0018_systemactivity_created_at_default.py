@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0017_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='systemactivity',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
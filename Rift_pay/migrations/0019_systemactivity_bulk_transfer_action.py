@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0018_systemactivity_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='systemactivity',
+            name='action',
+            field=models.CharField(choices=[('REGISTER', 'User registration'), ('LOGIN', 'User login'), ('LOGOUT', 'User logout'), ('TRANSFER', 'Money transfer'), ('BULK_TRANSFER', 'Bulk money transfer'), ('DEPOSIT', 'Mobile money deposit'), ('WITHDRAW', 'Mobile money withdrawal'), ('MM_WEBHOOK', 'Mobile money webhook'), ('PROFILE_UPDATE', 'Profile update'), ('NFC_LINK', 'NFC card linked'), ('NFC_UNLINK', 'NFC card unlinked'), ('NFC_ORDER', 'NFC physical card ordered'), ('NFC_BLOCK', 'NFC card blocked'), ('NFC_PAY', 'NFC payment')], max_length=20),
+        ),
+    ]
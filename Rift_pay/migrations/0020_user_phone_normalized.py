@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:02
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    User = apps.get_model('Rift_pay', 'User')
+    users = list(User.objects.only('user_id', 'phone'))
+    for user in users:
+        user.phone_normalized = re.sub(r'\D', '', user.phone or '')
+    User.objects.bulk_update(users, ['phone_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0019_systemactivity_bulk_transfer_action'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_dispatched_at(apps, schema_editor):
+    # Operations created before the operator queue were sent inline.
+    MobileMoneyTransaction = apps.get_model('Rift_pay', 'MobileMoneyTransaction')
+    MobileMoneyTransaction.objects.update(dispatched_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0020_user_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilemoneytransaction',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_dispatched_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0021_mobilemoneytransaction_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MobileMoneyDispatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('customer_name', models.CharField(max_length=201)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mm_transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dispatch', to='Rift_pay.mobilemoneytransaction')),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['next_attempt_at'], name='mm_dispatch_next_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0022_mobilemoneydispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('source', models.CharField(choices=[('BLOCKCHAIN', 'Blockchain'), ('MOBILE_MONEY', 'Mobile money')], max_length=20)),
+                ('event_key', models.CharField(max_length=128)),
+                ('reference', models.CharField(max_length=255)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['received_at'], name='webhook_event_received_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'event_key'), name='unique_webhook_event')],
+            },
+        ),
+    ]
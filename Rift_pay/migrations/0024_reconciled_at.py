@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0023_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockchainproof',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mobilemoneytransaction',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='blockchainproof',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['id'], name='proof_pending_idx'),
+        ),
+    ]
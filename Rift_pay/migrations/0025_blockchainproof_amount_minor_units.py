@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:40
+
+from django.db import migrations
+from django.db.models import BigIntegerField, F, FloatField
+from django.db.models.functions import Cast, Round
+
+import Rift_pay.money
+
+
+def floats_to_minor_units(apps, schema_editor):
+    BlockchainProof = apps.get_model('Rift_pay', 'BlockchainProof')
+    BlockchainProof.objects.filter(amount__isnull=False).update(
+        amount_minor=Cast(Round(F('amount') * 100), BigIntegerField()),
+    )
+
+
+def minor_units_to_floats(apps, schema_editor):
+    BlockchainProof = apps.get_model('Rift_pay', 'BlockchainProof')
+    BlockchainProof.objects.filter(amount_minor__isnull=False).update(
+        amount=Cast(F('amount_minor'), FloatField()) / 100,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0024_reconciled_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockchainproof',
+            name='amount_minor',
+            field=Rift_pay.money.MoneyField(blank=True, null=True),
+        ),
+        migrations.RunPython(floats_to_minor_units, minor_units_to_floats),
+        migrations.RemoveField(
+            model_name='blockchainproof',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='blockchainproof',
+            old_name='amount_minor',
+            new_name='amount',
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:15
+
+import uuid
+
+import Rift_pay.money
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_existing_balances(apps, schema_editor):
+    # Existing balances become OPENING journals so the ledger matches them.
+    Account = apps.get_model('Rift_pay', 'Account')
+    LedgerEntry = apps.get_model('Rift_pay', 'LedgerEntry')
+    now = django.utils.timezone.now()
+    entries = []
+    for number, balance in Account.objects.exclude(balance=0).values_list('number', 'balance').iterator(chunk_size=2000):
+        amount = Rift_pay.money.Money.from_decimal(balance)
+        journal = uuid.uuid4()
+        entries.append(LedgerEntry(journal=journal, account=number, amount=amount, kind='OPENING', created_at=now))
+        entries.append(LedgerEntry(journal=journal, account='SYS:OPENING', amount=-amount, kind='OPENING', created_at=now))
+        if len(entries) >= 2000:
+            LedgerEntry.objects.bulk_create(entries)
+            entries = []
+    LedgerEntry.objects.bulk_create(entries)
+
+
+APPEND_ONLY_SQL = '''
+CREATE OR REPLACE FUNCTION rift_pay_ledger_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'Rift_pay_ledgerentry is append-only';
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER rift_pay_ledger_append_only
+    BEFORE UPDATE OR DELETE ON "Rift_pay_ledgerentry"
+    FOR EACH ROW EXECUTE FUNCTION rift_pay_ledger_append_only();
+'''
+
+DROP_APPEND_ONLY_SQL = '''
+DROP TRIGGER IF EXISTS rift_pay_ledger_append_only ON "Rift_pay_ledgerentry";
+DROP FUNCTION IF EXISTS rift_pay_ledger_append_only();
+'''
+
+
+def add_append_only_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(APPEND_ONLY_SQL)
+
+
+def drop_append_only_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_APPEND_ONLY_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0025_blockchainproof_amount_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('account', models.CharField(max_length=80)),
+                ('balance', Rift_pay.money.MoneyField()),
+                ('as_of', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'as_of'), name='unique_balance_snapshot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('journal', models.UUIDField()),
+                ('account', models.CharField(max_length=80)),
+                ('amount', Rift_pay.money.MoneyField()),
+                ('kind', models.CharField(choices=[('OPENING', 'Opening balance'), ('TRANSFER', 'Transfer'), ('MOBILE_MONEY', 'Mobile money'), ('NFC_PAYMENT', 'NFC payment'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx'), models.Index(fields=['journal'], name='ledger_journal_idx')],
+            },
+        ),
+        migrations.RunPython(open_existing_balances, migrations.RunPython.noop),
+        migrations.RunPython(add_append_only_trigger, drop_append_only_trigger),
+    ]
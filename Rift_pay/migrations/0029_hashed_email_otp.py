@@ -0,0 +1,62 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:10
+
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+
+def hash_live_codes(apps, schema_editor):
+    """Hash the codes still usable (newest per user) and drop the rest."""
+    EmailOTP = apps.get_model('Rift_pay', 'EmailOTP')
+    EmailOTP.objects.filter(models.Q(is_used=True) | models.Q(expires_at__lte=timezone.now())).delete()
+
+    seen_users = set()
+    for otp in EmailOTP.objects.order_by('user_id', '-created_at', '-id'):
+        if otp.user_id in seen_users:
+            otp.delete()
+            continue
+        seen_users.add(otp.user_id)
+        # Same keyed hash as Rift_pay.services.otp.hash_otp.
+        otp.code_hash = salted_hmac(
+            'riftpay-email-otp', f'{otp.user_id}:{otp.code}', algorithm='sha256',
+        ).hexdigest()
+        otp.save(update_fields=['code_hash'])
+
+
+def drop_codes(apps, schema_editor):
+    # Hashed codes cannot be turned back into codes.
+    apps.get_model('Rift_pay', 'EmailOTP').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0028_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailotp',
+            name='code_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_live_codes, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='emailotp',
+            name='otp_user_code_live_idx',
+        ),
+        migrations.RemoveField(
+            model_name='emailotp',
+            name='code',
+        ),
+        migrations.RunPython(migrations.RunPython.noop, drop_codes),
+        migrations.AddConstraint(
+            model_name='emailotp',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_used', False)), fields=('user',), name='otp_one_live_per_user'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+    ]
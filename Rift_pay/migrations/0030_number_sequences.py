@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:37
+
+from django.db import migrations, models
+
+SEQUENCES = ('rift_pay_account_number_seq', 'rift_pay_card_number_seq', 'rift_pay_nfc_number_seq')
+
+
+def create_sequences(apps, schema_editor):
+    # Other backends count in the NumberSequence table instead.
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in SEQUENCES:
+            schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {name} MINVALUE 0 START WITH 0')
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in SEQUENCES:
+            schema_editor.execute(f'DROP SEQUENCE IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0029_hashed_email_otp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
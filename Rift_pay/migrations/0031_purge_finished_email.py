@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:50
+
+from django.db import migrations, models
+
+
+def blank_failed_bodies(apps, schema_editor):
+    # Bodies of emails given up on may still hold OTPs.
+    apps.get_model('Rift_pay', 'OutboundEmail').objects.filter(status='FAILED').exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rift_pay', '0030_number_sequences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(condition=models.Q(('status', 'PENDING'), _negated=True), fields=['created_at'], name='email_finished_idx'),
+        ),
+        migrations.RunPython(blank_failed_bodies, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 
+from .money import MoneyField
+from .validators import normalize_phone
+
 # Create your models here.
 #create user model
 class User(models.Model):
@@ -10,8 +13,17 @@ class User(models.Model):
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=128)
     phone = models.CharField(max_length=20)
+    # Digits-only copy of `phone`, kept in sync by save(); recipient lookups use it.
+    phone_normalized = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
     last_profile_update = models.DateTimeField(null=True, blank=True)
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} {self.prenom}"
 
@@ -22,6 +34,13 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # History feed / dashboard: a user's transfers, newest first (keyset on timestamp, id)
+            models.Index(fields=['sender', '-timestamp', '-id'], name='tx_sender_ts_idx'),
+            models.Index(fields=['receiver', '-timestamp', '-id'], name='tx_receiver_ts_idx'),
+        ]
+
 class Account(models.Model):
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -44,6 +63,26 @@ class Card(models.Model):
             return "••••"
         return f"•••• •••• •••• {raw[-4:]}"
 
+class UserOperationTotals(models.Model):
+    """Running per-user totals shown in the history header.
+
+    Maintained inside the atomic blocks that move money; rebuild it from the
+    ledger with ``python manage.py rebuild_user_totals``.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='operation_totals')
+    total_sent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_received = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_deposit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_withdraw = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_nfc = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    operation_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Totals for user {self.user_id}"
+
+
 class BlockchainProof(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -58,10 +97,18 @@ class BlockchainProof(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     local_transaction_id = models.IntegerField(null=True, blank=True)
     error_detail = models.CharField(max_length=255, blank=True)
-    amount = models.FloatField(null=True, blank=True)
+    amount = MoneyField(null=True, blank=True)
     currency = models.CharField(max_length=10, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     synced_at = models.DateTimeField(null=True, blank=True)
+    # Last time `manage.py reconcile` picked the row up (also its lease).
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['local_transaction_id'], name='proof_local_tx_idx'),
+            models.Index(fields=['id'], condition=models.Q(status='PENDING'), name='proof_pending_idx'),
+        ]
 
 
 class SystemActivity(models.Model):
@@ -70,6 +117,7 @@ class SystemActivity(models.Model):
         ('LOGIN', 'User login'),
         ('LOGOUT', 'User logout'),
         ('TRANSFER', 'Money transfer'),
+        ('BULK_TRANSFER', 'Bulk money transfer'),
         ('DEPOSIT', 'Mobile money deposit'),
         ('WITHDRAW', 'Mobile money withdrawal'),
         ('MM_WEBHOOK', 'Mobile money webhook'),
@@ -79,6 +127,7 @@ class SystemActivity(models.Model):
         ('NFC_ORDER', 'NFC physical card ordered'),
         ('NFC_BLOCK', 'NFC card blocked'),
         ('NFC_PAY', 'NFC payment'),
+        ('STATEMENT_EXPORT', 'Statement export'),
     ]
 
     STATUS_CHOICES = [
@@ -93,10 +142,14 @@ class SystemActivity(models.Model):
     detail = models.CharField(max_length=255, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=255, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: buffered events keep the time they happened, not the flush time.
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['action', 'status', '-created_at'], name='activity_action_status_idx'),
+        ]
 
     def __str__(self):
         username = f"{self.user.name} {self.user.prenom}" if self.user else "Unknown user"
@@ -134,12 +187,21 @@ class MobileMoneyTransaction(models.Model):
     customer_phone_hash = models.CharField(max_length=128)
     response_code = models.CharField(max_length=30, blank=True)
     response_message = models.CharField(max_length=255, blank=True)
+    # Null while the request has not been sent to the operator yet (queued).
+    dispatched_at = models.DateTimeField(null=True, blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    # Last time `manage.py reconcile` picked the row up (also its lease).
+    reconciled_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='mm_user_created_idx'),
+            # Only PENDING rows are ever scanned by age; keep that index small.
+            models.Index(fields=['created_at'], condition=models.Q(status='PENDING'), name='mm_pending_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.direction} {self.amount} {self.currency} - {self.operator} ({self.status})"
@@ -198,6 +260,28 @@ class NFCCard(models.Model):
         return f"NFC {tag} – {self.user.name} {self.user.prenom} ({self.status})"
 
 
+class NFCDailySpend(models.Model):
+    """Running total of successful NFC payments per card and per day.
+
+    Updated in the same transaction as the debit so the daily-limit check is a
+    single row read instead of an aggregate over the card's payment history.
+    """
+
+    id = models.AutoField(primary_key=True)
+    nfc_card = models.ForeignKey(NFCCard, on_delete=models.CASCADE, related_name='daily_spends')
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['nfc_card', 'day'], name='unique_nfc_daily_spend'),
+        ]
+
+    def __str__(self):
+        return f"{self.nfc_card_id} on {self.day}: {self.amount}"
+
+
 class NFCTerminal(models.Model):
     """A merchant NFC payment terminal."""
 
@@ -214,16 +298,28 @@ class NFCTerminal(models.Model):
 
 
 class EmailOTP(models.Model):
-    """One-time password sent by email for two-factor authentication."""
+    """One-time password sent by email for two-factor authentication.
+
+    Only a keyed hash of the code is stored (see ``services.otp``). A user
+    has at most one unused row, which verification finds with a single probe
+    of the partial unique index; used rows are expired on the spot so that
+    ``purge_otps`` only has to look at `expires_at`.
+    """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='email_otps')
-    code = models.CharField(max_length=6)
+    code_hash = models.CharField(max_length=64)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=models.Q(is_used=False), name='otp_one_live_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
 
     def is_valid(self):
         return not self.is_used and timezone.now() <= self.expires_at
@@ -257,7 +353,209 @@ class NFCPaymentTransaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['nfc_card', 'status', 'created_at'], name='nfcpay_card_status_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='nfcpay_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"NFC PAY {self.reference} – {self.amount} {self.currency} ({self.status})"
 
+
+
+class BlockchainSyncOutbox(models.Model):
+    """Transfers waiting to be submitted to the blockchain backend.
+
+    Rows are written in the same atomic block as the transfer and drained by
+    the ``run_blockchain_sync`` management command.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='blockchain_outbox')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"Outbox tx #{self.transaction_id} ({self.status}, {self.attempts} attempts)"
+
+
+class MobileMoneyDispatch(models.Model):
+    """Mobile money operations waiting to be sent to the operator.
+
+    Holds the customer's phone number (the operation itself only keeps a
+    masked copy and a hash) until the ``run_mobile_money_dispatcher``
+    command has sent the request; the row is deleted afterwards.
+    """
+
+    id = models.AutoField(primary_key=True)
+    mm_transaction = models.OneToOneField(MobileMoneyTransaction, on_delete=models.CASCADE, related_name='dispatch')
+    phone_number = models.CharField(max_length=20)
+    customer_name = models.CharField(max_length=201)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='mm_dispatch_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"Dispatch {self.mm_transaction_id} ({self.attempts} attempts)"
+
+
+class OutboundEmail(models.Model):
+    """Emails waiting to be sent by the ``send_queued_mail`` command.
+
+    The body is blanked once the message is sent or given up on (it may hold
+    an OTP). A message still unsent at `expires_at` is dropped instead of
+    delivered. Finished rows are purged by `send_queued_mail --purge`.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='PENDING'), name='email_pending_next_idx'),
+            models.Index(fields=['created_at'], condition=~models.Q(status='PENDING'), name='email_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email to {self.to_email} ({self.status}, {self.attempts} attempts)"
+
+
+class WebhookEvent(models.Model):
+    """Webhook events already applied, so operator retries are no-ops.
+
+    `event_key` is the sender's event id when it provides one, otherwise a
+    digest of the event payload. Rows older than WEBHOOK_EVENT_RETENTION_DAYS
+    are deleted by `manage.py purge_webhook_events`.
+    """
+
+    SOURCE_CHOICES = [
+        ('BLOCKCHAIN', 'Blockchain'),
+        ('MOBILE_MONEY', 'Mobile money'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    event_key = models.CharField(max_length=128)
+    reference = models.CharField(max_length=255)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'event_key'], name='unique_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=['received_at'], name='webhook_event_received_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.reference}"
+
+
+class LedgerEntry(models.Model):
+    """One leg of a balanced journal; rows are only ever inserted.
+
+    Every balance change writes its journal in the same transaction, so an
+    account's balance is the sum of its entries. `account` is an account
+    number, or a system account (``SYS:...``) for the outside world: the
+    operators' float, NFC merchants, opening balances.
+    """
+
+    KIND_CHOICES = [
+        ('OPENING', 'Opening balance'),
+        ('TRANSFER', 'Transfer'),
+        ('MOBILE_MONEY', 'Mobile money'),
+        ('NFC_PAYMENT', 'NFC payment'),
+        ('ADJUSTMENT', 'Adjustment'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    journal = models.UUIDField()
+    account = models.CharField(max_length=80)
+    # Signed: positive credits the account, negative debits it.
+    amount = MoneyField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    reference = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx'),
+            models.Index(fields=['journal'], name='ledger_journal_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Ledger entries are append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Ledger entries are append-only')
+
+    def __str__(self):
+        return f"{self.account} {self.amount} ({self.kind})"
+
+
+class BalanceSnapshot(models.Model):
+    """Balance of an account from the ledger entries created up to `as_of`."""
+
+    id = models.AutoField(primary_key=True)
+    account = models.CharField(max_length=80)
+    balance = MoneyField()
+    as_of = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'as_of'], name='unique_balance_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.balance} @ {self.as_of:%Y-%m-%d %H:%M}"
+
+
+class NumberSequence(models.Model):
+    """Counter behind services.numbers where the database has no sequences."""
+
+    name = models.CharField(max_length=20, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -0,0 +1,156 @@
+"""
+Money as an integer number of minor units (centimes).
+
+``Money`` is the value type and ``MoneyField`` stores it in a BIGINT column,
+so amounts are exact, sum as integers in the database and never go through
+a float. Values coming from outside (JSON, forms, upstream APIs) are parsed
+with ``Money.parse``, which reads them as major units: ``Money.parse('12.5')``
+is 1250 centimes.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.functional import cached_property
+
+MINOR_PER_UNIT = 100
+
+
+class InvalidMoney(ValueError):
+    pass
+
+
+@total_ordering
+class Money:
+    __slots__ = ('minor',)
+
+    def __init__(self, minor=0):
+        if not isinstance(minor, int) or isinstance(minor, bool):
+            raise TypeError('Money takes an integer number of minor units')
+        self.minor = minor
+
+    @classmethod
+    def from_decimal(cls, value):
+        """Round a ``Decimal`` of major units to the nearest centime."""
+        return cls(int((value * MINOR_PER_UNIT).to_integral_value(rounding=ROUND_HALF_UP)))
+
+    @classmethod
+    def parse(cls, value):
+        """Money from a Money, a Decimal, an int, a float or a numeric string (major units)."""
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return cls(value * MINOR_PER_UNIT)
+        if isinstance(value, Decimal):
+            amount = value
+        else:
+            try:
+                # str() first: a float goes through its shortest repr, not its binary value.
+                amount = Decimal(str(value).strip())
+            except (InvalidOperation, ValueError):
+                raise InvalidMoney(f'Invalid amount: {value!r}')
+        if not amount.is_finite():
+            raise InvalidMoney(f'Invalid amount: {value!r}')
+        return cls.from_decimal(amount)
+
+    @property
+    def decimal(self):
+        return Decimal(self.minor).scaleb(-2)
+
+    def _parts(self):
+        units, cents = divmod(abs(self.minor), MINOR_PER_UNIT)
+        return '-' if self.minor < 0 else '', units, cents
+
+    def to_json(self):
+        """JSON number with exactly the value's decimal digits (an int when whole)."""
+        if self.minor % MINOR_PER_UNIT == 0:
+            return self.minor // MINOR_PER_UNIT
+        return self.minor / MINOR_PER_UNIT
+
+    def format(self):
+        """Display form used across the site: ``1 234,50 FCFA``."""
+        sign, units, cents = self._parts()
+        return f"{sign}{units:,}".replace(',', ' ') + f",{cents:02d} FCFA"
+
+    def __str__(self):
+        sign, units, cents = self._parts()
+        return f"{sign}{units}.{cents:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.minor + other.minor)
+
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.minor - other.minor)
+
+    def __neg__(self):
+        return Money(-self.minor)
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.minor == other.minor
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.minor < other.minor
+
+    def __hash__(self):
+        return hash(self.minor)
+
+
+def to_json(value):
+    """JSON number for a Decimal amount (balances, payment amounts)."""
+    return Money.parse(value).to_json()
+
+
+class MoneyField(models.BigIntegerField):
+    """``Money`` stored as a BIGINT of minor units."""
+
+    description = 'Amount in minor units'
+
+    @cached_property
+    def validators(self):
+        # The integer range validators would compare Money with int.
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        # int() as well: PostgreSQL returns SUM() of a bigint as numeric.
+        return None if value is None else Money(int(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money):
+            return value
+        try:
+            return Money.parse(value)
+        except InvalidMoney as error:
+            raise ValidationError(str(error), code='invalid')
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return Money.parse(value).minor
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return '' if value is None else str(value)
+
+    def formfield(self, **kwargs):
+        return super(models.BigIntegerField, self).formfield(**{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            **kwargs,
+        })
@@ -0,0 +1,111 @@
+"""
+Buffered writer for ``SystemActivity`` audit events.
+
+Events are collected per process and written with a single ``bulk_create``
+once the buffer reaches AUDIT_BUFFER_SIZE events or AUDIT_FLUSH_INTERVAL
+seconds, so audit INSERTs no longer compete one by one with money movement.
+The buffer is also flushed at the end of a request when due (see
+``AuditFlushMiddleware``), by a background thread while the worker is idle,
+and when the worker shuts down, so an event can wait up to
+AUDIT_FLUSH_INTERVAL seconds before it is written, and the events still
+buffered are lost if the worker is killed (SIGKILL, OOM). Set
+AUDIT_LOG_MODE='sync' to write every event immediately (tests, management
+shells).
+
+A flush never runs inside the caller's transaction: the buffer holds other
+requests' events too, which must not be rolled back with it. When a flush
+falls due inside ``atomic()``, it is deferred until that transaction commits.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from ..models import SystemActivity
+
+logger = logging.getLogger(__name__)
+
+
+def _buffered_mode():
+    return getattr(settings, 'AUDIT_LOG_MODE', 'buffered').strip().lower() == 'buffered'
+
+
+class AuditBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._last_flush = time.monotonic()
+        self._flusher = None
+
+    @property
+    def depth(self):
+        """Number of events waiting to be written (the buffer-depth metric)."""
+        return len(self._events)
+
+    def add(self, event):
+        if not _buffered_mode():
+            event.save()
+            return
+
+        with self._lock:
+            self._events.append(event)
+        self._ensure_flusher()
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        max_size = int(getattr(settings, 'AUDIT_BUFFER_SIZE', 100))
+        interval = float(getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0))
+        if self._events and (
+            len(self._events) >= max_size or time.monotonic() - self._last_flush >= interval
+        ):
+            if connection.in_atomic_block:
+                transaction.on_commit(self.flush)
+            else:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+            self._last_flush = time.monotonic()
+        if not events:
+            return 0
+
+        try:
+            # Own transaction: a failed INSERT must not leave the connection aborted.
+            with transaction.atomic():
+                SystemActivity.objects.bulk_create(events)
+        except Exception:
+            # Losing audit rows must never break the request that logged them.
+            logger.exception('Failed to write %d audit event(s)', len(events))
+            return 0
+        return len(events)
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_periodically, name='audit-flusher', daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(float(getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0)))
+            if self._events:
+                self.flush_if_due()
+                # This thread has its own DB connection; don't keep it open while idle.
+                connection.close()
+
+
+audit_buffer = AuditBuffer()
+atexit.register(audit_buffer.flush)
+
+
+def record_activity(event):
+    """Queue an unsaved ``SystemActivity`` instance for writing."""
+    audit_buffer.add(event)
@@ -1,11 +1,14 @@
-import json
 import uuid
-from urllib.error import HTTPError, URLError
 from urllib.parse import urljoin
-from urllib.request import Request, urlopen
 
 from django.conf import settings
 
+from ..money import Money
+from .http import (
+    post_json, UpstreamHTTPError, UpstreamUnreachable, UpstreamTimeout,
+    UpstreamInvalidResponse, UpstreamCircuitOpen,
+)
+
 
 class BlockchainSyncError(Exception):
     pass
@@ -23,14 +26,12 @@ def sync_transaction(transaction_obj):
         'reference_id': reference_id,
         'sender_user_id': transaction_obj.sender.user_id,
         'receiver_user_id': transaction_obj.receiver.user_id,
-        'amount': str(transaction_obj.amount),
+        'amount': str(Money.from_decimal(transaction_obj.amount)),
         'currency': 'FCFA',
         'timestamp': transaction_obj.timestamp.isoformat(),
     }
 
     headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
         'X-Idempotency-Key': str(transaction_obj.id),
     }
 
@@ -43,25 +44,17 @@ def sync_transaction(transaction_obj):
     if token:
         headers['Authorization'] = f'Bearer {token}'
 
-    request = Request(
-        url=url,
-        data=json.dumps(payload).encode('utf-8'),
-        headers=headers,
-        method='POST'
-    )
-
     try:
-        with urlopen(request, timeout=settings.BLOCKCHAIN_API_TIMEOUT) as response:
-            raw = response.read().decode('utf-8')
-            data = json.loads(raw) if raw else {}
-    except HTTPError as error:
-        detail = error.read().decode('utf-8', errors='ignore')
-        raise BlockchainSyncError(f'Blockchain API error ({error.code}): {detail}')
-    except URLError as error:
-        raise BlockchainSyncError(f'Blockchain API unreachable: {error.reason}')
-    except TimeoutError:
+        data = post_json(url, payload, headers=headers, timeout=settings.BLOCKCHAIN_API_TIMEOUT)
+    except UpstreamHTTPError as error:
+        raise BlockchainSyncError(f'Blockchain API error ({error.status_code}): {error.detail}')
+    except UpstreamCircuitOpen:
+        raise BlockchainSyncError('Blockchain API unavailable (circuit open)')
+    except UpstreamTimeout:
         raise BlockchainSyncError('Blockchain API timeout reached')
-    except json.JSONDecodeError:
+    except UpstreamUnreachable as error:
+        raise BlockchainSyncError(f'Blockchain API unreachable: {error}')
+    except UpstreamInvalidResponse:
         raise BlockchainSyncError('Blockchain API returned invalid JSON')
 
     return {
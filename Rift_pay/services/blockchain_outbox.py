@@ -0,0 +1,178 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models import BlockchainProof, BlockchainSyncOutbox
+from ..money import InvalidMoney, Money
+from .blockchain_client import sync_transaction, BlockchainSyncError
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def enqueue_transaction_sync(transfer_tx):
+    """Queue a transfer for blockchain submission.
+
+    Must be called inside the transfer's atomic block so the outbox row is
+    committed (or rolled back) together with the balance changes.
+    """
+    return BlockchainSyncOutbox.objects.create(transaction=transfer_tx)
+
+
+def enqueue_transactions_sync(transfer_txs):
+    """Queue several transfers at once (one INSERT)."""
+    return BlockchainSyncOutbox.objects.bulk_create(
+        [BlockchainSyncOutbox(transaction=transfer_tx) for transfer_tx in transfer_txs]
+    )
+
+
+def _backoff_delay(attempts):
+    base = _setting('BLOCKCHAIN_SYNC_BACKOFF_SECONDS', 5)
+    ceiling = _setting('BLOCKCHAIN_SYNC_BACKOFF_MAX_SECONDS', 900)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), ceiling))
+
+
+def _claim_batch(batch_size):
+    """Lease a batch of due outbox rows.
+
+    Rows are locked with SKIP LOCKED so several workers can drain the outbox
+    concurrently, then pushed forward by the lease duration so a crashed
+    worker's batch becomes visible again once the lease expires.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('BLOCKCHAIN_SYNC_LEASE_SECONDS', 120))
+
+    with db_transaction.atomic():
+        claimed_ids = list(
+            BlockchainSyncOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not claimed_ids:
+            return []
+        BlockchainSyncOutbox.objects.filter(id__in=claimed_ids).update(next_attempt_at=now + lease)
+
+    return list(
+        BlockchainSyncOutbox.objects
+        .filter(id__in=claimed_ids)
+        .select_related('transaction', 'transaction__sender', 'transaction__receiver')
+    )
+
+
+def _submit(entry):
+    try:
+        return entry, sync_transaction(entry.transaction), None
+    except BlockchainSyncError as error:
+        return entry, None, error
+
+
+def _reported_amount(sync_data, transfer_tx):
+    # The submission already succeeded: a malformed amount must not abort the batch.
+    try:
+        return Money.parse(sync_data.get('amount'))
+    except InvalidMoney:
+        logger.warning('Backend returned an invalid amount %r for transaction %s',
+                       sync_data.get('amount'), transfer_tx.id)
+        return Money.from_decimal(transfer_tx.amount)
+
+
+def _confirmed_proof(entry, sync_data, now):
+    transfer_tx = entry.transaction
+    confirmed = bool(sync_data.get('stellar_transaction_hash'))
+    return BlockchainProof(
+        reference_id=sync_data['reference_id'],
+        stellar_transaction_hash=sync_data.get('stellar_transaction_hash') or f"pending-{transfer_tx.id}",
+        proof_hash=sync_data.get('proof_hash') or f"pending-proof-{transfer_tx.id}",
+        status='CONFIRMED' if confirmed else 'PENDING',
+        local_transaction_id=transfer_tx.id,
+        amount=_reported_amount(sync_data, transfer_tx),
+        currency=sync_data.get('currency', 'FCFA'),
+        synced_at=now if confirmed else None,
+    )
+
+
+def _unsynced_proof(entry):
+    # Same "local-" placeholder the transfer view used to write on sync
+    # failure, so the blockchain webhook can still reconcile it later.
+    transfer_tx = entry.transaction
+    return BlockchainProof(
+        reference_id=f"local-{transfer_tx.id}",
+        stellar_transaction_hash=f"unsynced-{transfer_tx.id}",
+        proof_hash=f"unsynced-proof-{transfer_tx.id}",
+        status='PENDING',
+        local_transaction_id=transfer_tx.id,
+        amount=Money.from_decimal(transfer_tx.amount),
+        currency='FCFA',
+    )
+
+
+def _upsert_proofs(proofs):
+    if not proofs:
+        return
+    BlockchainProof.objects.bulk_create(
+        proofs,
+        update_conflicts=True,
+        unique_fields=['reference_id'],
+        update_fields=[
+            'stellar_transaction_hash', 'proof_hash', 'status',
+            'local_transaction_id', 'amount', 'currency', 'synced_at',
+        ],
+    )
+
+
+def process_outbox_batch(batch_size=None, max_in_flight=None):
+    """Submit one batch of queued transfers and record the outcomes.
+
+    Returns a ``(confirmed, retried, failed)`` tuple of row counts.
+    """
+    batch_size = batch_size or _setting('BLOCKCHAIN_SYNC_BATCH_SIZE', 50)
+    max_in_flight = max_in_flight or _setting('BLOCKCHAIN_SYNC_MAX_IN_FLIGHT', 4)
+    max_attempts = _setting('BLOCKCHAIN_SYNC_MAX_ATTEMPTS', 8)
+
+    entries = _claim_batch(batch_size)
+    if not entries:
+        return 0, 0, 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(entries)))) as pool:
+        results = list(pool.map(_submit, entries))
+
+    now = timezone.now()
+    proofs = []
+    confirmed = retried = failed = 0
+
+    for entry, sync_data, error in results:
+        entry.attempts += 1
+        if error is None:
+            proofs.append(_confirmed_proof(entry, sync_data, now))
+            entry.status = 'DONE'
+            entry.last_error = ''
+            confirmed += 1
+            continue
+
+        entry.last_error = str(error)[:255]
+        if entry.attempts >= max_attempts:
+            proofs.append(_unsynced_proof(entry))
+            entry.status = 'FAILED'
+            failed += 1
+        else:
+            entry.next_attempt_at = now + _backoff_delay(entry.attempts)
+            retried += 1
+
+    with db_transaction.atomic():
+        _upsert_proofs(proofs)
+        for entry in entries:
+            entry.updated_at = now
+        BlockchainSyncOutbox.objects.bulk_update(
+            entries, ['status', 'attempts', 'next_attempt_at', 'last_error', 'updated_at']
+        )
+
+    return confirmed, retried, failed
@@ -0,0 +1,241 @@
+"""
+Bulk transfers (payroll): one sender, many recipients.
+
+A batch is validated line by line, recipients are resolved with one query
+per lookup type, and every valid line is then applied in a single
+transaction: the sender is debited once, the receivers are credited with
+one UPDATE, the ``Transaction`` rows are inserted with ``bulk_create`` and
+queued for blockchain submission in one batch. Lines that fail validation
+or resolution are reported and skipped; if the sender cannot cover the
+remaining lines, nothing is applied.
+"""
+
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from ..models import Account, Transaction, User
+from ..validators import is_valid_email, is_valid_phone, is_valid_account_number, normalize_phone
+from .blockchain_outbox import enqueue_transactions_sync
+from . import ledger
+from .dashboard import invalidate_dashboard
+from .transfers import AccountNotFound, InsufficientFunds, TransferError, lock_accounts
+from .user_totals import add_to_totals
+
+LOOKUP_VALIDATORS = {
+    'email': is_valid_email,
+    'phone': is_valid_phone,
+    'account': is_valid_account_number,
+}
+
+CSV_FIELDS = ('lookup_type', 'recipient', 'amount', 'reference')
+
+# Largest amount an Account.balance (max_digits=10, decimal_places=2) can hold.
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class InvalidBatch(TransferError):
+    pass
+
+
+def parse_batch(content, fmt):
+    """Parse a CSV or JSON batch into a list of line dicts.
+
+    CSV needs a header with ``lookup_type,recipient,amount`` (``reference`` is
+    optional). JSON is either a list of objects with the same keys or
+    ``{"transfers": [...]}``.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        missing = {'lookup_type', 'recipient', 'amount'} - set(reader.fieldnames or ())
+        if missing:
+            raise InvalidBatch(f'Missing CSV column(s): {", ".join(sorted(missing))}')
+        return [dict(row) for row in reader]
+
+    if fmt == 'json':
+        try:
+            data = json.loads(content)
+        except ValueError:
+            raise InvalidBatch('Invalid JSON')
+        if isinstance(data, dict):
+            data = data.get('transfers')
+        if not isinstance(data, list) or not all(isinstance(line, dict) for line in data):
+            raise InvalidBatch('Expected a list of transfers')
+        return data
+
+    raise InvalidBatch(f'Unsupported format: {fmt}')
+
+
+def _result(number, line, status, **extra):
+    return {
+        'line': number,
+        'lookup_type': line.get('lookup_type'),
+        'recipient': line.get('recipient'),
+        'amount': line.get('amount'),
+        'reference': line.get('reference') or '',
+        'status': status,
+        **extra,
+    }
+
+
+def _validate(lines):
+    """Split *lines* into ``(valid, failed)``; valid entries carry a Decimal amount."""
+    valid, failed = [], []
+    for number, line in enumerate(lines, start=1):
+        lookup_type = str(line.get('lookup_type') or 'email').strip().lower()
+        recipient = str(line.get('recipient') or '').strip()
+        line = {**line, 'lookup_type': lookup_type, 'recipient': recipient}
+
+        validator = LOOKUP_VALIDATORS.get(lookup_type)
+        if validator is None:
+            failed.append(_result(number, line, 'FAILED', error='Invalid lookup type'))
+            continue
+        if not validator(recipient):
+            failed.append(_result(number, line, 'FAILED', error=f'Invalid {lookup_type} format'))
+            continue
+        try:
+            amount = Decimal(str(line.get('amount')))
+        except (InvalidOperation, ValueError):
+            failed.append(_result(number, line, 'FAILED', error='Invalid amount format'))
+            continue
+        # Exponent check rather than quantize(): quantize raises on huge values like 1e30.
+        if (not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT
+                or amount.normalize().as_tuple().exponent < -2):
+            failed.append(_result(number, line, 'FAILED', error='Amount must be a positive value with at most 2 decimals'))
+            continue
+
+        valid.append((number, line, amount))
+    return valid, failed
+
+
+def _resolve_recipients(valid):
+    """Map ``(lookup_type, recipient)`` to a ``User``, one query per lookup type.
+
+    Phones are matched on their digits. They are not unique: a phone matching
+    several users is returned in *ambiguous* so the line can report it.
+    """
+    wanted = defaultdict(set)
+    for _number, line, _amount in valid:
+        wanted[line['lookup_type']].add(line['recipient'])
+
+    resolved, ambiguous = {}, set()
+    if wanted['email']:
+        for user in User.objects.filter(email__in=wanted['email']):
+            resolved[('email', user.email)] = user
+    if wanted['phone']:
+        phones = defaultdict(list)
+        for phone in wanted['phone']:
+            phones[normalize_phone(phone)].append(phone)
+        for user in User.objects.filter(phone_normalized__in=phones):
+            for phone in phones[user.phone_normalized]:
+                key = ('phone', phone)
+                if key in resolved:
+                    ambiguous.add(key)
+                resolved[key] = user
+    if wanted['account']:
+        for account in Account.objects.select_related('user').filter(number__in=wanted['account']):
+            resolved[('account', account.number)] = account.user
+    return resolved, ambiguous
+
+
+def bulk_transfer(sender, lines, open_account=None):
+    """Apply a batch of transfers from *sender* and return per-line results.
+
+    *lines* are dicts with ``lookup_type`` (email, phone or account),
+    ``recipient``, ``amount`` and an optional ``reference`` echoed back.
+    *open_account* has the same meaning as in ``transfer_funds``.
+
+    Returns ``(results, sender_balance)``; results are ordered by line number.
+    Raises ``InsufficientFunds`` (nothing applied) when the valid lines add up
+    to more than the sender's balance, and ``AccountNotFound`` when the sender
+    has no account.
+    """
+    valid, results = _validate(lines)
+    resolved, ambiguous = _resolve_recipients(valid)
+
+    accepted = []
+    for number, line, amount in valid:
+        key = (line['lookup_type'], line['recipient'])
+        if key in ambiguous:
+            results.append(_result(number, line, 'FAILED', error='Several users share this phone number'))
+        elif key not in resolved:
+            results.append(_result(number, line, 'FAILED', error='Recipient not found'))
+        else:
+            accepted.append((number, line, amount, resolved[key]))
+
+    with db_transaction.atomic():
+        receivers = {receiver.user_id: receiver for _n, _l, _a, receiver in accepted}
+        if open_account is not None and receivers:
+            with_account = set(Account.objects.filter(user_id__in=receivers).values_list('user_id', flat=True))
+            new_accounts = [open_account(receivers[user_id]) for user_id in receivers if user_id not in with_account]
+            if new_accounts:
+                # A concurrent transfer may open one of them first; lock_accounts reads the winner.
+                Account.objects.bulk_create(new_accounts, ignore_conflicts=True)
+
+        accounts = lock_accounts(sender.user_id, *receivers)
+        sender_account = accounts.get(sender.user_id)
+        if sender_account is None:
+            raise AccountNotFound('Sender account not found')
+
+        applied = []
+        for number, line, amount, receiver in accepted:
+            if receiver.user_id in accounts:
+                applied.append((number, line, amount, receiver))
+            else:
+                results.append(_result(number, line, 'FAILED', error='Recipient account not found'))
+
+        total = sum((amount for _n, _l, amount, _r in applied), Decimal('0.00'))
+        if total > sender_account.balance:
+            raise InsufficientFunds(sender_account.balance)
+
+        transfer_txs = Transaction.objects.bulk_create([
+            Transaction(sender=sender, receiver=receiver, amount=amount)
+            for _n, _l, amount, receiver in applied
+        ])
+
+        # Like transfer_funds, a line paying the sender back moves no money
+        # and posts no journal; it is still recorded as a Transaction.
+        moved = [
+            (line_tx, transfer_tx) for line_tx, transfer_tx in zip(applied, transfer_txs)
+            if accounts[line_tx[3].user_id].pk != sender_account.pk
+        ]
+        debit = sum((amount for (_n, _l, amount, _r), _tx in moved), Decimal('0.00'))
+        credits = defaultdict(lambda: Decimal('0.00'))
+        for (_n, _l, amount, receiver), _tx in moved:
+            credits[accounts[receiver.user_id].pk] += amount
+
+        if applied:
+            if moved:
+                Account.objects.filter(pk=sender_account.pk).update(balance=F('balance') - debit)
+                Account.objects.filter(pk__in=credits).update(balance=F('balance') + Case(
+                    *[When(pk=pk, then=Value(amount)) for pk, amount in credits.items()],
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ))
+                ledger.post_many([
+                    ledger.journal('TRANSFER', [
+                        (sender_account.number, -amount), (accounts[receiver.user_id].number, amount),
+                    ], reference=transfer_tx.id)
+                    for (_n, _l, amount, receiver), transfer_tx in moved
+                ])
+
+            add_to_totals(sender.user_id, operations=len(applied), total_sent=total)
+            received = defaultdict(lambda: [0, Decimal('0.00')])
+            for _n, _l, amount, receiver in applied:
+                received[receiver.user_id][0] += 1
+                received[receiver.user_id][1] += amount
+            for user_id, (count, amount) in received.items():
+                add_to_totals(user_id, operations=count, total_received=amount)
+            invalidate_dashboard(sender.user_id, *received)
+
+            enqueue_transactions_sync(transfer_txs)
+
+    for (number, line, amount, _receiver), transfer_tx in zip(applied, transfer_txs):
+        results.append(_result(number, line, 'SUCCESS', amount=str(amount), transaction_id=transfer_tx.id))
+
+    results.sort(key=lambda result: result['line'])
+    return results, sender_account.balance - debit
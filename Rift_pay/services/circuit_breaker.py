@@ -0,0 +1,102 @@
+"""
+Circuit breaker whose state lives in the shared cache.
+
+All workers see the same state, so once an upstream is declared down no
+worker keeps waiting on it. States:
+
+* CLOSED    requests flow; consecutive failures are counted.
+* OPEN      requests are refused until CIRCUIT_BREAKER_RESET_TIMEOUT elapses.
+* HALF_OPEN one probe request is let through; its outcome closes or
+            re-opens the circuit.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(getattr(settings, 'CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5))
+        self.reset_timeout = reset_timeout or int(getattr(settings, 'CIRCUIT_BREAKER_RESET_TIMEOUT', 30))
+
+    @property
+    def _state_key(self):
+        return f"circuit:{self.name}:state"
+
+    @property
+    def _failures_key(self):
+        return f"circuit:{self.name}:failures"
+
+    @property
+    def _probe_key(self):
+        return f"circuit:{self.name}:probe"
+
+    def snapshot(self):
+        """Return ``{'state', 'failures', 'opened_at', 'retry_at'}`` for display."""
+        opened = cache.get(self._state_key)
+        failures = cache.get(self._failures_key, 0)
+        if opened is None:
+            return {'state': CLOSED, 'failures': failures, 'opened_at': None, 'retry_at': None}
+        retry_at = opened['opened_at'] + self.reset_timeout
+        state = HALF_OPEN if time.time() >= retry_at else OPEN
+        return {'state': state, 'failures': failures, 'opened_at': opened['opened_at'], 'retry_at': retry_at}
+
+    @property
+    def state(self):
+        return self.snapshot()['state']
+
+    def allow_request(self):
+        """Return True if a call may go to the upstream now.
+
+        While the circuit is half-open only one caller (across all workers)
+        gets True; it must report the outcome with ``record_success`` or
+        ``record_failure``.
+        """
+        opened = cache.get(self._state_key)
+        if opened is None:
+            return True
+        if time.time() < opened['opened_at'] + self.reset_timeout:
+            return False
+        # cache.add is atomic: exactly one caller wins the probe slot.
+        return cache.add(self._probe_key, True, self.reset_timeout)
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` if the circuit refuses the call."""
+        if not self.allow_request():
+            raise CircuitOpenError(f'{self.name} is unavailable (circuit open)')
+
+    def record_success(self):
+        cache.delete_many([self._state_key, self._failures_key, self._probe_key])
+
+    def record_failure(self):
+        # A failure while the state key exists can only come from the half-open probe.
+        probing = cache.get(self._state_key) is not None
+        cache.add(self._failures_key, 0, None)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            # Reset by a concurrent success between add() and incr().
+            cache.set(self._failures_key, 1, None)
+            failures = 1
+        if probing or failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        """Open the circuit now (also usable to force it open by hand)."""
+        cache.set(self._state_key, {'opened_at': time.time()}, None)
+        cache.delete(self._probe_key)
+
+    def reset(self):
+        """Close the circuit and forget past failures."""
+        self.record_success()
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+from ..models import Account, NFCCard
+from .nfc_spend import get_spent_today
+from .operation_feed import fetch_recent_rows
+
+RECENT_OPERATIONS_LIMIT = 8
+
+_DASHBOARD_PRESENTATION = {
+    'sent': ('TRANSFER_SENT', 'To: {}', '-', '📤'),
+    'received': ('TRANSFER_RECEIVED', 'From: {}', '+', '📥'),
+    'deposit': ('DEPOSIT', 'Deposit {}', '+', '➕'),
+    'withdraw': ('WITHDRAW', 'Withdraw {}', '-', '➖'),
+    'nfc_payment': ('NFC_PAYMENT', 'NFC: {}', '-', '📶'),
+}
+
+
+def _cache_key(user_id):
+    return f"dashboard:{user_id}"
+
+
+def _present_recent(row):
+    kind, title, amount_prefix, icon = _DASHBOARD_PRESENTATION[row['feed_type']]
+    return {
+        'kind': kind,
+        'title': title.format(row['feed_counterparty']),
+        'amount_prefix': amount_prefix,
+        'amount': row['feed_amount'],
+        'timestamp': row['feed_ts'],
+        'status': row['feed_status'],
+        'icon': icon,
+    }
+
+
+def build_dashboard_snapshot(user, create_nfc_card=None):
+    """Load everything the dashboard shows for *user* from the database.
+
+    *create_nfc_card* is called with the account when the user has no NFC card
+    yet (accounts opened before the NFC feature) and must return the new card.
+    """
+    account = Account.objects.filter(user=user).first()
+    if account is None:
+        return {'account': None, 'nfc_card': None, 'today_spent': Decimal('0.00'), 'recent_operations': []}
+
+    nfc_card = NFCCard.objects.filter(user=user).first()
+    if not nfc_card and create_nfc_card:
+        nfc_card = create_nfc_card(account)
+
+    today_spent = Decimal('0.00')
+    if nfc_card and nfc_card.status == 'ACTIVE':
+        today_spent = get_spent_today(nfc_card)
+
+    recent_rows = fetch_recent_rows(user, RECENT_OPERATIONS_LIMIT, include_self_transfers=False)
+
+    return {
+        'account': account,
+        'nfc_card': nfc_card,
+        'today_spent': today_spent,
+        'recent_operations': [_present_recent(row) for row in recent_rows],
+    }
+
+
+def get_dashboard_snapshot(user, create_nfc_card=None):
+    """Return the cached dashboard snapshot for *user*, building it on a miss."""
+    key = _cache_key(user.user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot(user, create_nfc_card)
+        cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 30))
+    return snapshot
+
+
+def invalidate_dashboard(*user_ids):
+    """Drop the cached snapshots once the current transaction commits.
+
+    Called from every path that changes a balance, an operation or a card, so
+    a dashboard never shows data older than the last committed change.
+    """
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    db_transaction.on_commit(lambda: cache.delete_many(keys))
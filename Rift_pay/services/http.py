@@ -0,0 +1,123 @@
+"""
+Shared HTTP session for calls to upstream APIs (Stellar backend, operators).
+
+One ``requests.Session`` per process keeps a keep-alive connection pool per
+upstream host, so repeated calls skip the TCP and TLS handshakes. Every call
+goes through the circuit breaker of its upstream (by default the host), so
+a dead upstream fails fast instead of holding a worker for the full timeout.
+"""
+
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class UpstreamHTTPError(UpstreamError):
+    def __init__(self, status_code, detail):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f'HTTP {status_code}: {detail}')
+
+
+class UpstreamUnreachable(UpstreamError):
+    pass
+
+
+class UpstreamTimeout(UpstreamError):
+    pass
+
+
+class UpstreamInvalidResponse(UpstreamError):
+    pass
+
+
+class UpstreamCircuitOpen(UpstreamError):
+    pass
+
+
+def get_session():
+    """Return this process's pooled session, creating it on first use.
+
+    A session inherited through fork() is discarded: pooled sockets must not
+    be shared between processes.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=int(getattr(settings, 'HTTP_POOL_CONNECTIONS', 10)),
+                pool_maxsize=int(getattr(settings, 'HTTP_POOL_MAXSIZE', 10)),
+                max_retries=0,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session, _session_pid = session, pid
+    return _session
+
+
+def post_json(url, payload, *, headers=None, timeout, breaker=None):
+    """POST *payload* as JSON to *url* and return the decoded JSON body.
+
+    *timeout* is the read timeout of this upstream; the connect timeout is
+    HTTP_CONNECT_TIMEOUT for every host. *breaker* defaults to the circuit
+    breaker of the URL's host. Connection errors, timeouts and 5xx answers
+    count as breaker failures; 4xx answers mean the upstream is alive.
+    """
+    breaker = breaker or CircuitBreaker(f"http:{urlsplit(url).netloc}")
+    try:
+        breaker.before_call()
+    except CircuitOpenError as error:
+        raise UpstreamCircuitOpen(str(error))
+
+    request_headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    request_headers.update(headers or {})
+    connect_timeout = float(getattr(settings, 'HTTP_CONNECT_TIMEOUT', 3))
+
+    try:
+        response = get_session().post(
+            url,
+            data=json.dumps(payload).encode('utf-8'),
+            headers=request_headers,
+            timeout=(min(connect_timeout, timeout), timeout),
+        )
+    except requests.Timeout:
+        breaker.record_failure()
+        raise UpstreamTimeout('timeout reached')
+    except requests.RequestException as error:
+        breaker.record_failure()
+        raise UpstreamUnreachable(str(error))
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if response.status_code >= 400:
+        raise UpstreamHTTPError(response.status_code, response.text)
+
+    if not response.content:
+        return {}
+    try:
+        return response.json()
+    except ValueError:
+        raise UpstreamInvalidResponse('invalid JSON')
@@ -0,0 +1,196 @@
+"""
+Double-entry ledger.
+
+Every balance change posts a journal: ``LedgerEntry`` legs whose amounts sum
+to zero, written in the transaction that moves the money. Money coming from
+or going to the outside world goes through a system account (``SYS:...``).
+
+``take_snapshots`` periodically stores each moved account's balance in
+``BalanceSnapshot``, so a point-in-time balance or a statement reads the last
+snapshot plus the entries after it instead of the whole history.
+Snapshots stop LEDGER_SNAPSHOT_LAG_SECONDS in the past, so that entries of
+transactions still in flight when the snapshot is taken are not missed.
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from ..models import Account, BalanceSnapshot, LedgerEntry
+from ..money import Money
+
+SYSTEM_OPENING = 'SYS:OPENING'
+
+
+class UnbalancedJournal(ValueError):
+    pass
+
+
+def mobile_money_account(operator):
+    """System account holding the float of a mobile money operator."""
+    return f'SYS:MM:{operator}'
+
+
+def nfc_merchant_account(terminal_id):
+    """System account of the merchant behind an NFC terminal."""
+    return f'SYS:NFC:{terminal_id}'
+
+
+def journal(kind, legs, reference=''):
+    """Build the (unsaved) entries of one journal from ``(account, amount)`` legs."""
+    journal_id = uuid.uuid4()
+    now = timezone.now()
+    entries = [
+        LedgerEntry(
+            journal=journal_id, account=account, amount=Money.parse(amount),
+            kind=kind, reference=str(reference)[:64], created_at=now,
+        )
+        for account, amount in legs
+    ]
+    if sum(entry.amount.minor for entry in entries) != 0:
+        raise UnbalancedJournal(f'{kind} journal {reference} does not balance')
+    return entries
+
+
+def post(kind, legs, reference=''):
+    """Write one journal; call it inside the atomic block that moves the money."""
+    return LedgerEntry.objects.bulk_create(journal(kind, legs, reference))
+
+
+def post_many(journals):
+    """Write several journals built with ``journal()`` in one INSERT."""
+    return LedgerEntry.objects.bulk_create([entry for entries in journals for entry in entries])
+
+
+def _sum(queryset):
+    return queryset.aggregate(total=Sum('amount'))['total'] or Money(0)
+
+
+def balance_at(account, at=None):
+    """Balance of *account* (a number or a system account) at time *at* (default: now)."""
+    at = at or timezone.now()
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=at)
+    snapshot = BalanceSnapshot.objects.filter(account=account, as_of__lte=at).order_by('-as_of').first()
+    if snapshot is None:
+        return _sum(entries)
+    return snapshot.balance + _sum(entries.filter(created_at__gt=snapshot.as_of))
+
+
+def statement(account, start, end):
+    """Return ``(opening_balance, entries)`` for ``start < created_at <= end``."""
+    entries = (
+        LedgerEntry.objects
+        .filter(account=account, created_at__gt=start, created_at__lte=end)
+        .order_by('created_at', 'id')
+    )
+    return balance_at(account, start), entries
+
+
+def _latest_snapshots(accounts=None):
+    """``{account: BalanceSnapshot}`` of each account's most recent snapshot."""
+    latest = BalanceSnapshot.objects.filter(account=OuterRef('account')).order_by('-as_of').values('as_of')[:1]
+    snapshots = BalanceSnapshot.objects.filter(as_of=Subquery(latest))
+    if accounts is not None:
+        snapshots = snapshots.filter(account__in=accounts)
+    return {snapshot.account: snapshot for snapshot in snapshots}
+
+
+def _deltas(after=None, until=None):
+    entries = LedgerEntry.objects.all()
+    if after is not None:
+        entries = entries.filter(created_at__gt=after)
+    if until is not None:
+        entries = entries.filter(created_at__lte=until)
+    return {
+        row['account']: row['total']
+        for row in entries.values('account').annotate(total=Sum('amount')).order_by()
+    }
+
+
+def take_snapshots(as_of=None, batch_size=1000):
+    """Snapshot every account with entries since the previous snapshot run.
+
+    Returns the number of snapshots written. Accounts that did not move keep
+    their previous snapshot, which is still their balance.
+    """
+    lag = timedelta(seconds=int(getattr(settings, 'LEDGER_SNAPSHOT_LAG_SECONDS', 60)))
+    as_of = as_of or timezone.now() - lag
+    previous_as_of = BalanceSnapshot.objects.aggregate(last=Max('as_of'))['last']
+    if previous_as_of is not None and previous_as_of >= as_of:
+        return 0
+
+    deltas = _deltas(after=previous_as_of, until=as_of)
+    accounts = list(deltas)
+    rows = []
+    for start in range(0, len(accounts), batch_size):
+        chunk = accounts[start:start + batch_size]
+        previous = _latest_snapshots(chunk)
+        for account in chunk:
+            base = previous[account].balance if account in previous else Money(0)
+            rows.append(BalanceSnapshot(account=account, balance=base + deltas[account], as_of=as_of))
+
+    BalanceSnapshot.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return len(rows)
+
+
+def ledger_balances(full=False):
+    """``{account: Money}`` for every account in the ledger.
+
+    From the latest snapshots plus the entries after the last snapshot run,
+    or from all entries when *full* is True.
+    """
+    if full:
+        return _deltas()
+    last_as_of = BalanceSnapshot.objects.aggregate(last=Max('as_of'))['last']
+    balances = defaultdict(lambda: Money(0))
+    for account, snapshot in _latest_snapshots().items():
+        balances[account] = snapshot.balance
+    for account, delta in _deltas(after=last_as_of).items():
+        balances[account] += delta
+    return balances
+
+
+def unbalanced_journals(since=None):
+    """Journals whose legs do not sum to zero (should never happen)."""
+    entries = LedgerEntry.objects.all()
+    if since is not None:
+        entries = entries.filter(created_at__gt=since)
+    return list(
+        entries.values('journal').annotate(total=Sum('amount')).exclude(total=Money(0))
+        .order_by().values_list('journal', flat=True)
+    )
+
+
+def verify_ledger(full=False, chunk_size=2000):
+    """Compare ``Account.balance`` with the ledger.
+
+    Returns ``(mismatches, unbalanced)``: ``(account, stored_balance,
+    ledger_balance)`` tuples (``stored_balance`` is None for ledger accounts
+    without an ``Account`` row) and the ids of journals that do not balance.
+    Everything is read from one snapshot of the database.
+    """
+    outermost = not connection.in_atomic_block
+    with db_transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+        balances = ledger_balances(full=full)
+        mismatches = []
+        for number, stored in Account.objects.values_list('number', 'balance').iterator(chunk_size=chunk_size):
+            expected = balances.pop(number, Money(0))
+            if Money.from_decimal(stored) != expected:
+                mismatches.append((number, stored, expected))
+        for account, expected in balances.items():
+            if not account.startswith('SYS:') and expected:
+                mismatches.append((account, None, expected))
+
+        since = None if full else BalanceSnapshot.objects.aggregate(last=Max('as_of'))['last']
+        unbalanced = unbalanced_journals(since)
+
+    return mismatches, unbalanced
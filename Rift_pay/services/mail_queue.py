@@ -0,0 +1,166 @@
+"""
+Outbound email queue.
+
+Views only insert an ``OutboundEmail`` row (``queue_mail``); the
+``send_queued_mail`` command claims due rows in batches and sends them
+through a ``MailSender``, which keeps one authenticated SMTP connection open
+across messages and batches instead of a TCP + STARTTLS + AUTH handshake
+per email. Failed messages are retried with exponential backoff; a message
+still unsent when it expires (an OTP past its validity) is dropped. The
+body (it may hold an OTP) is blanked as soon as a message is sent or given
+up on, and ``purge_finished_mail`` deletes finished rows after
+EMAIL_QUEUE_RETENTION_DAYS.
+"""
+
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models import OutboundEmail
+
+# Errors after which the connection cannot be trusted any more.
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def queue_mail(to_email, subject, body, expires_at=None):
+    """Queue one plain-text email; a single INSERT."""
+    return OutboundEmail.objects.create(to_email=to_email, subject=subject, body=body, expires_at=expires_at)
+
+
+def _backoff_delay(attempts):
+    base = _setting('EMAIL_QUEUE_BACKOFF_SECONDS', 5)
+    ceiling = _setting('EMAIL_QUEUE_BACKOFF_MAX_SECONDS', 600)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), ceiling))
+
+
+def _claim_batch(batch_size):
+    """Lease a batch of due messages (SKIP LOCKED, like the other workers)."""
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('EMAIL_QUEUE_LEASE_SECONDS', 120))
+
+    with db_transaction.atomic():
+        claimed_ids = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not claimed_ids:
+            return []
+        OutboundEmail.objects.filter(id__in=claimed_ids).update(next_attempt_at=now + lease)
+
+    return list(OutboundEmail.objects.filter(id__in=claimed_ids).order_by('id'))
+
+
+def _is_connection_error(error):
+    # SMTPException derives from OSError; a bare OSError is a socket failure.
+    return isinstance(error, _CONNECTION_ERRORS) or not isinstance(error, smtplib.SMTPException)
+
+
+class MailSender:
+    """One email backend connection, opened on first use and kept open."""
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(fail_silently=False)
+        self.is_open = False
+
+    def send(self, email):
+        message = EmailMessage(
+            subject=email.subject, body=email.body, from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email.to_email], connection=self.connection,
+        )
+        try:
+            if not self.is_open:
+                # Set first: a failed open() can leave a half-open socket to close.
+                self.is_open = True
+                self.connection.open()
+            self.connection.send_messages([message])
+        except OSError as error:
+            if _is_connection_error(error):
+                self.close()
+            raise
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+
+def process_mail_batch(sender, batch_size=None):
+    """Send one batch of queued emails; returns ``(sent, retried, failed)``."""
+    batch_size = batch_size or _setting('EMAIL_QUEUE_BATCH_SIZE', 50)
+    max_attempts = _setting('EMAIL_QUEUE_MAX_ATTEMPTS', 5)
+
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    sent = retried = failed = 0
+    connection_error = None
+    for email in emails:
+        now = timezone.now()
+        if email.expires_at is not None and email.expires_at <= now:
+            email.status, email.body, email.last_error = 'FAILED', '', 'Expired before it could be sent'
+            failed += 1
+            continue
+
+        # Once the server is unreachable, do not reconnect for every message.
+        error = connection_error
+        if error is None:
+            try:
+                sender.send(email)
+            except OSError as send_error:
+                error = send_error
+                if _is_connection_error(send_error):
+                    connection_error = send_error
+
+        email.attempts += 1
+        if error is None:
+            email.status, email.sent_at, email.body, email.last_error = 'SENT', now, '', ''
+            sent += 1
+        elif isinstance(error, smtplib.SMTPRecipientsRefused) or email.attempts >= max_attempts:
+            email.status, email.body, email.last_error = 'FAILED', '', str(error)[:255]
+            failed += 1
+        else:
+            email.next_attempt_at = now + _backoff_delay(email.attempts)
+            email.last_error = str(error)[:255]
+            retried += 1
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'body', 'sent_at'],
+    )
+    return sent, retried, failed
+
+
+def purge_finished_mail(chunk_size=None, before=None):
+    """Delete sent and failed emails created before *before*, in chunks.
+
+    *before* defaults to EMAIL_QUEUE_RETENTION_DAYS ago. Returns the number
+    deleted.
+    """
+    chunk_size = chunk_size or _setting('EMAIL_QUEUE_PURGE_CHUNK_SIZE', 1000)
+    before = before or timezone.now() - timedelta(days=_setting('EMAIL_QUEUE_RETENTION_DAYS', 7))
+
+    deleted = 0
+    while True:
+        ids = list(
+            OutboundEmail.objects.exclude(status='PENDING').filter(created_at__lt=before)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += OutboundEmail.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,281 @@
+"""
+Mobile money settlement and deferred operator dispatch.
+
+``apply_outcome`` is the single place where an operator outcome is applied
+to an operation and its account; ``settle_mobile_money`` wraps it for one
+operation (inline path of ``process_mobile_money``, dispatcher) and
+``SettlementBatch`` for whole batches (webhook ingestion, reconciliation).
+
+With MOBILE_MONEY_DISPATCH_MODE='deferred' the view only records the
+PENDING operation and a ``MobileMoneyDispatch`` row; the
+``run_mobile_money_dispatcher`` command sends the queued requests with a
+thread pool and settles the answers.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models import Account, MobileMoneyDispatch, MobileMoneyTransaction
+from .circuit_breaker import OPEN
+from . import ledger
+from .dashboard import invalidate_dashboard
+from .mobile_money_client import (
+    initiate_mobile_money_transaction, operator_breaker, MobileMoneyAPIError, OperatorUnavailable,
+)
+from .user_totals import add_to_totals
+
+FINAL_STATUSES = {'SUCCESS', 'FAILED'}
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def _truncate(message, length=120):
+    return str(message or '')[:length]
+
+
+def apply_outcome(mm_transaction, account, status, *, operator_reference=None, response_code='', message='',
+                  dispatched=False):
+    """Apply an operator outcome to locked, in-memory rows.
+
+    Returns ``(changed, balance_changed, totals_delta)``: whether the
+    operation and the account need saving, and the signed amount to add to
+    the user's deposit/withdraw total (0 if none). A SUCCESS credits a
+    deposit or debits a withdraw once; a withdraw the balance can no longer
+    cover is marked FAILED. A late "pending" answer (e.g. the dispatcher
+    after the webhook) never reopens a settled operation.
+    """
+    previous_status = mm_transaction.status
+    if status == 'PENDING' and previous_status in FINAL_STATUSES:
+        if dispatched and mm_transaction.dispatched_at is None:
+            mm_transaction.dispatched_at = timezone.now()
+            return True, False, 0
+        return False, False, 0
+
+    mm_transaction.status = status
+    if operator_reference is not None:
+        mm_transaction.operator_reference = str(operator_reference).strip()[:100]
+    mm_transaction.response_code = str(response_code or '').strip()[:30]
+    mm_transaction.response_message = _truncate(message)
+    if dispatched:
+        mm_transaction.dispatched_at = timezone.now()
+
+    balance_changed = False
+    if previous_status != 'SUCCESS' and status == 'SUCCESS':
+        if mm_transaction.direction == 'DEPOSIT':
+            account.balance += mm_transaction.amount
+            balance_changed = True
+        elif account.balance >= mm_transaction.amount:
+            account.balance -= mm_transaction.amount
+            balance_changed = True
+        else:
+            mm_transaction.status = 'FAILED'
+            mm_transaction.response_message = 'Insufficient balance during settlement'
+
+    if mm_transaction.status in FINAL_STATUSES:
+        mm_transaction.processed_at = timezone.now()
+
+    totals_delta = 0
+    if (previous_status == 'SUCCESS') != (mm_transaction.status == 'SUCCESS'):
+        totals_delta = mm_transaction.amount if mm_transaction.status == 'SUCCESS' else -mm_transaction.amount
+
+    return True, balance_changed, totals_delta
+
+
+def totals_field(mm_transaction):
+    return 'total_deposit' if mm_transaction.direction == 'DEPOSIT' else 'total_withdraw'
+
+
+def ledger_journal(mm_transaction, account):
+    """Journal of a settled operation: the account against the operator's float."""
+    amount = mm_transaction.amount if mm_transaction.direction == 'DEPOSIT' else -mm_transaction.amount
+    return ledger.journal('MOBILE_MONEY', [
+        (account.number, amount), (ledger.mobile_money_account(mm_transaction.operator), -amount),
+    ], reference=mm_transaction.external_reference)
+
+
+def settle_mobile_money(mm_transaction_id, status, **outcome):
+    """Apply an operator outcome to one operation and return ``(mm_transaction, account)``.
+
+    The account is locked before the operation, the same order as every other
+    balance change, so the dispatcher, the webhook and the view cannot
+    deadlock on each other. See ``apply_outcome`` for the keyword arguments.
+    """
+    with db_transaction.atomic():
+        account_number = MobileMoneyTransaction.objects.values_list('account_id', flat=True).get(id=mm_transaction_id)
+        account = Account.objects.select_for_update().get(number=account_number)
+        mm_transaction = MobileMoneyTransaction.objects.select_for_update().get(id=mm_transaction_id)
+
+        changed, balance_changed, totals_delta = apply_outcome(mm_transaction, account, status, **outcome)
+        if balance_changed:
+            account.save(update_fields=['balance'])
+            ledger.post_many([ledger_journal(mm_transaction, account)])
+        if totals_delta:
+            add_to_totals(mm_transaction.user_id, **{totals_field(mm_transaction): totals_delta})
+        if changed:
+            mm_transaction.save()
+            invalidate_dashboard(mm_transaction.user_id)
+
+    return mm_transaction, account
+
+
+def lock_operations(references):
+    """Lock the operations with these external references and their accounts.
+
+    Must run inside an atomic block. One query per table, accounts first.
+    Returns ``(operations, accounts)`` keyed by external reference and by
+    account number.
+    """
+    account_numbers = set(
+        MobileMoneyTransaction.objects.filter(external_reference__in=references).values_list('account_id', flat=True)
+    )
+    accounts = {
+        account.number: account
+        for account in Account.objects.select_for_update().filter(number__in=account_numbers).order_by('number')
+    }
+    operations = {
+        operation.external_reference: operation
+        for operation in MobileMoneyTransaction.objects.select_for_update()
+        .filter(external_reference__in=references).order_by('id')
+    }
+    return operations, accounts
+
+
+class SettlementBatch:
+    """Collect outcomes applied to rows from ``lock_operations`` and write them at once."""
+
+    def __init__(self):
+        self.operations = {}
+        self.accounts = {}
+        self.totals = defaultdict(int)
+        self.journals = []
+
+    def apply(self, mm_transaction, account, status, **outcome):
+        changed, balance_changed, totals_delta = apply_outcome(mm_transaction, account, status, **outcome)
+        if changed:
+            self.operations[mm_transaction.id] = mm_transaction
+        if balance_changed:
+            self.accounts[account.number] = account
+            self.journals.append(ledger_journal(mm_transaction, account))
+        if totals_delta:
+            self.totals[(mm_transaction.user_id, totals_field(mm_transaction))] += totals_delta
+        return changed
+
+    def save(self):
+        now = timezone.now()
+        for mm_transaction in self.operations.values():
+            mm_transaction.updated_at = now
+        MobileMoneyTransaction.objects.bulk_update(
+            self.operations.values(),
+            ['status', 'operator_reference', 'response_code', 'response_message',
+             'dispatched_at', 'processed_at', 'updated_at'],
+        )
+        Account.objects.bulk_update(self.accounts.values(), ['balance'])
+        ledger.post_many(self.journals)
+        for (user_id, field), delta in self.totals.items():
+            add_to_totals(user_id, **{field: delta})
+
+        user_ids = {mm_transaction.user_id for mm_transaction in self.operations.values()}
+        if user_ids:
+            invalidate_dashboard(*user_ids)
+
+
+def enqueue_dispatch(mm_transaction, phone_number, customer_name):
+    """Queue an operation for the dispatcher (inside the view's atomic block)."""
+    return MobileMoneyDispatch.objects.create(
+        mm_transaction=mm_transaction,
+        phone_number=phone_number,
+        customer_name=customer_name[:201],
+    )
+
+
+def _claim_batch(batch_size):
+    """Lease a batch of due dispatch rows, skipping operators whose circuit is open."""
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('MOBILE_MONEY_DISPATCH_LEASE_SECONDS', 120))
+    open_operators = [
+        operator for operator, _label in MobileMoneyTransaction.OPERATOR_CHOICES
+        if operator_breaker(operator).state == OPEN
+    ]
+
+    with db_transaction.atomic():
+        claimed_ids = list(
+            MobileMoneyDispatch.objects
+            .select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .exclude(mm_transaction__operator__in=open_operators)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not claimed_ids:
+            return []
+        MobileMoneyDispatch.objects.filter(id__in=claimed_ids).update(next_attempt_at=now + lease)
+
+    return list(MobileMoneyDispatch.objects.filter(id__in=claimed_ids).select_related('mm_transaction'))
+
+
+def _send(entry):
+    mm_transaction = entry.mm_transaction
+    try:
+        return entry, initiate_mobile_money_transaction(
+            operator=mm_transaction.operator,
+            direction=mm_transaction.direction,
+            phone_number=entry.phone_number,
+            amount=mm_transaction.amount,
+            external_reference=mm_transaction.external_reference,
+            customer_name=entry.customer_name,
+        ), None
+    except MobileMoneyAPIError as error:
+        return entry, None, error
+
+
+def process_dispatch_batch(batch_size=None, max_in_flight=None):
+    """Send one batch of queued operations and settle the answers.
+
+    Returns a ``(sent, deferred, failed)`` tuple: *deferred* rows hit an open
+    circuit and stay queued, *failed* rows got an operator error and are
+    settled as FAILED, like the inline path does.
+    """
+    batch_size = batch_size or _setting('MOBILE_MONEY_DISPATCH_BATCH_SIZE', 50)
+    max_in_flight = max_in_flight or _setting('MOBILE_MONEY_DISPATCH_MAX_IN_FLIGHT', 8)
+
+    entries = _claim_batch(batch_size)
+    if not entries:
+        return 0, 0, 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(entries)))) as pool:
+        results = list(pool.map(_send, entries))
+
+    sent = deferred = failed = 0
+    retry_at = timezone.now() + timedelta(seconds=_setting('CIRCUIT_BREAKER_RESET_TIMEOUT', 30))
+
+    for entry, response, error in results:
+        if isinstance(error, OperatorUnavailable):
+            MobileMoneyDispatch.objects.filter(id=entry.id).update(attempts=entry.attempts + 1, next_attempt_at=retry_at)
+            deferred += 1
+            continue
+
+        if error is not None:
+            outcome = {'status': 'FAILED', 'message': error}
+            failed += 1
+        else:
+            status = response.get('status', 'PENDING')
+            outcome = {
+                'status': status if status in {'PENDING', 'SUCCESS', 'FAILED'} else 'PENDING',
+                'operator_reference': response.get('operator_reference', ''),
+                'response_code': response.get('response_code', ''),
+                'message': response.get('message', ''),
+            }
+            sent += 1
+
+        with db_transaction.atomic():
+            settle_mobile_money(entry.mm_transaction_id, outcome.pop('status'), dispatched=True, **outcome)
+            entry.delete()
+
+    return sent, deferred, failed
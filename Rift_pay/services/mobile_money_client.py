@@ -1,15 +1,28 @@
-import json
-from urllib.error import HTTPError, URLError
 from urllib.parse import urljoin
-from urllib.request import Request, urlopen
 
 from django.conf import settings
 
+from ..money import Money
+from .circuit_breaker import CircuitBreaker
+from .http import (
+    post_json, UpstreamHTTPError, UpstreamUnreachable, UpstreamTimeout,
+    UpstreamInvalidResponse, UpstreamCircuitOpen,
+)
+
 
 class MobileMoneyAPIError(Exception):
     pass
 
 
+class OperatorUnavailable(MobileMoneyAPIError):
+    """The operator's circuit breaker is open; nothing was sent."""
+
+
+def operator_breaker(operator):
+    """Circuit breaker shared by every worker for one operator (ORANGE, MTN)."""
+    return CircuitBreaker(f"operator:{operator.upper().strip()}")
+
+
 def _build_operator_config(operator):
     op = operator.upper().strip()
     if op == 'ORANGE':
@@ -19,6 +32,7 @@ def _build_operator_config(operator):
             'token': getattr(settings, 'ORANGE_MONEY_TOKEN', '').strip(),
             'collection_path': getattr(settings, 'ORANGE_MONEY_COLLECTION_PATH', '/api/collections').strip(),
             'disbursement_path': getattr(settings, 'ORANGE_MONEY_DISBURSEMENT_PATH', '/api/disbursements').strip(),
+            'status_path': getattr(settings, 'ORANGE_MONEY_STATUS_PATH', '/api/transactions/status').strip(),
         }
     if op == 'MTN':
         return {
@@ -27,6 +41,7 @@ def _build_operator_config(operator):
             'token': getattr(settings, 'MTN_MONEY_TOKEN', '').strip(),
             'collection_path': getattr(settings, 'MTN_MONEY_COLLECTION_PATH', '/api/collections').strip(),
             'disbursement_path': getattr(settings, 'MTN_MONEY_DISBURSEMENT_PATH', '/api/disbursements').strip(),
+            'status_path': getattr(settings, 'MTN_MONEY_STATUS_PATH', '/api/transactions/status').strip(),
         }
     raise MobileMoneyAPIError('Unsupported operator')
 
@@ -44,34 +59,26 @@ def _simulate_success(reference, operator):
     }
 
 
-def _post_operator_request(url, token, payload, idempotency_key):
+def _post_operator_request(url, token, payload, idempotency_key, breaker=None):
     headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
         'X-Idempotency-Key': idempotency_key,
     }
     if token:
         headers['Authorization'] = f'Bearer {token}'
 
-    request = Request(
-        url=url,
-        data=json.dumps(payload).encode('utf-8'),
-        headers=headers,
-        method='POST'
-    )
-
     try:
-        with urlopen(request, timeout=getattr(settings, 'MOBILE_MONEY_API_TIMEOUT', 20)) as response:
-            raw = response.read().decode('utf-8')
-            data = json.loads(raw) if raw else {}
-    except HTTPError as error:
-        detail = error.read().decode('utf-8', errors='ignore')
-        raise MobileMoneyAPIError(f'Operator API error ({error.code}): {detail[:400]}')
-    except URLError as error:
-        raise MobileMoneyAPIError(f'Operator API unreachable: {error.reason}')
-    except TimeoutError:
+        data = post_json(
+            url, payload, headers=headers, timeout=getattr(settings, 'MOBILE_MONEY_API_TIMEOUT', 20), breaker=breaker,
+        )
+    except UpstreamHTTPError as error:
+        raise MobileMoneyAPIError(f'Operator API error ({error.status_code}): {error.detail[:400]}')
+    except UpstreamCircuitOpen:
+        raise OperatorUnavailable('Operator API unavailable (circuit open)')
+    except UpstreamTimeout:
         raise MobileMoneyAPIError('Operator API timeout reached')
-    except json.JSONDecodeError:
+    except UpstreamUnreachable as error:
+        raise MobileMoneyAPIError(f'Operator API unreachable: {error}')
+    except UpstreamInvalidResponse:
         raise MobileMoneyAPIError('Operator API returned invalid JSON')
 
     return {
@@ -88,7 +95,7 @@ def initiate_mobile_money_transaction(*, operator, direction, phone_number, amou
 
     payload = {
         'reference': external_reference,
-        'amount': str(amount),
+        'amount': str(Money.parse(amount)),
         'currency': 'FCFA',
         'phone_number': phone_number,
         'customer_name': customer_name,
@@ -107,6 +114,29 @@ def initiate_mobile_money_transaction(*, operator, direction, phone_number, amou
         token=config['token'],
         payload=payload,
         idempotency_key=external_reference,
+        breaker=operator_breaker(config['name']),
+    )
+
+    if response['status'] not in {'PENDING', 'SUCCESS', 'FAILED'}:
+        response['status'] = 'PENDING'
+
+    return response
+
+
+def query_mobile_money_status(*, operator, external_reference):
+    """Ask the operator for the current status of an operation sent earlier."""
+    config = _build_operator_config(operator)
+
+    if _mobile_money_mode() == 'manual' or not config['base_url']:
+        return _simulate_success(external_reference, config['name'])
+
+    url = urljoin(config['base_url'].rstrip('/') + '/', config['status_path'].lstrip('/'))
+    response = _post_operator_request(
+        url=url,
+        token=config['token'],
+        payload={'reference': external_reference},
+        idempotency_key=f"status-{external_reference}",
+        breaker=operator_breaker(config['name']),
     )
 
     if response['status'] not in {'PENDING', 'SUCCESS', 'FAILED'}:
@@ -0,0 +1,305 @@
+"""
+Load generator for the NFC terminal API (``/api/nfc/pay/``).
+
+``provision_fleet`` creates (or tops up) a fleet of test terminals and
+active cards, each card on its own funded account; ``run_load`` then fires
+taps at a target rate from an asyncio loop and ``verify_balances`` checks
+the database afterwards. Used by ``manage.py nfc_load_test``.
+
+The load is open-loop: tap *i* is sent at ``start + i / rps`` whether or
+not earlier taps have answered, so a slow server shows up as latency and
+lock waits instead of silently lowering the request rate. At most
+*concurrency* taps are in flight; a tap due while the client is saturated
+is counted as skipped rather than queued.
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import transaction as db_transaction
+from django.db.models import Sum
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from ..models import Account, LedgerEntry, NFCCard, NFCPaymentTransaction, NFCTerminal, User
+from ..money import Money
+from . import ledger, numbers
+from .terminal_auth import invalidate_terminal_auth
+
+TERMINAL_PREFIX = 'LOAD-TERM-'
+EMAIL_DOMAIN = 'nfc-load.invalid'
+
+
+def terminal_id(index):
+    return f'{TERMINAL_PREFIX}{index:04d}'
+
+
+def card_uid(index):
+    return f'4C{index:08X}'
+
+
+def ensure_terminal(terminal_id, merchant, location, api_key_hash):
+    """Create the terminal if missing; returns ``(terminal, created)``."""
+    return NFCTerminal.objects.get_or_create(
+        terminal_id=terminal_id,
+        defaults={
+            'merchant_name': merchant,
+            'location': location,
+            'api_key_hash': api_key_hash,
+            'is_active': True,
+        },
+    )
+
+
+def _provision_cards(count, balance, daily_limit, per_transaction_limit):
+    emails = [f'load-card-{index}@{EMAIL_DOMAIN}' for index in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    missing = [(index, email) for index, email in enumerate(emails) if email not in existing]
+
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(name='Load', prenom=f'Card {index}', email=email, password=password, phone=f'+000{index:08d}')
+            for index, email in missing
+        ])
+        users = dict(User.objects.filter(email__in=[email for _i, email in missing]).values_list('email', 'user_id'))
+        account_numbers = numbers.allocate_many('account', len(missing))
+        nfc_numbers = numbers.allocate_many('nfc', len(missing))
+        Account.objects.bulk_create([
+            Account(user_id=users[email], number=number, balance=Decimal('0.00'))
+            for (_index, email), number in zip(missing, account_numbers)
+        ])
+        NFCCard.objects.bulk_create([
+            NFCCard(
+                nfc_number=nfc_number, card_uid=card_uid(index), label=f'Load card {index}',
+                user_id=users[email], account_id=number, status='ACTIVE',
+                linked_at=timezone.now(),
+            )
+            for (index, email), number, nfc_number in zip(missing, account_numbers, nfc_numbers)
+        ])
+
+    cards = NFCCard.objects.filter(user__email__in=emails)
+    limits = {'status': 'ACTIVE'}
+    if daily_limit is not None:
+        limits['daily_limit'] = daily_limit
+    if per_transaction_limit is not None:
+        limits['per_transaction_limit'] = per_transaction_limit
+    cards.update(**limits)
+
+    # Fund every account to exactly *balance*, through the ledger.
+    accounts = list(Account.objects.select_for_update().filter(nfc_cards__in=cards).order_by('number'))
+    journals = []
+    for account in accounts:
+        delta = balance - account.balance
+        if delta:
+            journals.append(ledger.journal(
+                'ADJUSTMENT', [(ledger.SYSTEM_OPENING, -delta), (account.number, delta)], reference='nfc-load-test',
+            ))
+            account.balance = balance
+    Account.objects.bulk_update(accounts, ['balance'])
+    ledger.post_many(journals)
+
+    return list(cards.values_list('card_uid', flat=True).order_by('card_uid')), [a.number for a in accounts]
+
+
+def provision_fleet(terminals, cards, raw_key, balance, daily_limit=None, per_transaction_limit=None):
+    """Create *terminals* terminals keyed with *raw_key* and *cards* active cards.
+
+    Re-running is cheap: existing terminals and cards are reused (terminals
+    are re-keyed with *raw_key* if needed) and every card's account is reset
+    to *balance*. Returns ``(terminal_ids, card_uids,
+    account_numbers)``.
+    """
+    api_key_hash = make_password(raw_key)
+    terminal_ids = [terminal_id(index) for index in range(terminals)]
+    with db_transaction.atomic():
+        for index, tid in enumerate(terminal_ids):
+            terminal, created = ensure_terminal(tid, f'Load merchant {index}', 'Load test', api_key_hash)
+            if created:
+                continue
+            update_fields = []
+            if not terminal.is_active:
+                terminal.is_active = True
+                update_fields.append('is_active')
+            if not check_password(raw_key, terminal.api_key_hash):
+                # Re-run with another --key.
+                terminal.api_key_hash = api_key_hash
+                update_fields.append('api_key_hash')
+            if update_fields:
+                terminal.save(update_fields=update_fields)
+                invalidate_terminal_auth(tid)
+        card_uids, account_numbers = _provision_cards(cards, balance, daily_limit, per_transaction_limit)
+    return terminal_ids, card_uids, account_numbers
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = min(max(1, math.ceil(fraction * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+class LoadReport:
+    """Outcomes of a load run."""
+
+    def __init__(self):
+        self.latencies = []
+        self.approved = 0
+        self.approved_amount = Money(0)
+        self.declines = Counter()
+        self.errors = Counter()
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    @property
+    def sent(self):
+        return len(self.latencies)
+
+    @property
+    def lock_errors(self):
+        """Taps that died waiting on a row lock: client timeouts and lock/deadlock 5xx."""
+        return self.errors['timeout'] + self.errors['lock']
+
+    @property
+    def throughput(self):
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def latency(self, fraction):
+        return percentile(sorted(self.latencies), fraction)
+
+    def record(self, latency, outcome, detail, amount):
+        self.latencies.append(latency)
+        if outcome == 'approved':
+            self.approved += 1
+            self.approved_amount += amount
+        elif outcome == 'declined':
+            self.declines[detail] += 1
+        else:
+            self.errors[detail] += 1
+
+
+def _classify(response):
+    """``(outcome, detail)`` of one tap response."""
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    if response.status_code == 200:
+        if data.get('success'):
+            return 'approved', ''
+        return 'declined', data.get('reason') or 'unknown'
+    if response.status_code >= 500:
+        # Lock timeouts and deadlocks (when the server shows its errors).
+        if 'lock' in response.text.lower():
+            return 'error', 'lock'
+        return 'error', f'HTTP {response.status_code}'
+    return 'error', f"HTTP {response.status_code}: {data.get('error', '')}".rstrip(': ')
+
+
+def _session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def send_tap(session, url, raw_key, payload, timeout):
+    """POST one tap; returns ``(outcome, detail)``."""
+    try:
+        response = session.post(url, json=payload, headers={'X-Terminal-Key': raw_key}, timeout=timeout)
+    except requests.Timeout:
+        return 'error', 'timeout'
+    except requests.RequestException as error:
+        return 'error', f'connection: {type(error).__name__}'
+    return _classify(response)
+
+
+async def _drive(url, raw_key, terminal_ids, card_uids, amounts, rps, duration, concurrency, timeout, seed, send):
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    report = LoadReport()
+    in_flight = set()
+    session = _session(concurrency)
+
+    async def tap(payload, amount):
+        started = time.perf_counter()
+        outcome, detail = await loop.run_in_executor(pool, send, session, url, raw_key, payload, timeout)
+        report.record(time.perf_counter() - started, outcome, detail, amount)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for index in range(int(rps * duration)):
+            delay = start + index / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= concurrency:
+                report.skipped += 1
+                continue
+            amount = Money.parse(rng.randint(*amounts))
+            payload = {
+                'terminal_id': rng.choice(terminal_ids),
+                'card_uid': rng.choice(card_uids),
+                'amount': amount.to_json(),
+                'currency': 'FCFA',
+            }
+            task = asyncio.ensure_future(tap(payload, amount))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        report.elapsed = time.perf_counter() - start
+
+    session.close()
+    return report
+
+
+def run_load(base_url, raw_key, terminal_ids, card_uids, rps, duration, concurrency=64,
+             amounts=(100, 1000), timeout=10.0, seed=None, send=send_tap):
+    """Tap random cards on random terminals at *rps* for *duration* seconds.
+
+    *amounts* is the ``(min, max)`` range of whole FCFA per tap. Returns a
+    ``LoadReport``.
+    """
+    url = f"{base_url.rstrip('/')}/api/nfc/pay/"
+    return asyncio.run(_drive(
+        url, raw_key, terminal_ids, card_uids, amounts, rps, duration, concurrency, timeout, seed, send,
+    ))
+
+
+def verify_balances(terminal_ids, account_numbers, funded_total, since):
+    """Check the fleet's accounts after a run started at *since*.
+
+    Returns a dict with the accounts that went negative and the totals that
+    must agree: what the accounts lost, what the successful NFC payments
+    add up to, and what the merchants' ledger accounts received.
+    """
+    balance_total = Account.objects.filter(number__in=account_numbers).aggregate(total=Sum('balance'))['total']
+    paid_total = NFCPaymentTransaction.objects.filter(
+        account_id__in=account_numbers, status='SUCCESS', created_at__gte=since,
+    ).aggregate(total=Sum('amount'))['total']
+    merchant_total = LedgerEntry.objects.filter(
+        account__in=[ledger.nfc_merchant_account(tid) for tid in terminal_ids],
+        kind='NFC_PAYMENT', created_at__gte=since,
+    ).aggregate(total=Sum('amount'))['total']
+
+    debited = Money.from_decimal(funded_total - (balance_total or Decimal('0')))
+    paid = Money.from_decimal(paid_total or Decimal('0'))
+    received = merchant_total or Money(0)
+    return {
+        'negative': list(
+            Account.objects.filter(number__in=account_numbers, balance__lt=0).values_list('number', flat=True)
+        ),
+        'debited': debited,
+        'paid': paid,
+        'received': received,
+        'reconciled': debited == paid == received,
+    }
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.utils import timezone
+
+from ..models import NFCDailySpend
+
+
+def lock_daily_spend(nfc_card, day=None):
+    """Return the card's spend row for *day* (default: today), locked FOR UPDATE.
+
+    Must be called inside an atomic block, after the account row has been
+    locked, so concurrent taps on the same card see each other's debits.
+    """
+    day = day or timezone.now().date()
+    spend, _created = NFCDailySpend.objects.select_for_update().get_or_create(
+        nfc_card=nfc_card,
+        day=day,
+    )
+    return spend
+
+
+def record_daily_spend(spend, amount):
+    spend.amount += amount
+    spend.save(update_fields=['amount', 'updated_at'])
+
+
+def get_spent_today(nfc_card):
+    today = timezone.now().date()
+    amount = (
+        NFCDailySpend.objects.filter(nfc_card=nfc_card, day=today)
+        .values_list('amount', flat=True)
+        .first()
+    )
+    return amount if amount is not None else Decimal('0.00')
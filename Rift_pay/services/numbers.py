@@ -0,0 +1,164 @@
+"""
+Account, bank card and NFC card number allocation.
+
+Numbers come from a per-kind counter instead of ``random`` plus an
+``.exists()`` loop: each counter value is used once, so a number is unique
+without looking at the tables. The value goes through a keyed
+format-preserving permutation (a Feistel network over the number's digits,
+cycle-walked back into range), so consecutive values do not give
+consecutive numbers, and a Luhn check digit is appended so that typos are
+caught before any lookup.
+
+On PostgreSQL the counters are sequences: ``nextval`` ignores transaction
+rollback, so each process reserves a block of ``NUMBER_BLOCK_SIZE`` values
+at a time and hands them out from memory (a rollback or a restart only
+leaves gaps). Elsewhere (SQLite in development and tests) the counter is a
+``NumberSequence`` row, locked and advanced by exactly the count requested
+within the caller's transaction.
+
+Allocated numbers start with a ``0`` digit, which the old random
+generators never produced, so they cannot collide with numbers issued
+before this allocator.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+
+from ..models import NumberSequence
+
+
+class NumberSpaceExhausted(Exception):
+    pass
+
+
+class _Kind:
+    def __init__(self, name, digits, render):
+        self.name = name
+        # Permuted digits, between the leading '0' and the check digit.
+        self.digits = digits
+        self.render = render
+
+    @property
+    def sequence(self):
+        return f'rift_pay_{self.name}_number_seq'
+
+
+def _grouped(digits):
+    return ' '.join(digits[i:i + 4] for i in range(0, len(digits), 4))
+
+
+KINDS = {
+    # 'ACC' + 10 digits, as accepted by validators.validate_account_number.
+    'account': _Kind('account', 8, lambda digits: f'ACC{digits}'),
+    # 16 digits in groups of four.
+    'card': _Kind('card', 14, _grouped),
+    # 'NFC ' + 12 digits in groups of four.
+    'nfc': _Kind('nfc', 10, lambda digits: f'NFC {_grouped(digits)}'),
+}
+
+_blocks = {}
+_blocks_pid = None
+_blocks_lock = threading.Lock()
+
+
+def luhn_check_digit(digits):
+    """Luhn check digit to append to the string of *digits*."""
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def luhn_valid(number):
+    """True if the digits of *number* (spaces and letters ignored) pass Luhn."""
+    digits = ''.join(char for char in number if char.isdigit())
+    return len(digits) > 1 and luhn_check_digit(digits[:-1]) == digits[-1]
+
+
+def _round_key(kind):
+    secret = getattr(settings, 'NUMBER_PERMUTATION_KEY', '') or settings.SECRET_KEY
+    return hmac.new(secret.encode('utf-8'), f'riftpay-number:{kind}'.encode('utf-8'), hashlib.sha256).digest()
+
+
+def permute(value, digits, key, rounds=8):
+    """Keyed bijection of ``range(10 ** digits)`` onto itself."""
+    domain = 10 ** digits
+    if not 0 <= value < domain:
+        raise ValueError(f'{value} is out of range for {digits} digit(s)')
+    half_bits = ((domain - 1).bit_length() + 1) // 2
+    mask = (1 << half_bits) - 1
+    # Feistel over 2 * half_bits bits; cycle-walk until back in range.
+    while True:
+        left, right = value >> half_bits, value & mask
+        for round_index in range(rounds):
+            mac = hmac.new(key, f'{round_index}:{right}'.encode('ascii'), hashlib.sha256).digest()
+            left, right = right, left ^ (int.from_bytes(mac[:8], 'big') & mask)
+        value = (left << half_bits) | right
+        if value < domain:
+            return value
+
+
+def format_number(kind, value, key=None):
+    """The number for counter *value* of *kind* ('account', 'card' or 'nfc')."""
+    spec = KINDS[kind]
+    if value >= 10 ** spec.digits:
+        raise NumberSpaceExhausted(f'No {kind} numbers left')
+    body = '0' + f'{permute(value, spec.digits, key or _round_key(kind)):0{spec.digits}d}'
+    return spec.render(body + luhn_check_digit(body))
+
+
+def _reserve_from_sequence(kind, count):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [KINDS[kind].sequence, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _reserve_from_table(kind, count):
+    with db_transaction.atomic():
+        sequence, _created = NumberSequence.objects.select_for_update().get_or_create(name=kind)
+        start = sequence.next_value
+        sequence.next_value = start + count
+        sequence.save(update_fields=['next_value'])
+    return list(range(start, start + count))
+
+
+def _reserve(kind, count):
+    """*count* unused counter values of *kind*."""
+    if connection.vendor != 'postgresql':
+        # Table counters roll back with the caller's transaction: never cache.
+        return _reserve_from_table(kind, count)
+
+    global _blocks_pid
+    block_size = int(getattr(settings, 'NUMBER_BLOCK_SIZE', 100))
+    with _blocks_lock:
+        if _blocks_pid != os.getpid():
+            # Forked worker: blocks reserved by the parent are not ours.
+            _blocks.clear()
+            _blocks_pid = os.getpid()
+        block = _blocks.setdefault(kind, deque())
+        if len(block) < count:
+            block.extend(_reserve_from_sequence(kind, max(block_size, count - len(block))))
+        return [block.popleft() for _ in range(count)]
+
+
+def allocate_many(kind, count):
+    """*count* new numbers of *kind*, without querying the tables they go into."""
+    if count < 1:
+        return []
+    key = _round_key(kind)
+    return [format_number(kind, value, key) for value in _reserve(kind, count)]
+
+
+def allocate(kind):
+    return allocate_many(kind, 1)[0]
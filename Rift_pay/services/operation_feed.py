@@ -0,0 +1,185 @@
+"""
+Unified, keyset-paginated feed of a user's operations.
+
+Sent transfers, received transfers, mobile money operations and NFC payments
+are merged by the database with a single ``UNION ALL`` ordered by timestamp,
+so a page costs the same whatever the length of the user's history.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import CharField, F, IntegerField, Q, Value, Case, When
+from django.db.models.functions import Coalesce, Concat
+
+from ..models import Transaction, MobileMoneyTransaction, NFCPaymentTransaction
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Tie-breaker between operations sharing a timestamp; also identifies the
+# source table so (timestamp, rank, id) is unique across the whole feed.
+RANK_SENT = 0
+RANK_RECEIVED = 1
+RANK_MOBILE_MONEY = 2
+RANK_NFC = 3
+
+_PRESENTATION = {
+    'sent': ('Sent Money', 'To', 'Date', '-'),
+    'received': ('Received Money', 'From', 'Date', '+'),
+    'deposit': ('Mobile Money Deposit', 'Operator', 'Created', '+'),
+    'withdraw': ('Mobile Money Withdrawal', 'Operator', 'Created', '-'),
+    'nfc_payment': ('NFC Payment', 'Merchant', 'Date', '-'),
+}
+
+_FEED_COLUMNS = (
+    'feed_rank', 'feed_id', 'feed_ts', 'feed_amount',
+    'feed_status', 'feed_type', 'feed_counterparty',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['feed_ts'].isoformat(), row['feed_rank'], row['feed_id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, rank, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(rank), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after_cursor(queryset, ts_field, rank, cursor):
+    """Keep the rows that sort after *cursor* in (ts, rank, id) DESC order.
+
+    The rank is constant within a branch, so the tuple comparison reduces to
+    a plain range condition on (ts, id) that the per-table indexes can serve.
+    """
+    if cursor is None:
+        return queryset
+    cursor_ts, cursor_rank, cursor_id = cursor
+    if rank < cursor_rank:
+        return queryset.filter(**{f'{ts_field}__lte': cursor_ts})
+    if rank > cursor_rank:
+        return queryset.filter(**{f'{ts_field}__lt': cursor_ts})
+    return queryset.filter(
+        Q(**{f'{ts_field}__lt': cursor_ts}) | Q(**{ts_field: cursor_ts, 'id__lt': cursor_id})
+    )
+
+
+def _branch(queryset, ts_field, rank, cursor, limit, window=None, **columns):
+    queryset = _after_cursor(queryset, ts_field, rank, cursor)
+    if window is not None:
+        queryset = queryset.filter(**{f'{ts_field}__gte': window[0], f'{ts_field}__lt': window[1]})
+    queryset = queryset.annotate(
+        feed_rank=Value(rank, output_field=IntegerField()),
+        feed_id=F('id'),
+        feed_ts=F(ts_field),
+        feed_amount=F('amount'),
+        feed_status=columns['status'],
+        feed_type=columns['type'],
+        feed_counterparty=columns['counterparty'],
+    ).values(*_FEED_COLUMNS)
+
+    # Push the LIMIT into each branch where the backend allows it, so every
+    # table contributes at most one page instead of its full history.
+    if limit is not None and connection.features.supports_slicing_ordering_in_compound:
+        queryset = queryset.order_by('-feed_ts', '-feed_id')[:limit]
+    else:
+        queryset = queryset.order_by()
+    return queryset
+
+
+def _feed_branches(user, cursor, limit, include_self_transfers=True, window=None):
+    received_transfers = Transaction.objects.filter(receiver=user)
+    if not include_self_transfers:
+        received_transfers = received_transfers.exclude(sender=user)
+
+    sent = _branch(
+        Transaction.objects.filter(sender=user), 'timestamp', RANK_SENT, cursor, limit, window=window,
+        status=Value('SUCCESS', output_field=CharField()),
+        type=Value('sent', output_field=CharField()),
+        counterparty=Concat('receiver__name', Value(' '), 'receiver__prenom', output_field=CharField()),
+    )
+    received = _branch(
+        received_transfers, 'timestamp', RANK_RECEIVED, cursor, limit, window=window,
+        status=Value('SUCCESS', output_field=CharField()),
+        type=Value('received', output_field=CharField()),
+        counterparty=Concat('sender__name', Value(' '), 'sender__prenom', output_field=CharField()),
+    )
+    mobile_money = _branch(
+        MobileMoneyTransaction.objects.filter(user=user), 'created_at', RANK_MOBILE_MONEY, cursor, limit, window=window,
+        status=F('status'),
+        type=Case(
+            When(direction='DEPOSIT', then=Value('deposit')),
+            default=Value('withdraw'),
+            output_field=CharField(),
+        ),
+        counterparty=Concat('operator', Value(' ('), 'customer_phone_masked', Value(')'), output_field=CharField()),
+    )
+    nfc = _branch(
+        NFCPaymentTransaction.objects.filter(user=user), 'created_at', RANK_NFC, cursor, limit, window=window,
+        status=F('status'),
+        type=Value('nfc_payment', output_field=CharField()),
+        counterparty=Coalesce('terminal__merchant_name', Value('NFC Payment'), output_field=CharField()),
+    )
+
+    return sent, received, mobile_money, nfc
+
+
+def _feed_queryset(user, cursor, limit, include_self_transfers=True):
+    sent, *others = _feed_branches(user, cursor, limit, include_self_transfers)
+    return sent.union(*others, all=True).order_by('-feed_ts', '-feed_rank', '-feed_id')[:limit]
+
+
+def statement_queryset(user, start, end):
+    """Every operation of *user* with ``start <= timestamp < end``, oldest first."""
+    sent, *others = _feed_branches(user, None, None, window=(start, end))
+    return sent.union(*others, all=True).order_by('feed_ts', 'feed_rank', 'feed_id')
+
+
+def fetch_recent_rows(user, limit, include_self_transfers=True):
+    """Return the raw feed rows of the *limit* most recent operations."""
+    return list(_feed_queryset(user, None, limit, include_self_transfers))
+
+
+def present_operation(row):
+    title, counterparty_label, date_label, amount_prefix = _PRESENTATION[row['feed_type']]
+    return {
+        'type': row['feed_type'],
+        'title': title,
+        'counterparty_label': counterparty_label,
+        'counterparty': row['feed_counterparty'],
+        'date_label': date_label,
+        'date': row['feed_ts'],
+        'amount_prefix': amount_prefix,
+        'amount': row['feed_amount'],
+        'status': row['feed_status'],
+    }
+
+
+def fetch_operations(user, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return ``(operations, next_cursor)`` for one page of the user's feed.
+
+    *cursor* is the opaque string returned by the previous page (or None for
+    the first page); *next_cursor* is None once the history is exhausted.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    decoded = decode_cursor(cursor) if cursor else None
+
+    rows = list(_feed_queryset(user, decoded, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    return [present_operation(row) for row in rows], next_cursor
+
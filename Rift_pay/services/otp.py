@@ -0,0 +1,61 @@
+"""
+Email OTPs for two-factor login.
+
+Codes are stored as a keyed hash (HMAC-SHA256 keyed with SECRET_KEY, over
+the user id and the code), so the table does not leak usable codes. Each
+user has at most one unused OTP: issuing a new code replaces the previous
+one in place, and verification reads that single row through the partial
+unique index on ``user``. A used OTP is expired on the spot, so the purge
+only has to look at ``expires_at``.
+"""
+
+from datetime import timedelta
+import secrets
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from ..models import EmailOTP
+
+
+def hash_otp(user_id, code):
+    return salted_hmac('riftpay-email-otp', f'{user_id}:{code}', algorithm='sha256').hexdigest()
+
+
+def issue_otp(user):
+    """Create or replace the user's live OTP; returns ``(code, expires_at)``."""
+    code = f"{secrets.randbelow(1000000):06d}"
+    expires_at = timezone.now() + timedelta(minutes=getattr(settings, 'OTP_EXPIRY_MINUTES', 10))
+    EmailOTP.objects.update_or_create(
+        user=user, is_used=False,
+        defaults={'code_hash': hash_otp(user.user_id, code), 'expires_at': expires_at},
+    )
+    return code, expires_at
+
+
+def consume_otp(user, code):
+    """Return True and use up the user's OTP if *code* matches and has not expired."""
+    now = timezone.now()
+    otp = EmailOTP.objects.filter(user=user, is_used=False).only('id', 'code_hash', 'expires_at').first()
+    if otp is None or otp.expires_at <= now or not constant_time_compare(otp.code_hash, hash_otp(user.user_id, code)):
+        return False
+    # Conditional UPDATE: of two concurrent submissions of the code, one wins.
+    return EmailOTP.objects.filter(id=otp.id, is_used=False).update(is_used=True, expires_at=now) == 1
+
+
+def purge_expired_otps(chunk_size=None, before=None):
+    """Delete expired (and used) OTPs in chunks; returns the number deleted."""
+    chunk_size = chunk_size or int(getattr(settings, 'OTP_PURGE_CHUNK_SIZE', 1000))
+    before = before or timezone.now()
+
+    deleted = 0
+    while True:
+        ids = list(
+            EmailOTP.objects.filter(expires_at__lte=before)
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += EmailOTP.objects.filter(id__in=ids).delete()[0]
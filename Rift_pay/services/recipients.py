@@ -0,0 +1,199 @@
+"""
+Recipient resolution for the transfer form.
+
+Exact lookups (email, phone, account number) are cached in two tiers: a
+small per-process LRU that absorbs the repeated calls of one typing session,
+and the shared cache so every worker benefits. Misses are cached too, for a
+shorter time, so probing unknown values does not reach the database either.
+Phone numbers are matched on their digits only (``User.phone_normalized``).
+
+``suggest_recipients`` serves the autocomplete mode with prefix queries on
+indexed columns. It returns masked identifiers, except for one typed in
+full, so prefixes do not reveal other customers' emails, phones or account
+numbers.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import Account, User
+from ..validators import normalize_phone
+
+LOOKUP_TYPES = ('email', 'phone', 'account')
+
+_MISS = {'found': False}
+
+
+class _LocalLRU:
+    """Thread-safe LRU with a per-entry expiry."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = _LocalLRU(int(getattr(settings, 'RECIPIENT_LRU_SIZE', 1024)))
+
+
+def _normalize(lookup_type, value):
+    value = (value or '').strip()
+    if lookup_type == 'phone':
+        return normalize_phone(value)
+    if lookup_type == 'account':
+        return value.upper()
+    return value
+
+
+def _cache_key(lookup_type, value):
+    return f"recipient:{lookup_type}:{value}"
+
+
+def _cached(key, ttl, load):
+    """Return the value for *key* from the LRU, the shared cache or *load*.
+
+    The local tier never keeps an entry longer than RECIPIENT_LOCAL_TTL, as
+    other workers cannot invalidate it.
+    """
+    value = _local.get(key)
+    if value is not None:
+        return value
+
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        cache.set(key, value, ttl(value))
+
+    _local.set(key, value, min(ttl(value), getattr(settings, 'RECIPIENT_LOCAL_TTL', 10)))
+    return value
+
+
+def _describe(user):
+    return {'found': True, 'user_id': user.user_id, 'name': f"{user.name} {user.prenom}"}
+
+
+def _load_recipient(lookup_type, value):
+    if lookup_type == 'account':
+        account = Account.objects.select_related('user').filter(number=value).first()
+        return _describe(account.user) if account else _MISS
+
+    if lookup_type == 'phone':
+        users = list(User.objects.filter(phone_normalized=value)[:2])
+    else:
+        users = list(User.objects.filter(email=value)[:2])
+    # A phone shared by several users cannot identify a recipient.
+    return _describe(users[0]) if len(users) == 1 else _MISS
+
+
+def _entry_ttl(entry):
+    if entry['found']:
+        return getattr(settings, 'RECIPIENT_CACHE_TTL', 300)
+    return getattr(settings, 'RECIPIENT_NEGATIVE_CACHE_TTL', 30)
+
+
+def resolve_recipient(lookup_type, value):
+    """Return ``{'user_id', 'name'}`` for the recipient, or None if not found."""
+    if lookup_type not in LOOKUP_TYPES:
+        raise ValueError(f'Unknown lookup type: {lookup_type}')
+    value = _normalize(lookup_type, value)
+    if not value:
+        return None
+
+    entry = _cached(_cache_key(lookup_type, value), _entry_ttl, lambda: _load_recipient(lookup_type, value))
+    if not entry['found']:
+        return None
+    return {'user_id': entry['user_id'], 'name': entry['name']}
+
+
+def invalidate_recipient(*lookups):
+    """Forget cached results for ``(lookup_type, value)`` pairs.
+
+    Call it when a user's name, email or phone changes or a new user or
+    account appears, with both the old and the new values.
+    """
+    keys = [_cache_key(lookup_type, _normalize(lookup_type, value)) for lookup_type, value in lookups if value]
+    for key in keys:
+        _local.delete(key)
+    cache.delete_many(keys)
+
+
+def _load_suggestions(lookup_type, prefix, limit):
+    if lookup_type == 'account':
+        accounts = Account.objects.select_related('user').filter(number__startswith=prefix).order_by('number')[:limit]
+        return [{**_describe(account.user), 'value': account.number} for account in accounts]
+
+    if lookup_type == 'phone':
+        users = User.objects.filter(phone_normalized__startswith=prefix).order_by('phone_normalized')[:limit]
+        return [{**_describe(user), 'value': user.phone} for user in users]
+
+    users = User.objects.filter(email__startswith=prefix).order_by('email')[:limit]
+    return [{**_describe(user), 'value': user.email} for user in users]
+
+
+def _mask(lookup_type, value):
+    if lookup_type == 'email':
+        local, _at, domain = value.partition('@')
+        return f"{local[:2]}•••@{domain}"
+    # Phones and account numbers: last digits only, like masked card numbers.
+    return f"•••{value[-2:]}" if lookup_type == 'phone' else f"{value[:3]}•••{value[-4:]}"
+
+
+def suggest_recipients(lookup_type, prefix, limit=None):
+    """Return up to *limit* recipients whose email/phone/account starts with *prefix*.
+
+    ``value`` is masked unless it is exactly what was typed.
+
+    Prefixes shorter than RECIPIENT_SUGGEST_MIN_LENGTH return nothing, so a
+    suggestion query is always a narrow range scan on an indexed column.
+    """
+    if lookup_type not in LOOKUP_TYPES:
+        raise ValueError(f'Unknown lookup type: {lookup_type}')
+    prefix = _normalize(lookup_type, prefix)
+    if len(prefix) < getattr(settings, 'RECIPIENT_SUGGEST_MIN_LENGTH', 3):
+        return []
+    limit = limit or getattr(settings, 'RECIPIENT_SUGGEST_LIMIT', 5)
+
+    suggestions = _cached(
+        f"recipient-suggest:{lookup_type}:{limit}:{prefix}",
+        lambda _value: getattr(settings, 'RECIPIENT_NEGATIVE_CACHE_TTL', 30),
+        lambda: _load_suggestions(lookup_type, prefix, limit),
+    )
+    return [
+        {
+            'user_id': item['user_id'],
+            'name': item['name'],
+            'value': item['value'] if _normalize(lookup_type, item['value']) == prefix else _mask(lookup_type, item['value']),
+        }
+        for item in suggestions
+    ]
@@ -0,0 +1,220 @@
+"""
+Reconciliation of operations stuck in PENDING.
+
+* Blockchain proofs with a ``local-<id>`` reference are transfers the outbox
+  gave up on; they are submitted to the Stellar backend again.
+* Mobile money operations sent to an operator whose webhook never arrived are
+  looked up with the operator's status API and settled like a webhook would.
+
+Stale rows are walked in id order (keyset pagination), one chunk at a time.
+A chunk is claimed with SKIP LOCKED and stamped with ``reconciled_at``, which
+keeps it away from other workers for RECONCILE_RETRY_SECONDS, so several
+``manage.py reconcile`` processes can run at once. Upstream calls run on a
+bounded thread pool and the outcomes of a chunk are written in bulk.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from ..models import BlockchainProof, MobileMoneyDispatch, MobileMoneyTransaction, Transaction
+from .blockchain_client import sync_transaction, BlockchainSyncError
+from .circuit_breaker import OPEN
+from .mobile_money import SettlementBatch, lock_operations
+from .mobile_money_client import query_mobile_money_status, operator_breaker, MobileMoneyAPIError
+
+
+def _setting(name, default):
+    return int(getattr(settings, name, default))
+
+
+def _stale(queryset, created_field, now):
+    stale_before = now - timedelta(seconds=_setting('RECONCILE_STALE_SECONDS', 900))
+    retry_before = now - timedelta(seconds=_setting('RECONCILE_RETRY_SECONDS', 600))
+    return queryset.filter(
+        Q(reconciled_at__isnull=True) | Q(reconciled_at__lte=retry_before),
+        status='PENDING',
+        **{f'{created_field}__lte': stale_before},
+    )
+
+
+def _claim_chunk(queryset, after_id, chunk_size):
+    """Claim the next chunk of stale rows after *after_id*; returns their ids."""
+    with db_transaction.atomic():
+        claimed_ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(id__gt=after_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if claimed_ids:
+            queryset.model.objects.filter(id__in=claimed_ids).update(reconciled_at=timezone.now())
+    return claimed_ids
+
+
+def _run_pool(function, items, max_in_flight):
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(items)))) as pool:
+        return list(pool.map(function, items))
+
+
+def stale_proofs(now=None):
+    return _stale(
+        BlockchainProof.objects.filter(reference_id__startswith='local-', local_transaction_id__isnull=False),
+        'timestamp',
+        now or timezone.now(),
+    )
+
+
+def _resubmit(item):
+    proof, transfer_tx = item
+    if transfer_tx is None:
+        return proof, None, BlockchainSyncError('Local transaction not found')
+    try:
+        return proof, sync_transaction(transfer_tx), None
+    except BlockchainSyncError as error:
+        return proof, None, error
+
+
+def _reconcile_proof_chunk(proof_ids, max_in_flight):
+    proofs = list(BlockchainProof.objects.filter(id__in=proof_ids).order_by('id'))
+    transactions = Transaction.objects.select_related('sender', 'receiver').in_bulk(
+        [proof.local_transaction_id for proof in proofs]
+    )
+    results = _run_pool(
+        _resubmit, [(proof, transactions.get(proof.local_transaction_id)) for proof in proofs], max_in_flight,
+    )
+
+    synced = [(proof, sync_data) for proof, sync_data, error in results if error is None]
+    # The webhook may already have recorded the backend's reference.
+    known = set(
+        BlockchainProof.objects
+        .filter(reference_id__in=[sync_data['reference_id'] for _proof, sync_data in synced])
+        .values_list('reference_id', flat=True)
+    )
+
+    now = timezone.now()
+    updated, superseded = [], []
+    for proof, sync_data, error in results:
+        if error is not None:
+            proof.error_detail = str(error)[:255]
+            updated.append(proof)
+            continue
+        if sync_data['reference_id'] in known:
+            superseded.append(proof.id)
+            continue
+
+        confirmed = bool(sync_data.get('stellar_transaction_hash'))
+        proof.reference_id = sync_data['reference_id']
+        if confirmed:
+            proof.stellar_transaction_hash = sync_data['stellar_transaction_hash']
+        if sync_data.get('proof_hash'):
+            proof.proof_hash = sync_data['proof_hash']
+        proof.status = 'CONFIRMED' if confirmed else 'PENDING'
+        proof.synced_at = now if confirmed else None
+        proof.error_detail = ''
+        updated.append(proof)
+
+    with db_transaction.atomic():
+        BlockchainProof.objects.bulk_update(
+            updated, ['reference_id', 'stellar_transaction_hash', 'proof_hash', 'status', 'synced_at', 'error_detail'],
+        )
+        BlockchainProof.objects.filter(id__in=superseded).delete()
+
+    return len(proofs), len(synced), len(proofs) - len(synced)
+
+
+def reconcile_proofs(chunk_size=None, max_in_flight=None):
+    """Resubmit every stale ``local-`` proof; returns ``(checked, synced, failed)``."""
+    chunk_size = chunk_size or _setting('RECONCILE_CHUNK_SIZE', 200)
+    max_in_flight = max_in_flight or _setting('RECONCILE_MAX_IN_FLIGHT', 8)
+    queryset = stale_proofs()
+
+    checked = synced = failed = 0
+    after_id = 0
+    while True:
+        proof_ids = _claim_chunk(queryset, after_id, chunk_size)
+        if not proof_ids:
+            return checked, synced, failed
+        after_id = proof_ids[-1]
+        chunk_checked, chunk_synced, chunk_failed = _reconcile_proof_chunk(proof_ids, max_in_flight)
+        checked += chunk_checked
+        synced += chunk_synced
+        failed += chunk_failed
+
+
+def stale_mobile_money(now=None):
+    """PENDING operations already sent to an operator whose circuit is not open."""
+    open_operators = [
+        operator for operator, _label in MobileMoneyTransaction.OPERATOR_CHOICES
+        if operator_breaker(operator).state == OPEN
+    ]
+    queued = MobileMoneyDispatch.objects.filter(mm_transaction=OuterRef('pk'))
+    return _stale(
+        MobileMoneyTransaction.objects.exclude(operator__in=open_operators).exclude(Exists(queued)),
+        'created_at',
+        now or timezone.now(),
+    )
+
+
+def _query(operation):
+    try:
+        return operation, query_mobile_money_status(
+            operator=operation.operator, external_reference=operation.external_reference,
+        ), None
+    except MobileMoneyAPIError as error:
+        return operation, None, error
+
+
+def _reconcile_mobile_money_chunk(operation_ids, max_in_flight):
+    operations = list(
+        MobileMoneyTransaction.objects.filter(id__in=operation_ids).only('id', 'operator', 'external_reference')
+    )
+    answers = {
+        operation.external_reference: response
+        for operation, response, error in _run_pool(_query, operations, max_in_flight)
+        if error is None and response['status'] != 'PENDING'
+    }
+    if not answers:
+        return len(operations), 0
+
+    settled = 0
+    with db_transaction.atomic():
+        locked, accounts = lock_operations(answers)
+        batch = SettlementBatch()
+        for reference, response in answers.items():
+            operation = locked.get(reference)
+            # A webhook may have settled it while the operator was queried.
+            if operation is None or operation.status != 'PENDING':
+                continue
+            batch.apply(
+                operation, accounts[operation.account_id], response['status'],
+                operator_reference=response['operator_reference'] or None,
+                response_code=response['response_code'],
+                message=response['message'],
+            )
+            settled += 1
+        batch.save()
+
+    return len(operations), settled
+
+
+def reconcile_mobile_money(chunk_size=None, max_in_flight=None):
+    """Query the operators for stale PENDING operations; returns ``(checked, settled)``."""
+    chunk_size = chunk_size or _setting('RECONCILE_CHUNK_SIZE', 200)
+    max_in_flight = max_in_flight or _setting('RECONCILE_MAX_IN_FLIGHT', 8)
+    queryset = stale_mobile_money()
+
+    checked = settled = 0
+    after_id = 0
+    while True:
+        operation_ids = _claim_chunk(queryset, after_id, chunk_size)
+        if not operation_ids:
+            return checked, settled
+        after_id = operation_ids[-1]
+        chunk_checked, chunk_settled = _reconcile_mobile_money_chunk(operation_ids, max_in_flight)
+        checked += chunk_checked
+        settled += chunk_settled
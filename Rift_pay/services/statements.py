@@ -0,0 +1,188 @@
+"""
+Account statements streamed as CSV or PDF.
+
+Operations are read from the merged operation feed over a date range through
+a server-side cursor (``.iterator(chunk_size=...)``) and encoded as they
+arrive, so memory use does not grow with the length of the history. The
+PDF is written by hand (Courier text pages) so that it can be streamed
+page by page; only the page object numbers and byte offsets are kept until
+the cross-reference table at the end.
+"""
+
+import csv
+import io
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..money import Money
+from .operation_feed import present_operation, statement_queryset
+
+CSV_HEADER = ('date', 'type', 'description', 'counterparty', 'status', 'amount', 'currency')
+
+# Rows per CSV chunk handed to the response.
+_CSV_ROWS_PER_CHUNK = 500
+
+
+def statement_window(start_date, end_date):
+    """Aware ``[start, end)`` datetimes covering both dates, in local time."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def statement_title(user, account, start_date, end_date):
+    """Heading lines of the PDF statement."""
+    return [
+        'Account statement',
+        f'{user.name} {user.prenom} - {account.number if account else "no account"}',
+        f'Period: {start_date:%d/%m/%Y} - {end_date:%d/%m/%Y}',
+    ]
+
+
+def statement_operations(user, start, end, chunk_size=None):
+    """Yield the presented operations of *user* between *start* and *end*, oldest first."""
+    chunk_size = chunk_size or int(getattr(settings, 'STATEMENT_CHUNK_SIZE', 2000))
+    for row in statement_queryset(user, start, end).iterator(chunk_size=chunk_size):
+        yield present_operation(row)
+
+
+def signed_amount(operation):
+    amount = Money.parse(operation['amount'])
+    return -amount if operation['amount_prefix'] == '-' else amount
+
+
+def csv_chunks(operations):
+    """Yield the CSV statement as text chunks of a few hundred rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    rows = 0
+
+    for operation in operations:
+        writer.writerow((
+            timezone.localtime(operation['date']).isoformat(timespec='seconds'),
+            operation['type'],
+            operation['title'],
+            operation['counterparty'],
+            operation['status'],
+            str(signed_amount(operation)),
+            'FCFA',
+        ))
+        rows += 1
+        if rows % _CSV_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+class _PdfStream:
+    """Minimal PDF 1.4 writer producing bytes as pages are added."""
+
+    PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+    FONT_SIZE, LEADING, MARGIN = 8, 11, 40
+    LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+    # Objects 1-3 are fixed; pages take two objects each from 4 on.
+    CATALOG, PAGES, FONT = 1, 2, 3
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_number = 4
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def _object(self, number, body):
+        self.offsets[number] = self.offset
+        return self._emit(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    @staticmethod
+    def _text(line):
+        raw = line.encode('cp1252', errors='replace')
+        return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b') Tj T*'
+
+    def start(self):
+        yield self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        yield self._object(
+            self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        )
+
+    def page(self, lines):
+        page_number, content_number = self.next_number, self.next_number + 1
+        self.next_number += 2
+        self.pages.append(page_number)
+
+        content = b'\n'.join([
+            b'BT /F1 %d Tf %d TL %d %d Td' % (
+                self.FONT_SIZE, self.LEADING, self.MARGIN, self.PAGE_HEIGHT - self.MARGIN,
+            ),
+            *(self._text(line) for line in lines),
+            b'ET',
+        ])
+        yield self._object(content_number, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        yield self._object(page_number, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>'
+        ) % (self.PAGES, self.PAGE_WIDTH, self.PAGE_HEIGHT, self.FONT, content_number))
+
+    def finish(self):
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        yield self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+
+        xref_offset = self.offset
+        size = self.next_number
+        entries = [b'0000000000 65535 f \n']
+        entries += [b'%010d 00000 n \n' % self.offsets[number] for number in range(1, size)]
+        yield self._emit(b'xref\n0 %d\n' % size + b''.join(entries))
+        yield self._emit(
+            b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, self.CATALOG, xref_offset)
+        )
+
+
+def _pdf_line(operation):
+    date = timezone.localtime(operation['date']).strftime('%Y-%m-%d %H:%M')
+    return (
+        f"{date}  {operation['title'][:24]:<24} {str(operation['counterparty'] or '')[:30]:<30} "
+        f"{operation['status'][:9]:<9} {str(signed_amount(operation)):>14}"
+    )
+
+
+def pdf_chunks(operations, title):
+    """Yield the PDF statement as bytes, one page at a time.
+
+    *title* lines (account holder, account number, period) head the first
+    page; the credit and debit totals of successful operations end the last.
+    """
+    pdf = _PdfStream()
+    yield from pdf.start()
+
+    heading = f"{'Date':<16}  {'Operation':<24} {'Counterparty':<30} {'Status':<9} {'Amount FCFA':>14}"
+    lines = [*title, '', heading, '-' * len(heading)]
+    credits = debits = Money(0)
+
+    for operation in operations:
+        if operation['status'] == 'SUCCESS':
+            amount = signed_amount(operation)
+            if amount.minor >= 0:
+                credits += amount
+            else:
+                debits += amount
+        lines.append(_pdf_line(operation))
+        if len(lines) == pdf.LINES_PER_PAGE:
+            yield from pdf.page(lines)
+            lines = []
+
+    footer = ['', f'Total credits: {credits.format()}', f'Total debits:  {(-debits).format()}']
+    if len(lines) + len(footer) > pdf.LINES_PER_PAGE:
+        yield from pdf.page(lines)
+        lines = []
+    yield from pdf.page(lines + footer)
+    yield from pdf.finish()
@@ -0,0 +1,42 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+
+def _generation_key(terminal_id):
+    return f"nfc-terminal-auth-gen:{terminal_id}"
+
+
+def _credential_key(terminal_id, generation, raw_key):
+    # Never put the raw key in the cache: only a keyed digest of it.
+    digest = salted_hmac('riftpay-nfc-terminal-key', raw_key).hexdigest()
+    return f"nfc-terminal-auth:{terminal_id}:{generation}:{digest}"
+
+
+def verify_terminal_key(terminal, raw_key):
+    """Return True if *raw_key* is the API key of *terminal*.
+
+    A successful check is cached for NFC_TERMINAL_AUTH_CACHE_TTL seconds, so
+    only the first tap after a miss pays the password-hash cost. The cached
+    value is the key hash it was verified against, which means a rotated key
+    never matches a stale entry even before it expires.
+    """
+    generation = cache.get(_generation_key(terminal.terminal_id), 0)
+    key = _credential_key(terminal.terminal_id, generation, raw_key)
+
+    if cache.get(key) == terminal.api_key_hash:
+        return True
+
+    if not check_password(raw_key, terminal.api_key_hash):
+        return False
+
+    cache.set(key, terminal.api_key_hash, getattr(settings, 'NFC_TERMINAL_AUTH_CACHE_TTL', 300))
+    return True
+
+
+def invalidate_terminal_auth(terminal_id):
+    """Drop every cached credential for *terminal_id* (key rotation, deactivation)."""
+    cache.set(_generation_key(terminal_id), uuid.uuid4().hex, None)
@@ -0,0 +1,116 @@
+"""
+Attempt throttling for login, OTP verification, NFC terminal calls and
+recipient suggestions.
+
+A ``RateLimit`` counts attempts per identity (client IP, email, terminal id)
+over a sliding window, approximated with two fixed-window counters in the
+shared cache: the current window's count plus the previous window's count
+weighted by how much of it still overlaps the sliding window. Counters are
+bumped with ``cache.add`` + ``cache.incr``, which are atomic in Redis, so
+every gunicorn worker sees the same counts.
+
+Views consult the limits before touching a password hash or writing to the
+database, so a flood costs a couple of cache round trips per request.
+Limits are ``'<attempts>/<seconds>'`` settings; ``0`` attempts disables one.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class RateLimit:
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    @classmethod
+    def from_setting(cls, scope, name, default):
+        limit, _slash, window = str(getattr(settings, name, default)).partition('/')
+        return cls(scope, int(limit), int(window or 60))
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    def _keys(self, identity, now):
+        # Hashed: emails and IPs are not cache-key safe, nor needed in clear.
+        digest = hashlib.sha256(str(identity).strip().lower().encode('utf-8')).hexdigest()[:32]
+        index = int(now // self.window)
+        prefix = f'throttle:{self.scope}:{digest}'
+        return f'{prefix}:{index}', f'{prefix}:{index - 1}', (now % self.window) / self.window
+
+    def _estimate(self, current, previous, elapsed):
+        return current + previous * (1 - elapsed)
+
+    def count(self, identity, now=None):
+        """Attempts of *identity* in the sliding window ending now."""
+        current_key, previous_key, elapsed = self._keys(identity, now or time.time())
+        counts = cache.get_many([current_key, previous_key])
+        return self._estimate(counts.get(current_key, 0), counts.get(previous_key, 0), elapsed)
+
+    def exceeded(self, identity, now=None):
+        """True once *identity* has used up its attempts (read-only)."""
+        return self.enabled and self.count(identity, now) >= self.limit
+
+    def hit(self, identity, now=None):
+        """Record one attempt; returns False if it goes over the limit."""
+        if not self.enabled:
+            return True
+        current_key, previous_key, elapsed = self._keys(identity, now or time.time())
+        cache.add(current_key, 0, timeout=2 * self.window)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.set(current_key, 1, timeout=2 * self.window)
+            current = 1
+        return self._estimate(current, cache.get(previous_key, 0), elapsed) <= self.limit
+
+
+def login_limits():
+    """Every login attempt counts, per client IP and per email."""
+    return (
+        RateLimit.from_setting('login-ip', 'THROTTLE_LOGIN_IP', '30/60'),
+        RateLimit.from_setting('login-email', 'THROTTLE_LOGIN_EMAIL', '10/300'),
+    )
+
+
+def otp_limits():
+    """Every OTP submission counts, per client IP and per email."""
+    return (
+        RateLimit.from_setting('otp-ip', 'THROTTLE_OTP_IP', '30/60'),
+        RateLimit.from_setting('otp-email', 'THROTTLE_OTP_EMAIL', '5/300'),
+    )
+
+
+def nfc_limits():
+    """Only rejected terminal keys count, per client IP and per terminal id."""
+    return (
+        RateLimit.from_setting('nfc-ip', 'THROTTLE_NFC_IP_FAILURES', '20/60'),
+        RateLimit.from_setting('nfc-terminal', 'THROTTLE_NFC_TERMINAL_FAILURES', '10/60'),
+    )
+
+
+def suggest_limits():
+    """Every recipient-suggestion query counts, per user and per client IP."""
+    return (
+        RateLimit.from_setting('suggest-user', 'THROTTLE_SUGGEST_USER', '30/60'),
+        RateLimit.from_setting('suggest-ip', 'THROTTLE_SUGGEST_IP', '60/60'),
+    )
+
+
+def hit_all(pairs):
+    """Record one attempt on each ``(limit, identity)``; False if any is over."""
+    allowed = True
+    for limit, identity in pairs:
+        if identity and not limit.hit(identity):
+            allowed = False
+    return allowed
+
+
+def any_exceeded(pairs):
+    return any(identity and limit.exceeded(identity) for limit, identity in pairs)
@@ -0,0 +1,97 @@
+"""
+Account-to-account transfers.
+
+Both accounts are locked with a single ``SELECT ... FOR UPDATE`` ordered by
+account number, so two transfers touching the same pair of accounts always
+lock them in the same order and cannot deadlock. The balance check is done
+on the locked row and the balances are moved with ``F()`` updates, so a
+concurrent transfer can never spend the same funds twice.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F
+
+from ..models import Account, Transaction
+from .blockchain_outbox import enqueue_transaction_sync
+from . import ledger
+from .dashboard import invalidate_dashboard
+from .user_totals import add_to_totals
+
+
+class TransferError(Exception):
+    pass
+
+
+class InsufficientFunds(TransferError):
+    def __init__(self, balance):
+        self.balance = balance
+        super().__init__(f'Insufficient balance: {balance}')
+
+
+class AccountNotFound(TransferError):
+    pass
+
+
+def lock_accounts(*user_ids):
+    """Lock the accounts of *user_ids* in account-number order.
+
+    Must be called inside an atomic block. Returns ``{user_id: account}``.
+    """
+    accounts = Account.objects.select_for_update().filter(user_id__in=set(user_ids)).order_by('number')
+    return {account.user_id: account for account in accounts}
+
+
+def transfer_funds(sender, receiver, amount, open_account=None):
+    """Move *amount* from *sender*'s account to *receiver*'s.
+
+    *open_account* is called with the receiver when they have no account yet
+    and must return a new, unsaved ``Account``; without it a missing account
+    raises ``AccountNotFound``. Raises ``InsufficientFunds`` when the locked
+    sender balance does not cover *amount*.
+
+    Returns ``(transfer_tx, sender_balance)`` where *sender_balance* is the
+    balance left after the debit.
+    """
+    amount = Decimal(amount)
+
+    with db_transaction.atomic():
+        if open_account is not None and not Account.objects.filter(user=receiver).exists():
+            try:
+                with db_transaction.atomic():
+                    open_account(receiver).save()
+            except IntegrityError:
+                # A concurrent transfer opened the receiver's account first.
+                pass
+
+        accounts = lock_accounts(sender.user_id, receiver.user_id)
+        sender_account = accounts.get(sender.user_id)
+        receiver_account = accounts.get(receiver.user_id)
+        if sender_account is None or receiver_account is None:
+            raise AccountNotFound('Sender or receiver account not found')
+
+        if sender_account.balance < amount:
+            raise InsufficientFunds(sender_account.balance)
+
+        transfer_tx = Transaction.objects.create(sender=sender, receiver=receiver, amount=amount)
+
+        if sender_account.pk != receiver_account.pk:
+            Account.objects.filter(pk=sender_account.pk).update(balance=F('balance') - amount)
+            Account.objects.filter(pk=receiver_account.pk).update(balance=F('balance') + amount)
+            ledger.post('TRANSFER', [
+                (sender_account.number, -amount), (receiver_account.number, amount),
+            ], reference=transfer_tx.id)
+            sender_balance = sender_account.balance - amount
+        else:
+            sender_balance = sender_account.balance
+
+        add_to_totals(sender.user_id, operations=1, total_sent=amount)
+        add_to_totals(receiver.user_id, operations=1, total_received=amount)
+        invalidate_dashboard(sender.user_id, receiver.user_id)
+
+        # Blockchain submission is handled by the run_blockchain_sync
+        # worker, so the request never waits on the Stellar backend.
+        enqueue_transaction_sync(transfer_tx)
+
+    return transfer_tx, sender_balance
@@ -0,0 +1,170 @@
+"""
+Bulk user onboarding (``manage.py import_users``).
+
+Creates what ``register`` creates — a ``User``, its ``Account`` and a
+VIRTUAL ``NFCCard`` — for every valid row of a CSV, without going row by
+row. The file is read as a stream and handled in chunks: each row is
+checked with the same validators as the registration form, emails already
+taken are found with one query per chunk, passwords are hashed on a
+process pool (the hasher is deliberately slow, so this is the bulk of the
+work), numbers come from ``numbers.allocate_many``, and the users, accounts,
+cards and REGISTER audit events are inserted with ``bulk_create`` in one
+transaction per chunk.
+
+Every row gets a result; ``import_users`` yields them in file order, chunk
+by chunk, so a report can be written while the import runs.
+"""
+
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction as db_transaction
+
+from ..models import Account, NFCCard, SystemActivity, User
+from ..validators import (
+    EMAIL_MESSAGE, FIRST_NAME_MESSAGE, LAST_NAME_MESSAGE, PASSWORD_MESSAGE, PHONE_MESSAGE,
+    is_valid_email, is_valid_name, is_valid_password, is_valid_phone, normalize_phone,
+)
+from . import numbers
+from .recipients import invalidate_recipient
+
+CSV_FIELDS = ('name', 'prenom', 'email', 'phone', 'password')
+REPORT_FIELDS = ('line', 'email', 'status', 'account', 'nfc_number', 'error')
+
+# Same checks and messages as the registration form.
+_CHECKS = (
+    ('name', is_valid_name, FIRST_NAME_MESSAGE),
+    ('prenom', is_valid_name, LAST_NAME_MESSAGE),
+    ('email', is_valid_email, EMAIL_MESSAGE),
+    ('phone', is_valid_phone, PHONE_MESSAGE),
+    ('password', is_valid_password, PASSWORD_MESSAGE),
+)
+
+
+class InvalidImport(Exception):
+    pass
+
+
+def read_rows(stream):
+    """Yield ``(line, row)`` from a CSV text stream with a ``CSV_FIELDS`` header."""
+    reader = csv.DictReader(stream)
+    missing = set(CSV_FIELDS) - set(reader.fieldnames or ())
+    if missing:
+        raise InvalidImport(f'Missing CSV column(s): {", ".join(sorted(missing))}')
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _clean(row):
+    """``(cleaned, error)`` for one CSV row."""
+    cleaned = {field: (row.get(field) or '') for field in CSV_FIELDS}
+    for field in ('name', 'prenom', 'email', 'phone'):
+        cleaned[field] = cleaned[field].strip()
+    for field, check, message in _CHECKS:
+        if not check(cleaned[field]):
+            return None, message
+    return cleaned, None
+
+
+def _result(line, email, status, account='', nfc_number='', error=''):
+    return {'line': line, 'email': email, 'status': status,
+            'account': account, 'nfc_number': nfc_number, 'error': error}
+
+
+@contextmanager
+def password_hasher(workers):
+    """A ``hash(passwords) -> hashes`` callable, on *workers* processes.
+
+    With one worker (or none) passwords are hashed in this process.
+    """
+    if workers <= 1:
+        yield lambda passwords: [make_password(password) for password in passwords]
+        return
+    # django.setup: spawned workers (macOS, Windows) start unconfigured.
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        yield lambda passwords: list(
+            pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+        )
+
+
+def _create_chunk(rows, hash_passwords):
+    """Insert one chunk of ``(line, cleaned)`` rows; returns their results."""
+    emails = [cleaned['email'] for _line, cleaned in rows]
+    taken = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    results = [_result(line, cleaned['email'], 'FAILED', error='Email already in use')
+               for line, cleaned in rows if cleaned['email'] in taken]
+    rows = [(line, cleaned) for line, cleaned in rows if cleaned['email'] not in taken]
+    if not rows:
+        return results
+
+    hashes = hash_passwords([cleaned['password'] for _line, cleaned in rows])
+    account_numbers = numbers.allocate_many('account', len(rows))
+    nfc_numbers = numbers.allocate_many('nfc', len(rows))
+
+    try:
+        with db_transaction.atomic():
+            # bulk_create skips User.save(): fill phone_normalized here.
+            User.objects.bulk_create([
+                User(name=cleaned['name'], prenom=cleaned['prenom'], email=cleaned['email'], password=password,
+                     phone=cleaned['phone'], phone_normalized=normalize_phone(cleaned['phone']))
+                for (_line, cleaned), password in zip(rows, hashes)
+            ])
+            users = dict(User.objects.filter(email__in=[cleaned['email'] for _line, cleaned in rows])
+                         .values_list('email', 'user_id'))
+            Account.objects.bulk_create([
+                Account(user_id=users[cleaned['email']], number=number, balance=0)
+                for (_line, cleaned), number in zip(rows, account_numbers)
+            ])
+            NFCCard.objects.bulk_create([
+                NFCCard(nfc_number=nfc_number, user_id=users[cleaned['email']], account_id=number,
+                        status='VIRTUAL', label=f"Carte de {cleaned['prenom']}")
+                for (_line, cleaned), number, nfc_number in zip(rows, account_numbers, nfc_numbers)
+            ])
+            SystemActivity.objects.bulk_create([
+                SystemActivity(user_id=users[cleaned['email']], action='REGISTER', status='SUCCESS',
+                               detail='New user account imported')
+                for _line, cleaned in rows
+            ])
+    except DatabaseError as exc:
+        # Typically an email registered since the check above: the whole chunk is rolled back.
+        error = f'Chunk rolled back: {exc}'[:255]
+        return results + [_result(line, cleaned['email'], 'FAILED', error=error) for line, cleaned in rows]
+
+    # Drop cached "not found" answers for the new identifiers.
+    invalidate_recipient(*((kind, cleaned[kind]) for _line, cleaned in rows for kind in ('email', 'phone')))
+    return results + [
+        _result(line, cleaned['email'], 'CREATED', account=number, nfc_number=nfc_number)
+        for (line, cleaned), number, nfc_number in zip(rows, account_numbers, nfc_numbers)
+    ]
+
+
+def import_users(rows, hash_passwords, chunk_size=None):
+    """Create a user, account and VIRTUAL NFC card per valid ``(line, row)``.
+
+    Yields one result dict (``REPORT_FIELDS``) per row, in file order.
+    """
+    chunk_size = chunk_size or int(getattr(settings, 'USER_IMPORT_CHUNK_SIZE', 500))
+    seen = set()
+    pending, results = [], []
+    for line, row in rows:
+        cleaned, error = _clean(row)
+        if error:
+            results.append(_result(line, (row.get('email') or '').strip(), 'FAILED', error=error))
+        elif cleaned['email'] in seen:
+            results.append(_result(line, cleaned['email'], 'FAILED', error='Duplicate email in file'))
+        else:
+            seen.add(cleaned['email'])
+            pending.append((line, cleaned))
+
+        if len(pending) + len(results) >= chunk_size:
+            results.extend(_create_chunk(pending, hash_passwords))
+            yield from sorted(results, key=lambda result: result['line'])
+            pending, results = [], []
+
+    if pending:
+        results.extend(_create_chunk(pending, hash_passwords))
+    yield from sorted(results, key=lambda result: result['line'])
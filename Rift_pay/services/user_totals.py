@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from ..models import (
+    UserOperationTotals, Transaction, MobileMoneyTransaction, NFCPaymentTransaction,
+)
+
+TOTAL_FIELDS = ('total_sent', 'total_received', 'total_deposit', 'total_withdraw', 'total_nfc')
+
+
+def add_to_totals(user_id, operations=0, **amounts):
+    """Increment a user's running totals.
+
+    Call it inside the atomic block that moves the money, e.g.
+    ``add_to_totals(sender.user_id, operations=1, total_sent=amount)``.
+    Negative amounts are allowed (a settled operation reverted by a webhook).
+    """
+    unknown = set(amounts) - set(TOTAL_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown totals field(s): {", ".join(sorted(unknown))}')
+
+    updates = {field: F(field) + value for field, value in amounts.items()}
+    if operations:
+        updates['operation_count'] = F('operation_count') + operations
+    if not updates:
+        return
+    updates['updated_at'] = timezone.now()
+
+    if UserOperationTotals.objects.filter(user_id=user_id).update(**updates):
+        return
+
+    try:
+        with db_transaction.atomic():
+            UserOperationTotals.objects.create(user_id=user_id, operation_count=operations, **amounts)
+    except IntegrityError:
+        # Another request created the row first; apply our delta on top.
+        UserOperationTotals.objects.filter(user_id=user_id).update(**updates)
+
+
+def get_user_totals(user):
+    """Return the user's totals row, or an unsaved all-zero row if none exists yet."""
+    totals = UserOperationTotals.objects.filter(user=user).first()
+    return totals or UserOperationTotals(user=user)
+
+
+def compute_user_totals(user_ids=None):
+    """Aggregate the totals from the operation tables, grouped by user in the DB."""
+    def scoped(queryset, field):
+        return queryset.filter(**{f'{field}__in': user_ids}) if user_ids is not None else queryset
+
+    zero = Decimal('0.00')
+    totals = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, zero) | {'operation_count': 0})
+
+    for row in scoped(Transaction.objects, 'sender_id').values('sender_id').annotate(
+        total=Sum('amount'), count=Count('id'),
+    ).order_by():
+        entry = totals[row['sender_id']]
+        entry['total_sent'] = row['total'] or zero
+        entry['operation_count'] += row['count']
+
+    for row in scoped(Transaction.objects, 'receiver_id').values('receiver_id').annotate(
+        total=Sum('amount'), count=Count('id'),
+    ).order_by():
+        entry = totals[row['receiver_id']]
+        entry['total_received'] = row['total'] or zero
+        entry['operation_count'] += row['count']
+
+    for row in scoped(MobileMoneyTransaction.objects, 'user_id').values('user_id').annotate(
+        deposit=Sum('amount', filter=Q(direction='DEPOSIT', status='SUCCESS')),
+        withdraw=Sum('amount', filter=Q(direction='WITHDRAW', status='SUCCESS')),
+        count=Count('id'),
+    ).order_by():
+        entry = totals[row['user_id']]
+        entry['total_deposit'] = row['deposit'] or zero
+        entry['total_withdraw'] = row['withdraw'] or zero
+        entry['operation_count'] += row['count']
+
+    for row in scoped(NFCPaymentTransaction.objects, 'user_id').values('user_id').annotate(
+        total=Sum('amount', filter=Q(status='SUCCESS')), count=Count('id'),
+    ).order_by():
+        entry = totals[row['user_id']]
+        entry['total_nfc'] = row['total'] or zero
+        entry['operation_count'] += row['count']
+
+    return totals
+
+
+def rebuild_user_totals(user_ids=None, batch_size=1000):
+    """Recompute the totals table from the operation tables.
+
+    Returns the number of users written. Rows of users who no longer have any
+    operation are removed.
+    """
+    started = timezone.now()
+    totals = compute_user_totals(user_ids)
+
+    rows = [
+        UserOperationTotals(user_id=user_id, updated_at=started, **values)
+        for user_id, values in totals.items()
+    ]
+
+    with db_transaction.atomic():
+        UserOperationTotals.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[*TOTAL_FIELDS, 'operation_count', 'updated_at'],
+        )
+        # Rows not rewritten above (and not touched by a concurrent
+        # add_to_totals since) belong to users without any operation left.
+        stale = UserOperationTotals.objects.filter(updated_at__lt=started)
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+
+    return len(rows)
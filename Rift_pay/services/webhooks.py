@@ -0,0 +1,304 @@
+"""
+Batched, idempotent ingestion of webhook events.
+
+Both webhooks accept a single event or a batch (a JSON array, or
+``{"events": [...]}``). A batch is applied in one transaction: every
+affected row is locked with one query per table, events already recorded
+in ``WebhookEvent`` are skipped, the status transitions are applied in
+memory and written back with ``bulk_update``. Operator retries of an event
+that was already applied are therefore no-ops.
+
+Recorded events are kept for WEBHOOK_EVENT_RETENTION_DAYS, which must stay
+longer than the senders' retry window; ``purge_webhook_events`` deletes
+older ones in chunks.
+"""
+
+import hashlib
+import json
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ..models import BlockchainProof, WebhookEvent
+from ..money import Money, InvalidMoney
+from .mobile_money import SettlementBatch, lock_operations
+
+MOBILE_MONEY_STATUSES = {'PENDING', 'SUCCESS', 'FAILED'}
+BLOCKCHAIN_STATUSES = {'PENDING', 'CONFIRMED', 'FAILED'}
+
+APPLIED = 'applied'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+class InvalidPayload(ValueError):
+    pass
+
+
+def split_events(payload):
+    """Return ``(events, is_batch)`` for a decoded webhook body."""
+    if isinstance(payload, list):
+        return payload, True
+    if isinstance(payload, dict):
+        if isinstance(payload.get('events'), list):
+            return payload['events'], True
+        return [payload], False
+    raise InvalidPayload('Expected a JSON object or array')
+
+
+def event_key(event):
+    """The sender's event id if any, otherwise a digest of the whole event."""
+    event_id = str(event.get('event_id') or '').strip()
+    if event_id:
+        return event_id[:128]
+    canonical = json.dumps(event, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _already_seen(source, keys):
+    return set(
+        WebhookEvent.objects.filter(source=source, event_key__in=keys).values_list('event_key', flat=True)
+    )
+
+
+def summarize(results):
+    counts = defaultdict(int)
+    for result in results:
+        counts[result['result']] += 1
+    return dict(counts)
+
+
+def _validate_mobile_money(events):
+    results, valid = [None] * len(events), []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = {'reference': '', 'result': INVALID, 'error': 'Invalid event'}
+            continue
+        reference = str(event.get('reference', '')).strip()
+        status = str(event.get('status', 'PENDING')).upper().strip()
+        if not reference:
+            results[index] = {'reference': '', 'result': INVALID, 'error': 'reference is required'}
+        elif status not in MOBILE_MONEY_STATUSES:
+            results[index] = {'reference': reference, 'result': INVALID, 'error': 'Invalid status value'}
+        else:
+            valid.append((index, event_key(event), reference, status, event))
+    return results, valid
+
+
+def ingest_mobile_money_events(events):
+    """Apply mobile money operator callbacks; returns one result dict per event."""
+    results, valid = _validate_mobile_money(events)
+    if not valid:
+        return results
+
+    with db_transaction.atomic():
+        operations, accounts = lock_operations({reference for _i, _k, reference, _s, _e in valid})
+        seen = _already_seen('MOBILE_MONEY', [key for _i, key, _r, _s, _e in valid])
+        batch = SettlementBatch()
+        recorded = []
+
+        for index, key, reference, status, event in valid:
+            if key in seen:
+                results[index] = {'reference': reference, 'result': DUPLICATE}
+                continue
+            operation = operations.get(reference)
+            if operation is None:
+                results[index] = {'reference': reference, 'result': NOT_FOUND, 'error': 'Transaction not found'}
+                continue
+
+            seen.add(key)
+            batch.apply(
+                operation, accounts[operation.account_id], status,
+                operator_reference=event.get('operator_reference', ''),
+                response_code=event.get('code', ''),
+                message=event.get('message', ''),
+            )
+            recorded.append(WebhookEvent(source='MOBILE_MONEY', event_key=key, reference=reference))
+            results[index] = {'reference': reference, 'result': APPLIED, 'status': operation.status, 'user_id': operation.user_id}
+
+        batch.save()
+        WebhookEvent.objects.bulk_create(recorded)
+
+    return results
+
+
+# Column sizes of BlockchainProof: longer values are rejected per event
+# instead of failing the whole batch's INSERT/UPDATE.
+_PROOF_FIELD_LIMITS = (
+    ('reference_id', 255),
+    ('stellar_transaction_hash', 100),
+    ('proof_hash', 64),
+    ('currency', 10),
+)
+_INTEGER_RE = re.compile(r'^-?\d{1,10}$')
+_INT32_MAX = 2 ** 31 - 1
+
+
+def _parse_local_transaction_id(value):
+    """``(value, ok)``: None or an int that fits the IntegerField."""
+    if value is None:
+        return None, True
+    if isinstance(value, bool):
+        return None, False
+    if isinstance(value, int) or (isinstance(value, str) and _INTEGER_RE.match(value.strip())):
+        value = int(value)
+        return value, -_INT32_MAX - 1 <= value <= _INT32_MAX
+    return None, False
+
+
+def _validate_blockchain(events):
+    results, valid = [None] * len(events), []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = {'reference_id': '', 'result': INVALID, 'error': 'Invalid event'}
+            continue
+        reference_id = str(event.get('reference_id', '')).strip()
+        status = str(event.get('status', 'CONFIRMED')).upper()
+        if not reference_id:
+            results[index] = {'reference_id': '', 'result': INVALID, 'error': 'reference_id is required'}
+            continue
+        if status not in BLOCKCHAIN_STATUSES:
+            results[index] = {'reference_id': reference_id[:255], 'result': INVALID, 'error': 'Invalid status value'}
+            continue
+        try:
+            amount = Money.parse(event['amount']) if event.get('amount') is not None else None
+        except InvalidMoney:
+            results[index] = {'reference_id': reference_id[:255], 'result': INVALID, 'error': 'Invalid amount'}
+            continue
+
+        fields = {
+            'reference_id': reference_id,
+            'stellar_transaction_hash': str(event.get('stellar_transaction_hash') or '').strip(),
+            'proof_hash': str(event.get('proof_hash') or '').strip(),
+            'currency': str(event.get('currency') or '').strip(),
+            'error_detail': str(event.get('error_detail', '')).strip()[:255],
+        }
+        too_long = next((name for name, limit in _PROOF_FIELD_LIMITS if len(fields[name]) > limit), None)
+        if too_long:
+            results[index] = {'reference_id': reference_id[:255], 'result': INVALID, 'error': f'{too_long} is too long'}
+            continue
+        fields['local_transaction_id'], ok = _parse_local_transaction_id(event.get('local_transaction_id'))
+        if not ok:
+            results[index] = {'reference_id': reference_id, 'result': INVALID, 'error': 'Invalid local_transaction_id'}
+            continue
+        valid.append((index, event_key(event), reference_id, status, amount, fields))
+    return results, valid
+
+
+def _placeholder_hash(reference_id, owners):
+    """Unique ``stellar_transaction_hash`` for a proof the backend has not hashed yet."""
+    placeholder = f"pending-{reference_id}"
+    if len(placeholder) <= 100 and owners.get(placeholder, reference_id) == reference_id:
+        return placeholder
+    # Truncating would make long references that share a prefix collide.
+    return f"pending-sha256-{hashlib.sha256(reference_id.encode('utf-8')).hexdigest()}"
+
+
+def ingest_blockchain_events(events):
+    """Record blockchain backend callbacks on ``BlockchainProof``; one result per event."""
+    results, valid = _validate_blockchain(events)
+    if not valid:
+        return results
+
+    references = {reference_id for _i, _k, reference_id, _s, _a, _f in valid}
+
+    with db_transaction.atomic():
+        proofs = {
+            proof.reference_id: proof
+            for proof in BlockchainProof.objects.select_for_update().filter(reference_id__in=references).order_by('id')
+        }
+        # stellar_transaction_hash is unique: find the owners of every hash
+        # this batch may write, so a clash fails one event and not the INSERT.
+        wanted = {fields['stellar_transaction_hash'] for _i, _k, _r, _s, _a, fields in valid}
+        wanted |= {f"pending-{reference_id}" for reference_id in references - set(proofs)}
+        owners = dict(
+            BlockchainProof.objects.filter(stellar_transaction_hash__in=wanted - {''})
+            .values_list('stellar_transaction_hash', 'reference_id')
+        )
+        seen = _already_seen('BLOCKCHAIN', [key for _i, key, _r, _s, _a, _f in valid])
+        created, updated, recorded = {}, {}, []
+        now = timezone.now()
+
+        for index, key, reference_id, status, amount, fields in valid:
+            if key in seen:
+                results[index] = {'reference_id': reference_id, 'result': DUPLICATE}
+                continue
+
+            stellar_hash = fields['stellar_transaction_hash']
+            if stellar_hash and owners.get(stellar_hash, reference_id) != reference_id:
+                results[index] = {
+                    'reference_id': reference_id, 'result': INVALID,
+                    'error': 'stellar_transaction_hash already used by another proof',
+                }
+                continue
+            seen.add(key)
+
+            proof = proofs.get(reference_id)
+            if proof is None:
+                proof = BlockchainProof(
+                    reference_id=reference_id,
+                    stellar_transaction_hash=stellar_hash or _placeholder_hash(reference_id, owners),
+                    proof_hash=fields['proof_hash'] or f"pending-proof-{reference_id}"[:64],
+                    amount=amount,
+                    currency=fields['currency'] or 'FCFA',
+                    local_transaction_id=fields['local_transaction_id'],
+                )
+                proofs[reference_id] = created[reference_id] = proof
+            else:
+                if stellar_hash:
+                    owners.pop(proof.stellar_transaction_hash, None)
+                    proof.stellar_transaction_hash = stellar_hash
+                if fields['proof_hash']:
+                    proof.proof_hash = fields['proof_hash']
+                if amount is not None:
+                    proof.amount = amount
+                if fields['currency']:
+                    proof.currency = fields['currency']
+                if fields['local_transaction_id'] is not None:
+                    proof.local_transaction_id = fields['local_transaction_id']
+                if reference_id not in created:
+                    updated[reference_id] = proof
+            owners[proof.stellar_transaction_hash] = reference_id
+
+            proof.status = status
+            proof.error_detail = fields['error_detail']
+            proof.synced_at = now
+
+            recorded.append(WebhookEvent(source='BLOCKCHAIN', event_key=key, reference=reference_id))
+            results[index] = {'reference_id': reference_id, 'result': APPLIED, 'status': status}
+
+        BlockchainProof.objects.bulk_create(created.values())
+        BlockchainProof.objects.bulk_update(
+            updated.values(),
+            ['stellar_transaction_hash', 'proof_hash', 'amount', 'currency',
+             'local_transaction_id', 'status', 'error_detail', 'synced_at'],
+        )
+        WebhookEvent.objects.bulk_create(recorded)
+
+    return results
+
+
+def purge_webhook_events(chunk_size=None, before=None):
+    """Delete recorded events received before *before*, in chunks.
+
+    *before* defaults to WEBHOOK_EVENT_RETENTION_DAYS ago. Returns the number
+    deleted.
+    """
+    chunk_size = chunk_size or int(getattr(settings, 'WEBHOOK_EVENT_PURGE_CHUNK_SIZE', 1000))
+    before = before or timezone.now() - timedelta(days=int(getattr(settings, 'WEBHOOK_EVENT_RETENTION_DAYS', 30)))
+
+    deleted = 0
+    while True:
+        ids = list(
+            WebhookEvent.objects.filter(received_at__lt=before)
+            .order_by('received_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += WebhookEvent.objects.filter(id__in=ids).delete()[0]
@@ -1,20 +1,15 @@
-from decimal import Decimal, InvalidOperation
-
 from django import template
 
+from ..money import Money, InvalidMoney
+
 register = template.Library()
 
 
 @register.filter
 def fcfa(value):
     if value is None:
-        amount = Decimal('0.00')
-    else:
-        try:
-            amount = Decimal(str(value))
-        except (InvalidOperation, ValueError, TypeError):
-            amount = Decimal('0.00')
-
-    formatted = f"{amount:,.2f}"
-    formatted = formatted.replace(',', ' ').replace('.', ',')
-    return f"{formatted} FCFA"
+        return Money(0).format()
+    try:
+        return Money.parse(value).format()
+    except (InvalidMoney, TypeError):
+        return Money(0).format()
@@ -1,5 +1,56 @@
-from django.test import SimpleTestCase
+import csv
+import io
+import json
+import random
+import re
+import smtplib
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
+import requests
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    User, Transaction, Account, BlockchainProof, BlockchainSyncOutbox, MobileMoneyTransaction, MobileMoneyDispatch,
+    NFCCard, NFCTerminal, NFCDailySpend, NFCPaymentTransaction, EmailOTP, SystemActivity, LedgerEntry,
+    OutboundEmail, NumberSequence, WebhookEvent,
+)
+from .money import Money, InvalidMoney
+from .services.audit import AuditBuffer
+from .services.blockchain_client import BlockchainSyncError
+from .services import ledger
+from .services.bulk_transfers import bulk_transfer, parse_batch
+from .services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from .services.mobile_money import process_dispatch_batch, settle_mobile_money
+from .services.mail_queue import MailSender, process_mail_batch, queue_mail
+from .services.mobile_money_client import operator_breaker
+from .services import nfc_load, numbers
+from .services.http import get_session, post_json, UpstreamCircuitOpen, UpstreamHTTPError, UpstreamTimeout
+from .services.blockchain_outbox import enqueue_transaction_sync, process_outbox_batch
+from .services.terminal_auth import verify_terminal_key, invalidate_terminal_auth
+from .services.throttle import RateLimit
+from .services.transfers import transfer_funds, InsufficientFunds
+from .services.otp import consume_otp, hash_otp, issue_otp, purge_expired_otps
+from .services.operation_feed import fetch_operations, _feed_queryset
+from .services.reconcile import reconcile_proofs, reconcile_mobile_money
+from .services import recipients
+from .services.recipients import resolve_recipient, suggest_recipients, invalidate_recipient
+from .services.webhooks import ingest_blockchain_events
+from .services.user_import import InvalidImport, import_users, password_hasher, read_rows
+from .services.user_totals import get_user_totals, rebuild_user_totals
+from .templatetags.currency_filters import fcfa
 from .validators import (
     is_valid_name,
     is_valid_email,
@@ -171,3 +222,1602 @@ class ValidatorSafeTextTests(SimpleTestCase):
     def test_text_with_sql_keywords_but_no_injection_accepted(self):
         # Single SQL word without the full injection pattern should pass
         self.assertTrue(is_safe_text("I want to select a product"))
+
+
+class BlockchainOutboxTests(TestCase):
+    def setUp(self):
+        sender = User.objects.create(name="Alice", prenom="A", email="alice@example.com", password="x", phone="12345678")
+        receiver = User.objects.create(name="Bob", prenom="B", email="bob@example.com", password="x", phone="87654321")
+        self.transfer_tx = Transaction.objects.create(sender=sender, receiver=receiver, amount=Decimal("1500.00"))
+        self.entry = enqueue_transaction_sync(self.transfer_tx)
+
+    @mock.patch("Rift_pay.services.blockchain_outbox.sync_transaction")
+    def test_successful_sync_upserts_confirmed_proof(self, sync):
+        sync.return_value = {
+            "reference_id": "tx-ok",
+            "stellar_transaction_hash": "abc123",
+            "proof_hash": "def456",
+            "amount": "1500.00",
+            "currency": "FCFA",
+        }
+        self.assertEqual(process_outbox_batch(), (1, 0, 0))
+
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, "DONE")
+        proof = BlockchainProof.objects.get(reference_id="tx-ok")
+        self.assertEqual(proof.status, "CONFIRMED")
+        self.assertEqual(proof.local_transaction_id, self.transfer_tx.id)
+
+    @mock.patch("Rift_pay.services.blockchain_outbox.sync_transaction")
+    def test_malformed_amount_falls_back_to_the_transfer_amount(self, sync):
+        sync.return_value = {"reference_id": "tx-odd", "stellar_transaction_hash": "abc", "amount": "1,500"}
+        with self.assertLogs("Rift_pay.services.blockchain_outbox", "WARNING"):
+            self.assertEqual(process_outbox_batch(), (1, 0, 0))
+
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, "DONE")
+        self.assertEqual(BlockchainProof.objects.get(reference_id="tx-odd").amount, Money.from_decimal(Decimal("1500.00")))
+
+    @mock.patch("Rift_pay.services.blockchain_outbox.sync_transaction", side_effect=BlockchainSyncError("down"))
+    def test_failed_sync_is_retried_later(self, sync):
+        self.assertEqual(process_outbox_batch(), (0, 1, 0))
+
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, "PENDING")
+        self.assertEqual(self.entry.attempts, 1)
+        self.assertEqual(process_outbox_batch(), (0, 0, 0))
+
+    @override_settings(BLOCKCHAIN_SYNC_MAX_ATTEMPTS=1)
+    @mock.patch("Rift_pay.services.blockchain_outbox.sync_transaction", side_effect=BlockchainSyncError("down"))
+    def test_exhausted_retries_leave_local_pending_proof(self, sync):
+        self.assertEqual(process_outbox_batch(), (0, 0, 1))
+
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, "FAILED")
+        proof = BlockchainProof.objects.get(reference_id=f"local-{self.transfer_tx.id}")
+        self.assertEqual(proof.status, "PENDING")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class NFCPaymentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Carla", prenom="C", email="carla@example.com", password="x", phone="12345678")
+        self.account = Account.objects.create(user=self.user, number="ACC1000000001", balance=Decimal("100000.00"))
+        self.nfc_card = NFCCard.objects.create(
+            nfc_number="NFC 0000 0000 0001", card_uid="04AABBCCDD", user=self.user, account=self.account,
+            status="ACTIVE", daily_limit=Decimal("5000.00"), per_transaction_limit=Decimal("3000.00"),
+        )
+        self.terminal = NFCTerminal.objects.create(
+            terminal_id="TERM-1", merchant_name="Shop", api_key_hash=make_password("secret"),
+        )
+
+    def pay(self, amount, key="secret"):
+        return self.client.post(
+            reverse("nfc_payment"),
+            data=json.dumps({"terminal_id": "TERM-1", "card_uid": "04AABBCCDD", "amount": amount}),
+            content_type="application/json",
+            HTTP_X_TERMINAL_KEY=key,
+        )
+
+    def test_daily_limit_uses_spend_counter(self):
+        self.assertTrue(self.pay(3000).json()["success"])
+        self.assertTrue(self.pay(2000).json()["success"])
+
+        response = self.pay(1).json()
+        self.assertFalse(response["success"])
+        self.assertEqual(response["reason"], "Daily limit exceeded")
+
+        spend = NFCDailySpend.objects.get(nfc_card=self.nfc_card)
+        self.assertEqual(spend.amount, Decimal("5000.00"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("95000.00"))
+        self.assertEqual(ledger.balance_at(ledger.nfc_merchant_account("TERM-1")), Money.parse("5000"))
+
+    def test_declined_payment_does_not_count_towards_limit(self):
+        self.account.balance = Decimal("100.00")
+        self.account.save()
+
+        self.assertEqual(self.pay(500).json()["reason"], "Insufficient balance")
+        self.assertEqual(NFCDailySpend.objects.get(nfc_card=self.nfc_card).amount, Decimal("0.00"))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class TerminalAuthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.terminal = NFCTerminal.objects.create(
+            terminal_id="TERM-2", merchant_name="Shop", api_key_hash=make_password("secret"),
+        )
+
+    def test_only_first_verification_hashes(self):
+        with mock.patch("Rift_pay.services.terminal_auth.check_password", wraps=check_password) as checker:
+            self.assertTrue(verify_terminal_key(self.terminal, "secret"))
+            self.assertTrue(verify_terminal_key(self.terminal, "secret"))
+        self.assertEqual(checker.call_count, 1)
+
+    def test_wrong_key_is_never_cached(self):
+        self.assertFalse(verify_terminal_key(self.terminal, "wrong"))
+        self.assertFalse(verify_terminal_key(self.terminal, "wrong"))
+
+    def test_rotated_key_invalidates_cached_credential(self):
+        self.assertTrue(verify_terminal_key(self.terminal, "secret"))
+        self.terminal.api_key_hash = make_password("rotated")
+        self.assertFalse(verify_terminal_key(self.terminal, "secret"))
+
+    def test_invalidation_forces_new_hash(self):
+        verify_terminal_key(self.terminal, "secret")
+        invalidate_terminal_auth("TERM-2")
+        with mock.patch("Rift_pay.services.terminal_auth.check_password", wraps=check_password) as checker:
+            self.assertTrue(verify_terminal_key(self.terminal, "secret"))
+        self.assertEqual(checker.call_count, 1)
+
+
+class OperationFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Dora", prenom="D", email="dora@example.com", password="x", phone="12345678")
+        other = User.objects.create(name="Eve", prenom="E", email="eve@example.com", password="x", phone="87654321")
+        account = Account.objects.create(user=self.user, number="ACC1000000002", balance=Decimal("0.00"))
+        for i in range(5):
+            Transaction.objects.create(sender=self.user, receiver=other, amount=Decimal(i + 1))
+            Transaction.objects.create(sender=other, receiver=self.user, amount=Decimal(i + 1))
+            MobileMoneyTransaction.objects.create(
+                user=self.user, account=account, operator="MTN", direction="DEPOSIT", amount=Decimal(i + 1),
+                external_reference=f"mm-test-{i}", customer_phone_masked="••••5678", customer_phone_hash="h",
+            )
+
+    def test_pages_cover_every_operation_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            operations, cursor = fetch_operations(self.user, cursor=cursor, limit=4)
+            seen.extend(operations)
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(sorted(op["type"] for op in seen).count("deposit"), 5)
+        dates = [op["date"] for op in seen]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_feed_endpoint_requires_login_and_rejects_bad_cursor(self):
+        self.assertEqual(self.client.get(reverse("history_feed")).status_code, 401)
+
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+        self.assertEqual(self.client.get(reverse("history_feed"), {"cursor": "garbage"}).status_code, 400)
+
+        data = self.client.get(reverse("history_feed"), {"limit": 10}).json()
+        self.assertEqual(len(data["operations"]), 10)
+        self.assertIsNotNone(data["next_cursor"])
+
+
+class UserTotalsTests(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create(name="Fred", prenom="F", email="fred@example.com", password="x", phone="12345678")
+        self.receiver = User.objects.create(name="Gina", prenom="G", email="gina@example.com", password="x", phone="87654321")
+        Account.objects.create(user=self.sender, number="ACC1000000003", balance=Decimal("1000.00"))
+        Account.objects.create(user=self.receiver, number="ACC1000000004", balance=Decimal("0.00"))
+        session = self.client.session
+        session["user_id"] = self.sender.user_id
+        session.save()
+
+    def transfer(self, amount):
+        return self.client.post(
+            reverse("transfer"),
+            {"lookup_type": "email", "recipient_lookup": "gina@example.com", "amount": amount},
+            HTTP_ACCEPT="application/json",
+        )
+
+    def test_transfer_updates_running_totals(self):
+        self.assertTrue(self.transfer("250").json()["success"])
+        self.assertTrue(self.transfer("100").json()["success"])
+
+        sender_totals = get_user_totals(self.sender)
+        receiver_totals = get_user_totals(self.receiver)
+        self.assertEqual(sender_totals.total_sent, Decimal("350.00"))
+        self.assertEqual(sender_totals.operation_count, 2)
+        self.assertEqual(receiver_totals.total_received, Decimal("350.00"))
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.transfer("250")
+        before = get_user_totals(self.sender)
+
+        rebuild_user_totals()
+
+        after = get_user_totals(self.sender)
+        self.assertEqual(after.total_sent, before.total_sent)
+        self.assertEqual(after.operation_count, before.operation_count)
+
+
+# Rendering pages needs plain static storage: the manifest only exists after collectstatic.
+PLAIN_STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Hugo", prenom="H", email="hugo@example.com", password="x", phone="12345678")
+        other = User.objects.create(name="Ines", prenom="I", email="ines@example.com", password="x", phone="87654321")
+        Account.objects.create(user=self.user, number="ACC1000000005", balance=Decimal("1000.00"))
+        Account.objects.create(user=other, number="ACC1000000006", balance=Decimal("0.00"))
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+
+    def test_cache_hit_needs_only_session_and_user_queries(self):
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_transfer_invalidates_snapshot(self):
+        self.assertEqual(self.client.get(reverse("home")).context["recent_operations"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("transfer"),
+                {"lookup_type": "email", "recipient_lookup": "ines@example.com", "amount": "40"},
+                HTTP_ACCEPT="application/json",
+            )
+
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.context["account"].balance, Decimal("960.00"))
+        self.assertEqual(response.context["recent_operations"][0]["title"], "To: Ines I")
+
+
+class QueryIndexTests(TestCase):
+    """EXPLAIN the hot query shapes of the views and check they hit the composite indexes."""
+
+    def setUp(self):
+        self.user = User.objects.create(name="Jack", prenom="J", email="jack@example.com", password="x", phone="12345678")
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == "postgresql":
+            # Tiny test tables would otherwise always be sequentially scanned.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn(index_name, queryset.explain())
+
+    def test_history_feed_uses_per_user_timestamp_indexes(self):
+        plan_query = _feed_queryset(self.user, None, 10)
+        for index_name in ("tx_sender_ts_idx", "tx_receiver_ts_idx", "mm_user_created_idx", "nfcpay_user_created_idx"):
+            self.assertUsesIndex(plan_query, index_name)
+
+    def test_otp_lookup_uses_live_otp_constraint_index(self):
+        self.assertUsesIndex(EmailOTP.objects.filter(user=self.user, is_used=False), "otp_one_live_per_user")
+
+    def test_otp_purge_uses_expiry_index(self):
+        self.assertUsesIndex(
+            EmailOTP.objects.filter(expires_at__lte=timezone.now()).order_by("expires_at").values("id")[:10],
+            "otp_expires_idx",
+        )
+
+    def test_receipt_proof_lookup_uses_local_transaction_index(self):
+        self.assertUsesIndex(BlockchainProof.objects.filter(local_transaction_id=1), "proof_local_tx_idx")
+
+    def test_activity_filters_use_action_status_index(self):
+        self.assertUsesIndex(
+            SystemActivity.objects.filter(action="LOGIN", status="FAILED", created_at__gte=timezone.now()),
+            "activity_action_status_idx",
+        )
+
+    def test_card_payment_window_uses_card_status_index(self):
+        self.assertUsesIndex(
+            NFCPaymentTransaction.objects.filter(nfc_card_id=1, status="SUCCESS", created_at__gte=timezone.now()),
+            "nfcpay_card_status_idx",
+        )
+
+    def test_stale_pending_scan_uses_partial_index(self):
+        self.assertUsesIndex(
+            MobileMoneyTransaction.objects.filter(status="PENDING", created_at__lt=timezone.now()).order_by("created_at"),
+            "mm_pending_created_idx",
+        )
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = AuditBuffer()
+        # The background flusher is exercised in production only.
+        self.buffer._ensure_flusher = lambda: None
+
+    def event(self, action="LOGIN"):
+        return SystemActivity(action=action, status="SUCCESS", detail="test")
+
+    @override_settings(AUDIT_LOG_MODE="sync")
+    def test_sync_mode_writes_immediately(self):
+        self.buffer.add(self.event())
+
+        self.assertEqual(self.buffer.depth, 0)
+        self.assertEqual(SystemActivity.objects.count(), 1)
+
+    @override_settings(AUDIT_LOG_MODE="buffered", AUDIT_BUFFER_SIZE=3, AUDIT_FLUSH_INTERVAL=3600)
+    def test_buffer_flushes_in_one_insert_when_full(self):
+        self.buffer.add(self.event())
+        self.buffer.add(self.event())
+        self.assertEqual(self.buffer.depth, 2)
+        self.assertEqual(SystemActivity.objects.count(), 0)
+
+        # Tests run inside a transaction: the flush waits for its commit.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.buffer.add(self.event())
+        self.assertEqual(SystemActivity.objects.count(), 0)
+
+        with self.assertNumQueries(3):  # SAVEPOINT, INSERT, RELEASE
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(self.buffer.depth, 0)
+        self.assertEqual(SystemActivity.objects.count(), 3)
+
+    @override_settings(AUDIT_LOG_MODE="buffered", AUDIT_BUFFER_SIZE=1, AUDIT_FLUSH_INTERVAL=3600)
+    def test_flush_is_not_rolled_back_with_the_caller(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.buffer.add(self.event())
+                raise RuntimeError
+
+        # The deferred flush was dropped with the rolled-back block; the event is still buffered.
+        self.assertEqual(self.buffer.depth, 1)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(SystemActivity.objects.count(), 1)
+
+    @override_settings(AUDIT_LOG_MODE="buffered", AUDIT_BUFFER_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+    def test_failed_flush_leaves_the_transaction_usable(self):
+        self.buffer.add(self.event())
+        with mock.patch.object(SystemActivity.objects, "bulk_create", side_effect=IntegrityError("boom")), \
+                self.assertLogs("Rift_pay.services.audit", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(User.objects.count(), 0)
+
+    @override_settings(AUDIT_LOG_MODE="buffered", AUDIT_BUFFER_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+    def test_buffered_event_keeps_its_own_timestamp(self):
+        event = self.event()
+        logged_at = event.created_at
+        self.buffer.add(event)
+        self.buffer.flush()
+
+        self.assertEqual(SystemActivity.objects.get().created_at, logged_at)
+
+
+class TransferEngineTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name="Ines", prenom="I", email="ines@example.com", password="x", phone="12345678")
+        self.bob = User.objects.create(name="Jules", prenom="J", email="jules@example.com", password="x", phone="87654321")
+        Account.objects.create(user=self.alice, number="ACC1000000020", balance=Decimal("100.00"))
+        Account.objects.create(user=self.bob, number="ACC1000000021", balance=Decimal("5.00"))
+
+    def test_transfer_moves_funds_and_queues_sync(self):
+        transfer_tx, sender_balance = transfer_funds(self.alice, self.bob, Decimal("40.00"))
+
+        self.assertEqual(sender_balance, Decimal("60.00"))
+        self.assertEqual(Account.objects.get(user=self.alice).balance, Decimal("60.00"))
+        self.assertEqual(Account.objects.get(user=self.bob).balance, Decimal("45.00"))
+        self.assertTrue(BlockchainSyncOutbox.objects.filter(transaction=transfer_tx).exists())
+
+    def test_insufficient_funds_changes_nothing(self):
+        with self.assertRaises(InsufficientFunds):
+            transfer_funds(self.bob, self.alice, Decimal("5.01"))
+
+        self.assertEqual(Account.objects.get(user=self.bob).balance, Decimal("5.00"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_receiver_without_account_gets_one(self):
+        carl = User.objects.create(name="Karl", prenom="K", email="karl@example.com", password="x", phone="11223344")
+
+        transfer_funds(
+            self.alice, carl, Decimal("10.00"),
+            open_account=lambda user: Account(user=user, number="ACC1000000022"),
+        )
+
+        self.assertEqual(Account.objects.get(user=carl).balance, Decimal("10.00"))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "row-level locking needs PostgreSQL")
+class TransferConcurrencyTests(TransactionTestCase):
+    ACCOUNTS = 5
+    THREADS = 8
+    TRANSFERS_PER_THREAD = 25
+
+    def setUp(self):
+        self.users = []
+        for i in range(self.ACCOUNTS):
+            user = User.objects.create(
+                name="Stress", prenom=str(i), email=f"stress{i}@example.com", password="x", phone=f"9000000{i}",
+            )
+            Account.objects.create(user=user, number=f"ACC20000000{i:02d}", balance=Decimal("100.00"))
+            self.users.append(user)
+
+    def test_concurrent_transfers_conserve_money(self):
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(self.TRANSFERS_PER_THREAD):
+                    sender, receiver = rng.sample(self.users, 2)
+                    try:
+                        transfer_funds(sender, receiver, Decimal(rng.randint(1, 60)))
+                    except InsufficientFunds:
+                        pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        balances = list(Account.objects.values_list("balance", flat=True))
+        self.assertEqual(sum(balances), Decimal("100.00") * self.ACCOUNTS)
+        self.assertTrue(all(balance >= 0 for balance in balances))
+
+        # Every committed transfer must be reflected in the balances.
+        for user in self.users:
+            sent = sum(Transaction.objects.filter(sender=user).values_list("amount", flat=True), Decimal("0"))
+            received = sum(Transaction.objects.filter(receiver=user).values_list("amount", flat=True), Decimal("0"))
+            self.assertEqual(Account.objects.get(user=user).balance, Decimal("100.00") - sent + received)
+
+
+class BulkTransferTests(TestCase):
+    def setUp(self):
+        self.payer = User.objects.create(name="Lea", prenom="L", email="lea@example.com", password="x", phone="10000001")
+        self.emma = User.objects.create(name="Emma", prenom="E", email="emma@example.com", password="x", phone="10000002")
+        self.noah = User.objects.create(name="Noah", prenom="N", email="noah@example.com", password="x", phone="10000003")
+        Account.objects.create(user=self.payer, number="ACC1000000030", balance=Decimal("1000.00"))
+        Account.objects.create(user=self.emma, number="ACC1000000031", balance=Decimal("0.00"))
+        Account.objects.create(user=self.noah, number="ACC1000000032", balance=Decimal("0.00"))
+
+    def test_batch_debits_once_and_reports_each_line(self):
+        lines = parse_batch(
+            "lookup_type,recipient,amount,reference\n"
+            "email,emma@example.com,100,MAY-1\n"
+            "phone,10000003,50.50,MAY-2\n"
+            "account,ACC1000000031,25,MAY-3\n"
+            "email,nobody@example.com,10,MAY-4\n"
+            "email,emma@example.com,-5,MAY-5\n",
+            "csv",
+        )
+
+        results, balance = bulk_transfer(self.payer, lines)
+
+        self.assertEqual([r["status"] for r in results], ["SUCCESS", "SUCCESS", "SUCCESS", "FAILED", "FAILED"])
+        self.assertEqual(results[3]["error"], "Recipient not found")
+        self.assertEqual(balance, Decimal("824.50"))
+        self.assertEqual(Account.objects.get(user=self.payer).balance, Decimal("824.50"))
+        self.assertEqual(Account.objects.get(user=self.emma).balance, Decimal("125.00"))
+        self.assertEqual(Account.objects.get(user=self.noah).balance, Decimal("50.50"))
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(BlockchainSyncOutbox.objects.count(), 3)
+        self.assertEqual(get_user_totals(self.emma).total_received, Decimal("125.00"))
+
+    def test_receiver_account_opened_concurrently_is_used(self):
+        late = User.objects.create(name="Zoe", prenom="Z", email="zoe@example.com", password="x", phone="10000004")
+
+        def open_account(user):
+            # Another transfer opens the account between the check and the insert.
+            Account.objects.create(user=user, number="ACC1000000033")
+            return Account(user=user, number="ACC1000000034")
+
+        results, balance = bulk_transfer(
+            self.payer, [{"lookup_type": "email", "recipient": "zoe@example.com", "amount": "10"}],
+            open_account=open_account,
+        )
+
+        self.assertEqual(results[0]["status"], "SUCCESS")
+        self.assertEqual(Account.objects.get(user=late).number, "ACC1000000033")
+        self.assertEqual(Account.objects.get(user=late).balance, Decimal("10.00"))
+        self.assertFalse(Account.objects.filter(number="ACC1000000034").exists())
+
+    def test_sender_paying_themselves_gets_their_real_balance(self):
+        results, balance = bulk_transfer(self.payer, [
+            {"lookup_type": "email", "recipient": "lea@example.com", "amount": "100"},
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "40"},
+        ])
+
+        self.assertEqual([r["status"] for r in results], ["SUCCESS", "SUCCESS"])
+        self.assertEqual(balance, Decimal("960.00"))
+        self.assertEqual(Account.objects.get(user=self.payer).balance, balance)
+        # Same ledger history as transfer_funds: no journal for the self-line.
+        self.assertEqual(LedgerEntry.objects.filter(kind="TRANSFER").count(), 2)
+        self.assertFalse(LedgerEntry.objects.filter(account="ACC1000000030", amount__gt=0).exists())
+
+    def test_out_of_range_amounts_fail_per_line(self):
+        results, balance = bulk_transfer(self.payer, [
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "1e30"},
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "100000000"},
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "0.001"},
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "10.500"},
+        ])
+
+        self.assertEqual([r["status"] for r in results], ["FAILED", "FAILED", "FAILED", "SUCCESS"])
+        self.assertEqual(
+            {r["error"] for r in results[:3]}, {"Amount must be a positive value with at most 2 decimals"},
+        )
+        self.assertEqual(balance, Decimal("989.50"))
+
+    def test_batch_over_balance_applies_nothing(self):
+        lines = [
+            {"lookup_type": "email", "recipient": "emma@example.com", "amount": "600"},
+            {"lookup_type": "email", "recipient": "noah@example.com", "amount": "600"},
+        ]
+
+        with self.assertRaises(InsufficientFunds):
+            bulk_transfer(self.payer, lines)
+
+        self.assertEqual(Account.objects.get(user=self.payer).balance, Decimal("1000.00"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_endpoint_accepts_json_batch(self):
+        session = self.client.session
+        session["user_id"] = self.payer.user_id
+        session.save()
+
+        response = self.client.post(
+            reverse("bulk_transfer"),
+            data=json.dumps({"transfers": [
+                {"lookup_type": "email", "recipient": "emma@example.com", "amount": "10", "reference": "R1"},
+                {"lookup_type": "account", "recipient": "ACC1000000032", "amount": "20", "reference": "R2"},
+            ]}),
+            content_type="application/json",
+        )
+
+        payload = response.json()
+        self.assertEqual(payload["applied"], 2)
+        self.assertEqual(payload["available_balance"], 970.0)
+        self.assertEqual([r["reference"] for r in payload["results"]], ["R1", "R2"])
+
+
+class RecipientLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recipients._local.clear()
+        self.user = User.objects.create(name="Olga", prenom="O", email="olga@example.com", password="x", phone="+237 6 99-00-11-22")
+        Account.objects.create(user=self.user, number="ACC1000000040", balance=Decimal("0.00"))
+
+    def test_phone_is_matched_on_digits(self):
+        self.assertEqual(self.user.phone_normalized, "237699001122")
+        self.assertEqual(resolve_recipient("phone", "237 699 001 122")["user_id"], self.user.user_id)
+
+    def test_hits_and_misses_are_cached(self):
+        with self.assertNumQueries(2):
+            self.assertIsNotNone(resolve_recipient("email", "olga@example.com"))
+            self.assertIsNone(resolve_recipient("account", "ACC9999999999"))
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(resolve_recipient("email", "olga@example.com"))
+            self.assertIsNone(resolve_recipient("account", "ACC9999999999"))
+
+    def test_invalidation_drops_stale_name(self):
+        self.assertEqual(resolve_recipient("email", "olga@example.com")["name"], "Olga O")
+        User.objects.filter(pk=self.user.pk).update(name="Olivia")
+
+        invalidate_recipient(("email", "olga@example.com"))
+
+        self.assertEqual(resolve_recipient("email", "olga@example.com")["name"], "Olivia O")
+
+    def test_suggestions_need_a_minimum_prefix(self):
+        self.assertEqual(suggest_recipients("email", "ol"), [])
+        self.assertEqual([item["value"] for item in suggest_recipients("email", "olg")], ["ol•••@example.com"])
+        self.assertEqual([item["value"] for item in suggest_recipients("account", "acc10000000")], ["ACC•••0040"])
+
+    def test_suggestions_are_masked_unless_typed_in_full(self):
+        self.assertEqual([item["value"] for item in suggest_recipients("phone", "2376")], ["•••22"])
+        self.assertEqual([item["value"] for item in suggest_recipients("phone", "237699001122")],
+                         ["+237 6 99-00-11-22"])
+        self.assertEqual([item["value"] for item in suggest_recipients("email", "olga@example.com")],
+                         ["olga@example.com"])
+
+    def test_suggest_mode_requires_login(self):
+        url = reverse("get_recipient_info")
+        response = self.client.get(url, {"mode": "suggest", "type": "phone", "value": "2376"})
+        self.assertEqual(response.status_code, 401)
+
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+        response = self.client.get(url, {"mode": "suggest", "type": "phone", "value": "2376"})
+        self.assertEqual(response.json()["suggestions"][0]["user_id"], self.user.user_id)
+
+    @override_settings(THROTTLE_SUGGEST_USER="2/60")
+    def test_suggest_mode_is_throttled_per_user(self):
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+        url = reverse("get_recipient_info")
+
+        statuses = [
+            self.client.get(url, {"mode": "suggest", "type": "email", "value": prefix}).status_code
+            for prefix in ("ola", "olb", "olc")
+        ]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class HTTPSessionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def response(self, status_code=200, body=b'{"ok": true}'):
+        response = mock.Mock(status_code=status_code, content=body, text=body.decode())
+        response.json.return_value = json.loads(body) if body else {}
+        return response
+
+    @override_settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=2, CIRCUIT_BREAKER_RESET_TIMEOUT=60)
+    def test_dead_upstream_fails_fast_once_circuit_opens(self):
+        session = mock.Mock()
+        session.post.side_effect = requests.Timeout()
+        with mock.patch("Rift_pay.services.http.get_session", return_value=session):
+            for _ in range(2):
+                with self.assertRaises(UpstreamTimeout):
+                    post_json("https://api.example.test/x", {}, timeout=5)
+            with self.assertRaises(UpstreamCircuitOpen):
+                post_json("https://api.example.test/x", {}, timeout=5)
+
+        self.assertEqual(session.post.call_count, 2)
+        self.assertEqual(CircuitBreaker("http:api.example.test").state, OPEN)
+
+    @override_settings(HTTP_POOL_MAXSIZE=7)
+    def test_session_is_shared_and_pooled(self):
+        with mock.patch("Rift_pay.services.http._session", None):
+            session = get_session()
+            self.assertIs(get_session(), session)
+            self.assertEqual(session.get_adapter("https://api.example.test/")._pool_maxsize, 7)
+
+    def test_client_error_does_not_count_as_upstream_failure(self):
+        session = mock.Mock()
+        session.post.return_value = self.response(404, b'{"error": "nope"}')
+        with mock.patch("Rift_pay.services.http.get_session", return_value=session):
+            with self.assertRaises(UpstreamHTTPError):
+                post_json("https://api.example.test/x", {}, timeout=5)
+
+        self.assertEqual(CircuitBreaker("http:api.example.test").snapshot()["failures"], 0)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker("test-upstream", failure_threshold=2, reset_timeout=30)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+
+        with mock.patch("Rift_pay.services.circuit_breaker.time.time", return_value=self.breaker.snapshot()["opened_at"] + 31):
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            self.assertTrue(self.breaker.allow_request())
+            self.assertFalse(self.breaker.allow_request())
+            self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_reopens_circuit(self):
+        self.breaker.trip()
+        with mock.patch("Rift_pay.services.circuit_breaker.time.time", return_value=self.breaker.snapshot()["opened_at"] + 31):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+            self.assertEqual(self.breaker.state, OPEN)
+
+
+@override_settings(MOBILE_MONEY_MODE="live", ORANGE_MONEY_BASE_URL="https://orange.example.test")
+class OperatorCircuitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Paul", prenom="P", email="paul@example.com", password="x", phone="12345678")
+        Account.objects.create(user=self.user, number="ACC1000000050", balance=Decimal("100.00"))
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+        operator_breaker("ORANGE").trip()
+
+    def deposit(self):
+        return self.client.post(reverse("process_mobile_money"), {
+            "operation": "deposit", "operator": "ORANGE", "phone_number": "699001122",
+            "amount": "50", "next_view": "deposit",
+        })
+
+    @mock.patch("Rift_pay.services.http.get_session")
+    def test_open_circuit_rejects_without_calling_operator(self, get_session_mock):
+        response = self.deposit()
+
+        self.assertIn("error=", response["Location"])
+        self.assertFalse(MobileMoneyTransaction.objects.exists())
+        get_session_mock.assert_not_called()
+
+    @override_settings(MOBILE_MONEY_CIRCUIT_OPEN_POLICY="queue")
+    @mock.patch("Rift_pay.services.http.get_session")
+    def test_open_circuit_queues_operation_when_configured(self, get_session_mock):
+        self.deposit()
+
+        operation = MobileMoneyTransaction.objects.get()
+        self.assertEqual(operation.status, "PENDING")
+        self.assertEqual(operation.response_code, "QUEUED")
+        self.assertIsNone(operation.dispatched_at)
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("100.00"))
+        get_session_mock.assert_not_called()
+
+
+@override_settings(MOBILE_MONEY_DISPATCH_MODE="deferred")
+class DeferredDispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Rita", prenom="R", email="rita@example.com", password="x", phone="12345678")
+        Account.objects.create(user=self.user, number="ACC1000000060", balance=Decimal("100.00"))
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+
+    def deposit(self, amount="50"):
+        return self.client.post(reverse("process_mobile_money"), {
+            "operation": "deposit", "operator": "MTN", "phone_number": "699 00 11 22",
+            "amount": amount, "next_view": "deposit",
+        })
+
+    @mock.patch("Rift_pay.views.initiate_mobile_money_transaction")
+    def test_view_only_queues_the_operation(self, initiate):
+        self.deposit()
+
+        operation = MobileMoneyTransaction.objects.get()
+        self.assertEqual(operation.status, "PENDING")
+        self.assertIsNone(operation.dispatched_at)
+        self.assertEqual(operation.dispatch.phone_number, "699001122")
+        initiate.assert_not_called()
+
+    @mock.patch("Rift_pay.services.mobile_money.initiate_mobile_money_transaction")
+    def test_dispatcher_settles_operator_answers(self, initiate):
+        self.deposit("50")
+        self.deposit("20")
+        initiate.side_effect = [
+            {"status": "SUCCESS", "operator_reference": "op-1", "response_code": "00", "message": "ok"},
+            {"status": "PENDING", "operator_reference": "op-2", "response_code": "", "message": ""},
+        ]
+
+        self.assertEqual(process_dispatch_batch(max_in_flight=1), (2, 0, 0))
+
+        self.assertFalse(MobileMoneyDispatch.objects.exists())
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("150.00"))
+        statuses = dict(MobileMoneyTransaction.objects.values_list("operator_reference", "status"))
+        self.assertEqual(statuses, {"op-1": "SUCCESS", "op-2": "PENDING"})
+        self.assertFalse(MobileMoneyTransaction.objects.filter(dispatched_at__isnull=True).exists())
+
+    @mock.patch("Rift_pay.services.mobile_money.initiate_mobile_money_transaction")
+    def test_webhook_settles_dispatched_operation(self, initiate):
+        self.deposit("30")
+        initiate.return_value = {"status": "PENDING", "operator_reference": "op-3", "response_code": "", "message": ""}
+        process_dispatch_batch()
+        operation = MobileMoneyTransaction.objects.get()
+
+        response = self.client.post(
+            reverse("mobile_money_webhook"),
+            data=json.dumps({"reference": operation.external_reference, "status": "SUCCESS", "operator_reference": "op-3"}),
+            content_type="application/json",
+            HTTP_X_WEBHOOK_TOKEN=settings.MOBILE_MONEY_WEBHOOK_TOKEN,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("130.00"))
+        self.assertEqual(get_user_totals(self.user).total_deposit, Decimal("30.00"))
+
+    @override_settings(MOBILE_MONEY_DISPATCH_MODE="inline", MOBILE_MONEY_MODE="manual")
+    def test_inline_mode_still_settles_during_the_request(self):
+        self.deposit("25")
+
+        operation = MobileMoneyTransaction.objects.get()
+        self.assertEqual(operation.status, "SUCCESS")
+        self.assertIsNotNone(operation.dispatched_at)
+        self.assertFalse(MobileMoneyDispatch.objects.exists())
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("125.00"))
+
+
+class WebhookIngestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Yves", prenom="Y", email="yves@example.com", password="x", phone="12345678")
+        self.account = Account.objects.create(user=self.user, number="ACC1000000070", balance=Decimal("100.00"))
+
+    def operation(self, reference, direction="DEPOSIT", amount="40.00"):
+        return MobileMoneyTransaction.objects.create(
+            user=self.user, account=self.account, operator="MTN", direction=direction,
+            amount=Decimal(amount), external_reference=reference,
+            customer_phone_masked="69****22", customer_phone_hash="h",
+        )
+
+    def post(self, name, payload, token):
+        return self.client.post(
+            reverse(name), data=json.dumps(payload), content_type="application/json", HTTP_X_WEBHOOK_TOKEN=token,
+        )
+
+    def post_mobile_money(self, payload):
+        return self.post("mobile_money_webhook", payload, settings.MOBILE_MONEY_WEBHOOK_TOKEN)
+
+    def test_batch_applies_every_event_in_one_request(self):
+        self.operation("ref-1", amount="40.00")
+        self.operation("ref-2", direction="WITHDRAW", amount="30.00")
+
+        response = self.post_mobile_money([
+            {"event_id": "e1", "reference": "ref-1", "status": "SUCCESS"},
+            {"event_id": "e2", "reference": "ref-2", "status": "SUCCESS"},
+            {"event_id": "e3", "reference": "missing", "status": "SUCCESS"},
+            {"reference": "ref-1", "status": "BOGUS"},
+        ])
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["summary"], {"applied": 2, "not_found": 1, "invalid": 1})
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal("110.00"))
+        totals = get_user_totals(self.user)
+        self.assertEqual((totals.total_deposit, totals.total_withdraw), (Decimal("40.00"), Decimal("30.00")))
+
+    def test_redelivered_event_is_a_no_op(self):
+        self.operation("ref-3")
+        event = {"reference": "ref-3", "status": "SUCCESS", "operator_reference": "op-3"}
+
+        first = self.post_mobile_money(event)
+        retry = self.post_mobile_money({"events": [event]})
+
+        self.assertEqual(first.json(), {"success": True, "reference": "ref-3", "status": "SUCCESS"})
+        self.assertEqual(retry.json()["summary"], {"duplicate": 1})
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal("140.00"))
+        self.assertEqual(get_user_totals(self.user).total_deposit, Decimal("40.00"))
+
+    def test_single_event_keeps_legacy_errors(self):
+        self.assertEqual(self.post_mobile_money({"reference": "nope", "status": "SUCCESS"}).status_code, 404)
+        self.assertEqual(self.post_mobile_money({"status": "SUCCESS"}).status_code, 400)
+        self.assertEqual(self.post_mobile_money([]).status_code, 400)
+
+    def test_blockchain_batch_creates_and_updates_proofs(self):
+        BlockchainProof.objects.create(reference_id="local-1", stellar_transaction_hash="pending-local-1", proof_hash="p", status="PENDING")
+
+        response = self.post("blockchain_webhook", [
+            {"reference_id": "local-1", "status": "CONFIRMED", "stellar_transaction_hash": "hash-1"},
+            {"reference_id": "local-2", "status": "PENDING", "amount": "12.5"},
+            {"reference_id": "local-2", "status": "CONFIRMED", "stellar_transaction_hash": "hash-2"},
+        ], settings.BLOCKCHAIN_WEBHOOK_TOKEN)
+
+        self.assertEqual(response.json()["summary"], {"applied": 3})
+        proofs = {proof.reference_id: proof for proof in BlockchainProof.objects.all()}
+        self.assertEqual((proofs["local-1"].status, proofs["local-1"].stellar_transaction_hash), ("CONFIRMED", "hash-1"))
+        self.assertEqual((proofs["local-2"].status, proofs["local-2"].amount), ("CONFIRMED", Money(1250)))
+
+    def test_bad_blockchain_events_are_invalid_without_sinking_the_batch(self):
+        BlockchainProof.objects.create(reference_id="other", stellar_transaction_hash="taken", proof_hash="p")
+        BlockchainProof.objects.create(reference_id="tx-7", stellar_transaction_hash="pending-late", proof_hash="p")
+        long_a, long_b = "a" * 120 + "1", "a" * 120 + "2"
+
+        results = ingest_blockchain_events([
+            {"reference_id": "r" * 256},
+            {"reference_id": "ok-1", "stellar_transaction_hash": "h" * 101},
+            {"reference_id": "ok-1", "proof_hash": "p" * 65},
+            {"reference_id": "ok-1", "currency": "C" * 11},
+            {"reference_id": "ok-1", "local_transaction_id": "12a"},
+            {"reference_id": "ok-1", "stellar_transaction_hash": "taken"},
+            {"reference_id": "ok-1", "local_transaction_id": "42", "stellar_transaction_hash": "fresh"},
+            {"reference_id": long_a, "status": "PENDING"},
+            {"reference_id": long_b, "status": "PENDING"},
+            {"reference_id": "late", "status": "PENDING"},
+        ])
+
+        self.assertEqual([r["result"] for r in results], ["invalid"] * 6 + ["applied"] * 4)
+        self.assertEqual(results[5]["error"], "stellar_transaction_hash already used by another proof")
+        proof = BlockchainProof.objects.get(reference_id="ok-1")
+        self.assertEqual((proof.local_transaction_id, proof.stellar_transaction_hash), (42, "fresh"))
+        placeholders = set(BlockchainProof.objects.filter(reference_id__in=[long_a, long_b, "late"])
+                           .values_list("stellar_transaction_hash", flat=True))
+        self.assertEqual(len(placeholders), 3)
+        self.assertNotIn("pending-late", placeholders)
+        self.assertEqual(WebhookEvent.objects.filter(source="BLOCKCHAIN").count(), 4)
+
+    def test_purge_deletes_events_past_retention_in_chunks(self):
+        old = timezone.now() - timedelta(days=31)
+        for index in range(3):
+            WebhookEvent.objects.create(source="MOBILE_MONEY", event_key=f"old-{index}", reference="r", received_at=old)
+        recent = WebhookEvent.objects.create(source="MOBILE_MONEY", event_key="recent", reference="r")
+        stdout = io.StringIO()
+
+        call_command("purge_webhook_events", "--chunk-size", "2", stdout=stdout)
+
+        self.assertIn("Deleted 3 webhook event(s).", stdout.getvalue())
+        self.assertEqual(list(WebhookEvent.objects.values_list("pk", flat=True)), [recent.pk])
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Zoe", prenom="Z", email="zoe@example.com", password="x", phone="12345678")
+        other = User.objects.create(name="Abel", prenom="A", email="abel@example.com", password="x", phone="87654321")
+        self.account = Account.objects.create(user=self.user, number="ACC1000000080", balance=Decimal("100.00"))
+        self.transfer_tx = Transaction.objects.create(sender=self.user, receiver=other, amount=Decimal("10.00"))
+        self.long_ago = timezone.now() - timedelta(hours=2)
+
+    def stale_proof(self, transfer_tx):
+        proof = BlockchainProof.objects.create(
+            reference_id=f"local-{transfer_tx.id}", stellar_transaction_hash=f"unsynced-{transfer_tx.id}",
+            proof_hash="p", status="PENDING", local_transaction_id=transfer_tx.id,
+        )
+        BlockchainProof.objects.filter(pk=proof.pk).update(timestamp=self.long_ago)
+        return proof
+
+    def stale_operation(self, reference):
+        operation = MobileMoneyTransaction.objects.create(
+            user=self.user, account=self.account, operator="MTN", direction="DEPOSIT", amount=Decimal("25.00"),
+            external_reference=reference, customer_phone_masked="69****22", customer_phone_hash="h",
+        )
+        MobileMoneyTransaction.objects.filter(pk=operation.pk).update(created_at=self.long_ago)
+        return operation
+
+    @mock.patch("Rift_pay.services.reconcile.sync_transaction")
+    def test_stale_local_proofs_are_resubmitted_once_per_retry_window(self, sync):
+        proof = self.stale_proof(self.transfer_tx)
+        BlockchainProof.objects.create(reference_id="local-999", stellar_transaction_hash="fresh", proof_hash="p", local_transaction_id=999)
+        sync.return_value = {
+            "reference_id": "tx-1-abc", "stellar_transaction_hash": "stellar-1", "proof_hash": "proof-1",
+            "amount": "10.00", "currency": "FCFA",
+        }
+
+        self.assertEqual(reconcile_proofs(), (1, 1, 0))
+        self.assertEqual(reconcile_proofs(), (0, 0, 0))
+
+        proof.refresh_from_db()
+        self.assertEqual((proof.reference_id, proof.status, proof.stellar_transaction_hash), ("tx-1-abc", "CONFIRMED", "stellar-1"))
+        self.assertIsNotNone(proof.reconciled_at)
+
+    @mock.patch("Rift_pay.services.reconcile.sync_transaction", side_effect=BlockchainSyncError("down"))
+    def test_failed_resubmission_keeps_the_proof_pending(self, _sync):
+        proof = self.stale_proof(self.transfer_tx)
+
+        self.assertEqual(reconcile_proofs(chunk_size=1), (1, 0, 1))
+
+        proof.refresh_from_db()
+        self.assertEqual((proof.reference_id, proof.status, proof.error_detail), (f"local-{self.transfer_tx.id}", "PENDING", "down"))
+
+    @mock.patch("Rift_pay.services.reconcile.query_mobile_money_status")
+    def test_stale_operations_are_settled_from_the_operator_status(self, query):
+        settled = self.stale_operation("mm-stale-1")
+        waiting = self.stale_operation("mm-stale-2")
+        queued = self.stale_operation("mm-queued")
+        MobileMoneyDispatch.objects.create(mm_transaction=queued, phone_number="699001122", customer_name="Zoe Z")
+        query.side_effect = lambda operator, external_reference: {
+            "status": "SUCCESS" if external_reference == settled.external_reference else "PENDING",
+            "operator_reference": "op-1", "response_code": "00", "message": "",
+        }
+
+        self.assertEqual(reconcile_mobile_money(chunk_size=1), (2, 1))
+
+        for operation in (settled, waiting, queued):
+            operation.refresh_from_db()
+        self.assertEqual([op.status for op in (settled, waiting, queued)], ["SUCCESS", "PENDING", "PENDING"])
+        self.assertEqual(Account.objects.get(pk=self.account.pk).balance, Decimal("125.00"))
+        self.assertEqual(get_user_totals(self.user).total_deposit, Decimal("25.00"))
+        self.assertEqual(query.call_count, 2)
+
+
+class MoneyTests(SimpleTestCase):
+    def test_parse_reads_major_units_without_float_rounding(self):
+        self.assertEqual(Money.parse("12.5"), Money(1250))
+        self.assertEqual(Money.parse(0.1 + 0.2), Money(30))
+        self.assertEqual(Money.parse(Decimal("1.005")), Money(101))
+        self.assertEqual(Money.parse(15), Money(1500))
+        with self.assertRaises(InvalidMoney):
+            Money.parse("abc")
+        with self.assertRaises(InvalidMoney):
+            Money.parse("NaN")
+
+    def test_conversions(self):
+        self.assertEqual(Money(-123456).decimal, Decimal("-1234.56"))
+        self.assertEqual(str(Money(5)), "0.05")
+        self.assertEqual(Money(97000).to_json(), 970)
+        self.assertEqual(Money(1250).to_json(), 12.5)
+        self.assertEqual(Money(100) + Money(25) - Money(5), Money(120))
+
+    def test_fcfa_filter(self):
+        self.assertEqual(fcfa(Decimal("1234567.5")), "1 234 567,50 FCFA")
+        self.assertEqual(fcfa(Money(-50)), "-0,50 FCFA")
+        self.assertEqual(fcfa(None), "0,00 FCFA")
+        self.assertEqual(fcfa("oops"), "0,00 FCFA")
+
+    def test_money_field_round_trip(self):
+        field = BlockchainProof._meta.get_field("amount")
+        self.assertEqual(field.get_prep_value(Money.parse("12.34")), 1234)
+        self.assertEqual(field.get_prep_value("12.34"), 1234)
+        self.assertEqual(field.from_db_value(1234, None, None), Money(1234))
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create(name="Alice", prenom="A", email="alice.l@example.com", password="x", phone="11111111")
+        self.bob = User.objects.create(name="Bob", prenom="B", email="bob.l@example.com", password="x", phone="22222222")
+        self.alice_account = Account.objects.create(user=self.alice, number="ACC1000000090", balance=Decimal("0.00"))
+        self.bob_account = Account.objects.create(user=self.bob, number="ACC1000000091", balance=Decimal("0.00"))
+        self.fund(self.alice_account, Decimal("100.00"))
+
+    def fund(self, account, amount):
+        ledger.post("OPENING", [(account.number, amount), (ledger.SYSTEM_OPENING, -amount)])
+        Account.objects.filter(pk=account.pk).update(balance=amount)
+
+    def test_balance_changes_post_balanced_journals(self):
+        transfer_funds(self.alice, self.bob, Decimal("30.00"))
+        bulk_transfer(self.alice, [{"lookup_type": "email", "recipient": "bob.l@example.com", "amount": "5"}])
+        operation = MobileMoneyTransaction.objects.create(
+            user=self.bob, account=self.bob_account, operator="ORANGE", direction="DEPOSIT", amount=Decimal("20.00"),
+            external_reference="mm-ledger-1", customer_phone_masked="69****22", customer_phone_hash="h",
+        )
+        settle_mobile_money(operation.id, "SUCCESS")
+
+        self.assertEqual(ledger.verify_ledger(full=True), ([], []))
+        self.assertEqual(ledger.balance_at(self.bob_account.number), Money(5500))
+        self.assertEqual(ledger.balance_at(ledger.mobile_money_account("ORANGE")), Money(-2000))
+        self.assertEqual(LedgerEntry.objects.filter(kind="TRANSFER").count(), 4)
+
+    def test_point_in_time_balance_reads_snapshot_plus_delta(self):
+        transfer_funds(self.alice, self.bob, Decimal("10.00"))
+        cutoff = timezone.now()
+        self.assertEqual(ledger.take_snapshots(as_of=cutoff), 3)
+        self.assertEqual(ledger.take_snapshots(as_of=cutoff), 0)
+        transfer_funds(self.alice, self.bob, Decimal("15.00"))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(ledger.balance_at(self.alice_account.number), Money(7500))
+        self.assertEqual(ledger.balance_at(self.alice_account.number, cutoff), Money(9000))
+        opening, entries = ledger.statement(self.bob_account.number, cutoff, timezone.now())
+        self.assertEqual((opening, [entry.amount for entry in entries]), (Money(1000), [Money(1500)]))
+        self.assertEqual(ledger.verify_ledger(), ([], []))
+
+    def test_verifier_reports_drift(self):
+        Account.objects.filter(pk=self.bob_account.pk).update(balance=Decimal("1.00"))
+
+        mismatches, _unbalanced = ledger.verify_ledger()
+        self.assertEqual(mismatches, [(self.bob_account.number, Decimal("1.00"), Money(0))])
+        with self.assertRaises(CommandError):
+            call_command("verify_ledger", stdout=io.StringIO())
+
+    def test_entries_are_append_only_and_journals_must_balance(self):
+        entry = LedgerEntry.objects.first()
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ledger.UnbalancedJournal):
+            ledger.post("ADJUSTMENT", [(self.alice_account.number, Decimal("1.00"))])
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Ines", prenom="I", email="ines@example.com", password="x", phone="12345678")
+        self.other = User.objects.create(name="Omar", prenom="O", email="omar@example.com", password="x", phone="87654321")
+        Account.objects.create(user=self.user, number="ACC1000000100", balance=Decimal("0.00"))
+        session = self.client.session
+        session["user_id"] = self.user.user_id
+        session.save()
+        self.today = timezone.localdate()
+
+    def export(self, **params):
+        params = {"start": self.today.isoformat(), "end": self.today.isoformat(), **params}
+        response = self.client.get(reverse("statement_export"), params)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_lists_operations_in_range_oldest_first(self):
+        Transaction.objects.create(sender=self.user, receiver=self.other, amount=Decimal("10.00"))
+        Transaction.objects.create(sender=self.other, receiver=self.user, amount=Decimal("2.50"))
+        old = Transaction.objects.create(sender=self.user, receiver=self.other, amount=Decimal("99.00"))
+        Transaction.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=40))
+
+        response, body = self.export(format="csv")
+
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8"))))
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("statement-ACC1000000100-", response["Content-Disposition"])
+        self.assertEqual(rows[0][0], "date")
+        self.assertEqual([(row[1], row[5]) for row in rows[1:]], [("sent", "-10.00"), ("received", "2.50")])
+
+    def test_pdf_streams_pages_with_valid_cross_reference(self):
+        Transaction.objects.bulk_create([
+            Transaction(sender=self.user, receiver=self.other, amount=Decimal("1.00")) for _ in range(150)
+        ])
+
+        _response, body = self.export(format="pdf")
+
+        self.assertTrue(body.startswith(b"%PDF-1.4"))
+        self.assertTrue(body.endswith(b"%%EOF\n"))
+        self.assertIn(b"/Count 3", body)
+        xref_offset = int(body.rsplit(b"startxref\n", 1)[1].split(b"\n", 1)[0])
+        self.assertEqual(body[xref_offset:xref_offset + 4], b"xref")
+        self.assertIn(b"Total debits:  150,00 FCFA", body)
+
+    def test_export_requires_login_and_valid_parameters(self):
+        self.assertEqual(self.client.get(reverse("statement_export"), {"start": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("statement_export"), {"format": "xls"}).status_code, 400)
+        self.client.session.flush()
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("statement_export")).status_code, 401)
+
+    def test_command_writes_statement(self):
+        Transaction.objects.create(sender=self.user, receiver=self.other, amount=Decimal("4.00"))
+        stdout = io.StringIO()
+        with mock.patch("sys.stdout") as fake_stdout:
+            fake_stdout.buffer = io.BytesIO()
+            call_command("export_statement", "--user", str(self.user.user_id), "--start", self.today.isoformat(),
+                         "--end", self.today.isoformat(), stdout=stdout)
+            output = fake_stdout.buffer.getvalue().decode("utf-8")
+
+        self.assertIn("sent,Sent Money,Omar O,SUCCESS,-4.00,FCFA", output)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class NFCLoadTests(TestCase):
+    def provision(self, balance="1000"):
+        return nfc_load.provision_fleet(2, 3, "secret", Decimal(balance), per_transaction_limit=Decimal("900"))
+
+    def tap(self, terminal_id, card_uid, amount):
+        return self.client.post(
+            reverse("nfc_payment"),
+            data=json.dumps({"terminal_id": terminal_id, "card_uid": card_uid, "amount": amount}),
+            content_type="application/json",
+            HTTP_X_TERMINAL_KEY="secret",
+        ).json()
+
+    def test_provisioning_is_idempotent_and_funded_through_ledger(self):
+        terminal_ids, card_uids, accounts = self.provision()
+        Account.objects.filter(number=accounts[0]).update(balance=Decimal("10.00"))
+        LedgerEntry.objects.bulk_create(ledger.journal("ADJUSTMENT", [
+            (ledger.SYSTEM_OPENING, Decimal("990")), (accounts[0], Decimal("-990")),
+        ]))
+
+        self.assertEqual(self.provision(), (terminal_ids, card_uids, accounts))
+        self.assertEqual(NFCTerminal.objects.filter(terminal_id__startswith="LOAD-TERM-").count(), 2)
+        self.assertEqual(NFCCard.objects.filter(card_uid__in=card_uids, status="ACTIVE").count(), 3)
+        self.assertEqual(set(Account.objects.filter(number__in=accounts).values_list("balance", flat=True)),
+                         {Decimal("1000.00")})
+        self.assertEqual(ledger.verify_ledger(full=True), ([], []))
+
+    def test_rerun_with_another_key_rekeys_terminals(self):
+        terminal_ids, card_uids, _accounts = self.provision()
+        self.assertTrue(self.tap(terminal_ids[0], card_uids[0], 100)["success"])
+
+        nfc_load.provision_fleet(2, 3, "rotated", Decimal("1000"))
+        response = self.client.post(
+            reverse("nfc_payment"),
+            data=json.dumps({"terminal_id": terminal_ids[0], "card_uid": card_uids[0], "amount": 100}),
+            content_type="application/json",
+            HTTP_X_TERMINAL_KEY="rotated",
+        )
+
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(self.tap(terminal_ids[0], card_uids[0], 100).get("error"), "Invalid terminal credentials")
+
+    def test_verify_balances_reconciles_taps(self):
+        since = timezone.now()
+        terminal_ids, card_uids, accounts = self.provision()
+
+        self.assertTrue(self.tap(terminal_ids[0], card_uids[0], 600)["success"])
+        self.assertEqual(self.tap(terminal_ids[1], card_uids[0], 600)["reason"], "Insufficient balance")
+        self.assertEqual(self.tap(terminal_ids[1], card_uids[1], 950)["reason"], "Per-transaction limit exceeded")
+        self.assertTrue(self.tap(terminal_ids[1], card_uids[2], 250)["success"])
+
+        result = nfc_load.verify_balances(terminal_ids, accounts, Decimal("3000"), since)
+        self.assertEqual(result["negative"], [])
+        self.assertEqual(result["paid"], Money.parse(850))
+        self.assertTrue(result["reconciled"])
+
+        Account.objects.filter(number=accounts[1]).update(balance=Decimal("-1.00"))
+        result = nfc_load.verify_balances(terminal_ids, accounts, Decimal("3000"), since)
+        self.assertEqual(result["negative"], [accounts[1]])
+        self.assertFalse(result["reconciled"])
+
+    def test_run_load_reports_outcomes(self):
+        outcomes = iter([("approved", ""), ("declined", "Insufficient balance"), ("error", "timeout"),
+                         ("error", "lock"), ("error", "HTTP 500")] * 4)
+        payloads = []
+
+        def send(session, url, raw_key, payload, timeout):
+            payloads.append((url, raw_key, payload))
+            return next(outcomes)
+
+        report = nfc_load.run_load("http://load.test/", "secret", ["T1", "T2"], ["C1"], rps=400, duration=0.05,
+                                   concurrency=4, amounts=(100, 100), seed=1, send=send)
+
+        self.assertEqual(report.sent + report.skipped, 20)
+        self.assertEqual(len(payloads), report.sent)
+        self.assertEqual(payloads[0][0], "http://load.test/api/nfc/pay/")
+        self.assertEqual(payloads[0][2]["amount"], 100)
+        self.assertEqual(report.approved_amount, Money.parse(100 * report.approved))
+        self.assertEqual(report.lock_errors, report.errors["timeout"] + report.errors["lock"])
+        self.assertIsNotNone(report.latency(0.99))
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(nfc_load.percentile(values, 0.50), 50)
+        self.assertEqual(nfc_load.percentile(values, 0.99), 99)
+        self.assertEqual(nfc_load.percentile([7], 0.95), 7)
+        self.assertIsNone(nfc_load.percentile([], 0.5))
+
+
+class FakeSMTPConnection:
+    """Email backend stand-in counting connections; *failures* are raised in order."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.opened = 0
+        self.sent = []
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.extend(messages)
+        return len(messages)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class MailQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            name="Gina", prenom="G", email="gina@example.com", password=make_password("pw"), phone="12345678",
+        )
+
+    def test_login_queues_otp_email_without_sending(self):
+        response = self.client.post(reverse("login"), {"email": "gina@example.com", "password": "pw"})
+
+        self.assertRedirects(response, reverse("verify_otp"), fetch_redirect_response=False)
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        otp = EmailOTP.objects.get(user=self.user)
+        self.assertEqual((email.to_email, email.status, email.expires_at), ("gina@example.com", "PENDING", otp.expires_at))
+        self.assertIn("Your verification code is:", email.body)
+
+    def test_batch_reuses_one_connection_and_blanks_sent_bodies(self):
+        for index in range(3):
+            queue_mail(f"user{index}@example.com", "Hello", f"Code {index}")
+        connection = FakeSMTPConnection()
+
+        self.assertEqual(process_mail_batch(MailSender(connection)), (3, 0, 0))
+
+        self.assertEqual(connection.opened, 1)
+        self.assertEqual([message.to for message in connection.sent], [[f"user{i}@example.com"] for i in range(3)])
+        self.assertEqual(connection.sent[0].body, "Code 0")
+        self.assertEqual(set(OutboundEmail.objects.values_list("status", "body")), {("SENT", "")})
+
+    def test_connection_failure_retries_the_batch_with_backoff(self):
+        first, second = queue_mail("a@example.com", "Hi", "A"), queue_mail("b@example.com", "Hi", "B")
+        connection = FakeSMTPConnection([smtplib.SMTPServerDisconnected("gone")])
+        sender = MailSender(connection)
+
+        self.assertEqual(process_mail_batch(sender), (0, 2, 0))
+        self.assertEqual(connection.sent, [])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.last_error), ("PENDING", 1, "gone"))
+        self.assertGreater(first.next_attempt_at, timezone.now())
+        self.assertEqual(process_mail_batch(sender), (0, 0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_mail_batch(sender), (2, 0, 0))
+        self.assertEqual(connection.opened, 2)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.attempts), ("SENT", 2))
+
+    def test_refused_recipient_and_expired_message_are_dropped(self):
+        queue_mail("late@example.com", "OTP", "123456", expires_at=timezone.now() - timedelta(seconds=1))
+        refused = queue_mail("nobody@example.com", "Hi", "x")
+        connection = FakeSMTPConnection([smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"no")})])
+
+        self.assertEqual(process_mail_batch(MailSender(connection)), (0, 0, 2))
+        refused.refresh_from_db()
+        self.assertEqual((refused.status, refused.attempts), ("FAILED", 1))
+        self.assertEqual(
+            OutboundEmail.objects.get(to_email="late@example.com").last_error, "Expired before it could be sent",
+        )
+        self.assertEqual(set(OutboundEmail.objects.values_list("body", flat=True)), {""})
+
+    def test_purge_deletes_old_finished_emails_in_chunks(self):
+        pending = queue_mail("a@example.com", "Hi", "A")
+        for status in ("SENT", "FAILED", "SENT"):
+            OutboundEmail.objects.create(to_email="b@example.com", subject="Hi", body="", status=status)
+        recent = OutboundEmail.objects.create(to_email="c@example.com", subject="Hi", body="", status="SENT")
+        OutboundEmail.objects.exclude(pk=recent.pk).update(created_at=timezone.now() - timedelta(days=30))
+        stdout = io.StringIO()
+
+        with override_settings(EMAIL_QUEUE_PURGE_CHUNK_SIZE=2):
+            call_command("send_queued_mail", "--purge", stdout=stdout)
+
+        self.assertIn("Deleted 3 finished email(s).", stdout.getvalue())
+        self.assertEqual(set(OutboundEmail.objects.values_list("pk", flat=True)), {pending.pk, recent.pk})
+
+    def test_command_sends_queued_mail(self):
+        queue_mail("gina@example.com", "Hello", "Body")
+        stdout = io.StringIO()
+
+        call_command("send_queued_mail", "--once", stdout=stdout)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Hello")
+        self.assertIn("Sent 1, retrying 0, gave up on 0", stdout.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            name="Hana", prenom="H", email="hana@example.com", password=make_password("pw"), phone="12345678",
+        )
+
+    def login(self):
+        self.client.post(reverse("login"), {"email": "hana@example.com", "password": "pw"})
+        body = OutboundEmail.objects.order_by("-id").first().body
+        return re.search(r"code is: (\d{6})", body).group(1)
+
+    def test_code_is_stored_hashed_and_one_live_per_user(self):
+        first = self.login()
+        second = self.login()
+
+        otp = EmailOTP.objects.get(user=self.user)
+        self.assertEqual(otp.code_hash, hash_otp(self.user.user_id, second))
+        self.assertNotIn(second, otp.code_hash)
+        if first != second:
+            self.assertFalse(consume_otp(self.user, first))
+        with self.assertRaises(IntegrityError):
+            EmailOTP.objects.create(user=self.user, code_hash="x", expires_at=timezone.now())
+
+    def test_verify_otp_logs_in_once(self):
+        code = self.login()
+
+        response = self.client.post(reverse("verify_otp"), {"otp_code": code})
+
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+        self.assertEqual(self.client.session["user_id"], self.user.user_id)
+        otp = EmailOTP.objects.get(user=self.user)
+        self.assertTrue(otp.is_used)
+        self.assertLessEqual(otp.expires_at, timezone.now())
+        self.assertFalse(consume_otp(self.user, code))
+
+    def test_expired_or_wrong_code_is_rejected(self):
+        code, _expires_at = issue_otp(self.user)
+        self.assertFalse(consume_otp(self.user, "not-it"))
+
+        EmailOTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(consume_otp(self.user, code))
+
+    def test_purge_deletes_expired_and_used_rows_in_chunks(self):
+        others = [
+            User.objects.create(name="U", prenom=str(i), email=f"u{i}@example.com", password="x", phone="1")
+            for i in range(5)
+        ]
+        for other in others:
+            issue_otp(other)
+        code, _expires_at = issue_otp(self.user)
+        consume_otp(self.user, code)
+        EmailOTP.objects.filter(user__in=others[:3]).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(purge_expired_otps(chunk_size=2), 4)
+        self.assertEqual(set(EmailOTP.objects.values_list("user", flat=True)), {others[3].user_id, others[4].user_id})
+
+        stdout = io.StringIO()
+        call_command("purge_otps", "--chunk-size", "10", stdout=stdout)
+        self.assertIn("Deleted 0 expired OTP(s).", stdout.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=PLAIN_STATIC_STORAGES)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            name="Ivan", prenom="I", email="ivan@example.com", password=make_password("pw"), phone="12345678",
+        )
+
+    def test_sliding_window_weights_previous_window(self):
+        limit = RateLimit("test", 3, 60)
+        self.assertEqual([limit.hit("a", now=6000 + second) for second in range(4)], [True, True, True, False])
+        self.assertTrue(limit.exceeded("a", now=6010))
+        self.assertFalse(limit.exceeded("b", now=6010))
+
+        # Halfway through the next window the 4 earlier attempts weigh 2.
+        self.assertEqual(limit.count("a", now=6090), 2)
+        self.assertTrue(limit.hit("a", now=6090))
+        self.assertFalse(limit.hit("a", now=6090))
+        self.assertFalse(limit.exceeded("a", now=6240))
+
+    def test_zero_limit_disables_throttling(self):
+        limit = RateLimit("off", 0, 60)
+        self.assertTrue(all(limit.hit("a") for _ in range(100)))
+        self.assertFalse(limit.exceeded("a"))
+
+    @override_settings(THROTTLE_LOGIN_EMAIL="2/300")
+    def test_login_flood_is_rejected_before_hashing_or_writes(self):
+        for _ in range(2):
+            response = self.client.post(reverse("login"), {"email": "IVAN@example.com", "password": "bad"})
+            self.assertEqual(response.status_code, 200)
+        activities = SystemActivity.objects.count()
+
+        with mock.patch("Rift_pay.views.check_password") as check:
+            response = self.client.post(reverse("login"), {"email": "ivan@example.com", "password": "pw"})
+
+        self.assertEqual(response.status_code, 429)
+        check.assert_not_called()
+        self.assertEqual(SystemActivity.objects.count(), activities)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(THROTTLE_OTP_EMAIL="2/300")
+    def test_otp_guessing_is_rejected(self):
+        self.client.post(reverse("login"), {"email": "ivan@example.com", "password": "pw"})
+        code = re.search(r"code is: (\d{6})", OutboundEmail.objects.get().body).group(1)
+        wrong = f"{(int(code) + 1) % 1000000:06d}"
+
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse("verify_otp"), {"otp_code": wrong}).status_code, 200)
+        response = self.client.post(reverse("verify_otp"), {"otp_code": code})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertNotIn("user_id", self.client.session)
+
+    @override_settings(THROTTLE_NFC_TERMINAL_FAILURES="2/60")
+    def test_bad_terminal_keys_are_throttled_per_terminal(self):
+        NFCTerminal.objects.create(terminal_id="TERM-T", merchant_name="Shop", api_key_hash=make_password("secret"))
+        NFCTerminal.objects.create(terminal_id="TERM-U", merchant_name="Shop", api_key_hash=make_password("secret"))
+
+        def tap(terminal_id, key):
+            return self.client.post(
+                reverse("nfc_payment"),
+                data=json.dumps({"terminal_id": terminal_id, "card_uid": "04FFFF", "amount": 100}),
+                content_type="application/json",
+                HTTP_X_TERMINAL_KEY=key,
+            )
+
+        self.assertEqual([tap("TERM-T", "wrong").status_code for _ in range(2)], [403, 403])
+        with mock.patch("Rift_pay.views.verify_terminal_key") as verify:
+            self.assertEqual(tap("TERM-T", "secret").status_code, 429)
+        verify.assert_not_called()
+        # Card lookup fails, but the other terminal is authenticated.
+        self.assertEqual(tap("TERM-U", "secret").status_code, 404)
+
+
+class NumberAllocationTests(TestCase):
+    def test_luhn(self):
+        self.assertEqual(numbers.luhn_check_digit("7992739871"), "3")
+        self.assertTrue(numbers.luhn_valid("4539 1488 0343 6467"))
+        self.assertFalse(numbers.luhn_valid("4539 1488 0343 6468"))
+
+    def test_permutation_is_a_keyed_bijection(self):
+        key = b"k" * 32
+        values = [numbers.permute(value, 3, key) for value in range(1000)]
+
+        self.assertEqual(sorted(values), list(range(1000)))
+        self.assertNotEqual(values[:10], list(range(10)))
+        self.assertNotEqual(values, [numbers.permute(value, 3, b"j" * 32) for value in range(1000)])
+
+    def test_formats(self):
+        account = numbers.allocate("account")
+        card = numbers.allocate("card")
+        nfc = numbers.allocate("nfc")
+
+        self.assertTrue(is_valid_account_number(account))
+        self.assertRegex(card, r"^0\d{3}( \d{4}){3}$")
+        self.assertRegex(nfc, r"^NFC 0\d{3} \d{4} \d{4}$")
+        for number in (account, card, nfc):
+            self.assertTrue(numbers.luhn_valid(number), number)
+
+    def test_bulk_allocation_is_unique_and_advances_the_counter(self):
+        first = numbers.allocate_many("account", 500)
+        second = numbers.allocate_many("account", 500)
+
+        self.assertEqual(len(set(first + second)), 1000)
+        self.assertEqual(NumberSequence.objects.get(name="account").next_value, 1000)
+        with self.assertNumQueries(0):
+            self.assertEqual(numbers.allocate_many("nfc", 0), [])
+
+    def test_rolled_back_values_are_reused_only_on_table_counters(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            lost = numbers.allocate("nfc")
+            raise RuntimeError
+
+        self.assertEqual(numbers.allocate("nfc"), lost)
+
+    def test_postgres_blocks_are_reserved_per_process(self):
+        reserved = iter(range(1000))
+        fake = lambda kind, count: [next(reserved) for _ in range(count)]
+
+        with mock.patch.object(connection, "vendor", "postgresql"), \
+                mock.patch("Rift_pay.services.numbers._reserve_from_sequence", side_effect=fake) as reserve, \
+                override_settings(NUMBER_BLOCK_SIZE=10):
+            numbers._blocks.clear()
+            self.assertEqual(numbers._reserve("card", 3), [0, 1, 2])
+            self.assertEqual(numbers._reserve("card", 7), [3, 4, 5, 6, 7, 8, 9])
+            self.assertEqual(numbers._reserve("card", 12), list(range(10, 22)))
+            self.assertEqual(reserve.call_count, 2)
+            with mock.patch("Rift_pay.services.numbers.os.getpid", return_value=-1):
+                self.assertEqual(numbers._reserve("card", 1), [22])
+        numbers._blocks.clear()
+
+    def test_register_assigns_allocated_numbers(self):
+        with mock.patch("Rift_pay.views.allocate_number", wraps=numbers.allocate) as allocate:
+            self.client.post(reverse("register"), {
+                "name": "Awa", "prenom": "Diop", "email": "awa@example.com", "phone": "+221771234567",
+                "password": "Str0ng!Pass", "confirm_password": "Str0ng!Pass",
+            })
+
+        self.assertEqual([call.args for call in allocate.call_args_list], [("account",), ("nfc",)])
+        card = NFCCard.objects.select_related("account").get(user__email="awa@example.com")
+        self.assertTrue(card.account.number.startswith("ACC0"))
+        self.assertTrue(numbers.luhn_valid(card.nfc_number))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserImportTests(TestCase):
+    HEADER = "name,prenom,email,phone,password\n"
+
+    def run_import(self, body, workers=1, chunk_size=2):
+        with password_hasher(workers) as hash_passwords:
+            return list(import_users(read_rows(io.StringIO(self.HEADER + body)), hash_passwords, chunk_size))
+
+    def test_creates_users_accounts_and_cards_with_a_report(self):
+        User.objects.create(name="Old", prenom="User", email="taken@example.com", password="x", phone="+221700000000")
+        results = self.run_import(
+            "Awa,Diop,awa@example.com,+221 77 123 45 67,Str0ngPass\n"
+            "Moussa,<script>,bad@example.com,+221771234568,Str0ngPass\n"
+            "Fatou,Sow,taken@example.com,+221771234569,Str0ngPass\n"
+            "Awa,Bis,awa@example.com,+221771234570,Str0ngPass\n"
+            "Ibou,Fall,ibou@example.com,+221771234571,short\n"
+            "Khady,Ba,khady@example.com,+221771234572,An0therPass\n"
+        )
+
+        self.assertEqual([(r["line"], r["status"]) for r in results], [
+            (2, "CREATED"), (3, "FAILED"), (4, "FAILED"), (5, "FAILED"), (6, "FAILED"), (7, "CREATED"),
+        ])
+        self.assertEqual(results[2]["error"], "Email already in use")
+        self.assertEqual(results[3]["error"], "Duplicate email in file")
+        awa = User.objects.get(email="awa@example.com")
+        self.assertTrue(check_password("Str0ngPass", awa.password))
+        self.assertEqual(awa.phone_normalized, "221771234567")
+        card = NFCCard.objects.select_related("account").get(user=awa)
+        self.assertEqual((card.status, card.label, card.account.user_id), ("VIRTUAL", "Carte de Diop", awa.user_id))
+        self.assertEqual((results[0]["account"], results[0]["nfc_number"]), (card.account.number, card.nfc_number))
+        self.assertEqual(SystemActivity.objects.filter(action="REGISTER").count(), 2)
+
+    def test_chunk_is_rolled_back_as_a_whole(self):
+        with mock.patch("Rift_pay.services.user_import.NFCCard.objects.bulk_create", side_effect=IntegrityError("dup")):
+            results = self.run_import("Awa,Diop,awa@example.com,+221771234567,Str0ngPass\n")
+
+        self.assertEqual(results[0]["status"], "FAILED")
+        self.assertIn("dup", results[0]["error"])
+        self.assertFalse(User.objects.filter(email="awa@example.com").exists())
+
+    def test_passwords_hashed_on_a_process_pool(self):
+        with password_hasher(2) as hash_passwords:
+            hashes = hash_passwords(["Str0ngPass", "An0therPass"])
+
+        self.assertTrue(check_password("Str0ngPass", hashes[0]))
+        self.assertTrue(check_password("An0therPass", hashes[1]))
+
+    def test_missing_columns_rejected(self):
+        with self.assertRaises(InvalidImport):
+            list(read_rows(io.StringIO("name,email\nAwa,awa@example.com\n")))
+
+    def test_command_writes_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = f"{directory}/users.csv"
+            report = f"{directory}/report.csv"
+            with open(source, "w", encoding="utf-8") as handle:
+                handle.write(self.HEADER + "Awa,Diop,awa@example.com,+221771234567,Str0ngPass\n"
+                             "Bad,Row,not-an-email,+221771234568,Str0ngPass\n")
+            stdout = io.StringIO()
+            call_command("import_users", source, "--report", report, "--workers", "1", stdout=stdout)
+            with open(report, encoding="utf-8") as handle:
+                rows = list(csv.DictReader(handle))
+
+        self.assertIn("1 user(s) created, 1 row(s) skipped.", stdout.getvalue())
+        self.assertEqual([(row["email"], row["status"], row["error"]) for row in rows], [
+            ("awa@example.com", "CREATED", ""), ("not-an-email", "FAILED", "Please enter a valid email address"),
+        ])
@@ -13,7 +13,10 @@ urlpatterns = [
     path('withdraw/', views.withdraw, name='withdraw'),
     path('account/mobile-money/', views.process_mobile_money, name='process_mobile_money'),
     path('history/', views.history, name='history'),
+    path('api/history/', views.history_feed, name='history_feed'),
+    path('api/statement/', views.statement_export, name='statement_export'),
     path('transfer/', views.transfer, name='transfer'),
+    path('api/transfers/bulk/', views.bulk_transfer_api, name='bulk_transfer'),
     path('webhooks/blockchain/', views.blockchain_webhook, name='blockchain_webhook'),
     path('webhooks/mobile-money/', views.mobile_money_webhook, name='mobile_money_webhook'),
     path('api/recipient-name/', views.get_recipient_name, name='get_recipient_name'),
@@ -43,6 +43,15 @@ _SQL_RE = re.compile(
     re.IGNORECASE | re.DOTALL,
 )
 
+# ── registration messages ──────────────────────────────────────────────────────
+# Shown by the registration form and reported by `manage.py import_users`.
+
+FIRST_NAME_MESSAGE = "First name must contain only letters, spaces, hyphens, or apostrophes (1–100 characters)"
+LAST_NAME_MESSAGE = "Last name must contain only letters, spaces, hyphens, or apostrophes (1–100 characters)"
+EMAIL_MESSAGE = "Please enter a valid email address"
+PHONE_MESSAGE = "Please enter a valid phone number"
+PASSWORD_MESSAGE = "Password must be at least 8 characters and include at least one letter and one digit"
+
 # ── public functions ───────────────────────────────────────────────────────────
 
 
@@ -75,6 +84,11 @@ def is_valid_phone(value: str) -> bool:
     return bool(value and _PHONE_RE.match(value.strip()))
 
 
+def normalize_phone(value: str) -> str:
+    """Return the digits of *value*, the form phone numbers are compared in."""
+    return re.sub(r"\D", "", value or "")
+
+
 def is_valid_password(value: str) -> bool:
     """Return True if *value* meets the minimum password policy.
 
@@ -1,29 +1,52 @@
 import json
-import re
 import uuid
-import secrets
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db import transaction as db_transaction
 from django.utils import timezone
+from django.utils.dateformat import format as date_format
 from django.utils.crypto import salted_hmac
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
-from django.core.mail import send_mail
-from django.core.mail import BadHeaderError
-from smtplib import SMTPException
 from django.views.decorators.csrf import csrf_exempt
 from decimal import Decimal
 from datetime import date, timedelta
 from urllib.parse import urlencode
 import random
-from .models import User, Transaction, Account, Card, SystemActivity, BlockchainProof, MobileMoneyTransaction, NFCCard, NFCTerminal, NFCPaymentTransaction, EmailOTP
-from .services.blockchain_client import sync_transaction, BlockchainSyncError
-from .services.mobile_money_client import initiate_mobile_money_transaction, MobileMoneyAPIError
+from .models import User, Transaction, Account, SystemActivity, BlockchainProof, MobileMoneyTransaction, NFCCard, NFCTerminal, NFCPaymentTransaction
+from .services import ledger
+from .services.audit import record_activity
+from .services.mail_queue import queue_mail
+from .services.otp import issue_otp, consume_otp
+from .services.nfc_spend import lock_daily_spend, record_daily_spend
+from .services.numbers import allocate as allocate_number
+from .services.terminal_auth import verify_terminal_key
+from .services.recipients import resolve_recipient, suggest_recipients, invalidate_recipient
+from .services.throttle import any_exceeded, hit_all, login_limits, nfc_limits, otp_limits, suggest_limits
+from .services.transfers import transfer_funds, InsufficientFunds, AccountNotFound
+from .services.bulk_transfers import bulk_transfer, parse_batch, InvalidBatch
+from .services.operation_feed import fetch_operations, InvalidCursor, DEFAULT_PAGE_SIZE
+from .services.statements import (
+    statement_window, statement_title, statement_operations, csv_chunks, pdf_chunks,
+)
+from .services.user_totals import add_to_totals, get_user_totals
+from .services.dashboard import get_dashboard_snapshot, invalidate_dashboard
+from .services.mobile_money_client import (
+    initiate_mobile_money_transaction, operator_breaker, MobileMoneyAPIError, OperatorUnavailable,
+)
+from .services.circuit_breaker import OPEN as CIRCUIT_OPEN
+from .services.mobile_money import settle_mobile_money, enqueue_dispatch
+from .services.webhooks import (
+    ingest_blockchain_events, ingest_mobile_money_events, split_events, summarize, InvalidPayload,
+    APPLIED as WEBHOOK_APPLIED, INVALID as WEBHOOK_INVALID, NOT_FOUND as WEBHOOK_NOT_FOUND,
+)
+from .templatetags.currency_filters import fcfa
+from .money import to_json as money_json
 from .validators import (
-    is_valid_name, is_valid_email, is_valid_phone, is_valid_password,
+    is_valid_name, is_valid_email, is_valid_phone, is_valid_password, normalize_phone,
     is_valid_account_number, is_valid_otp, is_safe_text,
+    FIRST_NAME_MESSAGE, LAST_NAME_MESSAGE, EMAIL_MESSAGE, PHONE_MESSAGE, PASSWORD_MESSAGE,
 )
 
 
@@ -34,39 +57,34 @@ def get_client_ip(request):
     return request.META.get('REMOTE_ADDR')
 
 
+def too_many_attempts(request, template):
+    # No log_activity: a throttled flood must not turn into audit-log writes.
+    return render(request, template, {'message': 'Too many attempts. Please wait a few minutes and try again.'},
+                  status=429)
+
+
 def log_activity(request, action, status='SUCCESS', user=None, detail=''):
-    SystemActivity.objects.create(
+    record_activity(SystemActivity(
         user=user,
         action=action,
         status=status,
         detail=detail,
         ip_address=get_client_ip(request),
         user_agent=(request.META.get('HTTP_USER_AGENT', '')[:255])
-    )
+    ))
 
 
 def generate_account_number():
-    while True:
-        number = f"ACC{random.randint(10**9, (10**10)-1)}"
-        if not Account.objects.filter(number=number).exists():
-            return number
+    return allocate_number('account')
 
 
 def generate_card_number():
-    while True:
-        raw = f"{random.randint(10**15, (10**16)-1)}"
-        card_number = f"{raw[0:4]} {raw[4:8]} {raw[8:12]} {raw[12:16]}"
-        if not Card.objects.filter(card_number=card_number).exists():
-            return card_number
+    return allocate_number('card')
 
 
 def generate_nfc_number():
-    """Generate a unique NFC card number like 'NFC 4821 7390 5612'."""
-    while True:
-        digits = f"{random.randint(10**11, (10**12)-1)}"
-        nfc_number = f"NFC {digits[0:4]} {digits[4:8]} {digits[8:12]}"
-        if not NFCCard.objects.filter(nfc_number=nfc_number).exists():
-            return nfc_number
+    """Allocate a unique NFC card number like 'NFC 0821 7390 5612'."""
+    return allocate_number('nfc')
 
 
 def generate_cvv():
@@ -80,7 +98,7 @@ def generate_expiration_date():
 
 
 def normalize_phone_number(phone):
-    return re.sub(r'\D', '', phone or '')
+    return normalize_phone(phone)
 
 
 def mask_phone_number(phone):
@@ -111,25 +129,19 @@ def register(request):
         phone = request.POST.get('phone', '').strip()
 
         if not is_valid_name(name):
-            return render(request, 'register.html', {
-                'message': 'First name must contain only letters, spaces, hyphens, or apostrophes (1–100 characters)'
-            })
+            return render(request, 'register.html', {'message': FIRST_NAME_MESSAGE})
 
         if not is_valid_name(prenom):
-            return render(request, 'register.html', {
-                'message': 'Last name must contain only letters, spaces, hyphens, or apostrophes (1–100 characters)'
-            })
+            return render(request, 'register.html', {'message': LAST_NAME_MESSAGE})
 
         if not is_valid_email(email):
-            return render(request, 'register.html', {'message': 'Please enter a valid email address'})
+            return render(request, 'register.html', {'message': EMAIL_MESSAGE})
 
         if not is_valid_phone(phone):
-            return render(request, 'register.html', {'message': 'Please enter a valid phone number'})
+            return render(request, 'register.html', {'message': PHONE_MESSAGE})
 
         if not is_valid_password(password):
-            return render(request, 'register.html', {
-                'message': 'Password must be at least 8 characters and include at least one letter and one digit'
-            })
+            return render(request, 'register.html', {'message': PASSWORD_MESSAGE})
 
         if password != confirm_password:
             log_activity(request, action='REGISTER', status='FAILED', detail=f"Password mismatch for email {email}")
@@ -165,6 +177,8 @@ def register(request):
                 label=f"Carte de {user.prenom}",
             )
 
+        # Drop cached "not found" answers for the new identifiers.
+        invalidate_recipient(('email', email), ('phone', phone))
         log_activity(request, action='REGISTER', status='SUCCESS', user=user, detail='New user account created')
 
         return redirect('login')
@@ -176,37 +190,33 @@ def login(request):
         email = request.POST.get('email', '').strip()
         password = request.POST.get('password', '')
 
+        # Before the password hash, the OTP email and the audit insert.
+        if not hit_all(zip(login_limits(), (get_client_ip(request), email))):
+            return too_many_attempts(request, 'login.html')
+
         try:
             user = User.objects.get(email=email)
             if check_password(password, user.password):
                 # Credentials valid – generate and send OTP
                 expiry_minutes = getattr(settings, 'OTP_EXPIRY_MINUTES', 10)
-                code = f"{secrets.randbelow(1000000):06d}"
-                EmailOTP.objects.create(
-                    user=user,
-                    code=code,
-                    expires_at=timezone.now() + timedelta(minutes=expiry_minutes),
-                )
-                try:
-                    send_mail(
+                with db_transaction.atomic():
+                    code, expires_at = issue_otp(user)
+                    # Sent by `manage.py send_queued_mail`; the request only pays for the INSERTs.
+                    queue_mail(
+                        to_email=user.email,
                         subject='Your Rift Pay verification code',
-                        message=(
+                        body=(
                             f"Hello {user.prenom},\n\n"
                             f"Your verification code is: {code}\n\n"
                             f"This code expires in {expiry_minutes} minutes.\n\n"
                             "If you did not request this, please ignore this email."
                         ),
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[user.email],
-                        fail_silently=False,
+                        expires_at=expires_at,
                     )
-                except (SMTPException, BadHeaderError, OSError):
-                    log_activity(request, action='LOGIN', status='FAILED', user=user, detail='Failed to send OTP email')
-                    return render(request, 'login.html', {'message': 'Unable to send verification email. Please try again.'})
 
                 # Store user id in session (pending OTP verification)
                 request.session['otp_user_id'] = user.user_id
-                log_activity(request, action='LOGIN', status='SUCCESS', user=user, detail='OTP sent for 2FA')
+                log_activity(request, action='LOGIN', status='SUCCESS', user=user, detail='OTP queued for 2FA')
                 return redirect('verify_otp')
             log_activity(request, action='LOGIN', status='FAILED', user=user, detail='Invalid password')
             return render(request, 'login.html', {'message': 'Invalid email or password'})
@@ -229,15 +239,10 @@ def verify_otp(request):
         return redirect('login')
 
     if request.method == 'POST':
+        if not hit_all(zip(otp_limits(), (get_client_ip(request), user.email))):
+            return too_many_attempts(request, 'verify_otp.html')
         code = request.POST.get('otp_code', '').strip()
-        otp = (
-            EmailOTP.objects.filter(user=user, code=code, is_used=False, expires_at__gt=timezone.now())
-            .order_by('-created_at')
-            .first()
-        )
-        if otp:
-            otp.is_used = True
-            otp.save()
+        if consume_otp(user, code):
             del request.session['otp_user_id']
             request.session['user_id'] = user.user_id
             request.session['user_email'] = user.email
@@ -278,7 +283,7 @@ def transfer(request):
                 {
                     'success': False,
                     'error': message,
-                    'available_balance': float(current_balance),
+                    'available_balance': money_json(current_balance),
                 },
                 status=status,
             )
@@ -342,7 +347,7 @@ def transfer(request):
                         return respond_error(f'No user found with email: {lookup_value}')
                 elif lookup_type == 'phone':
                     try:
-                        receiver = User.objects.get(phone=lookup_value)
+                        receiver = User.objects.get(phone_normalized=normalize_phone(lookup_value))
                     except User.DoesNotExist:
                         log_activity(request, action='TRANSFER', status='FAILED', detail=f'Recipient not found by phone: {lookup_value}')
                         return respond_error(f'No user found with phone: {lookup_value}')
@@ -382,77 +387,34 @@ def transfer(request):
                 log_activity(request, action='TRANSFER', status='FAILED', user=sender, detail='Sender account not found')
                 return respond_error('Sender account not found', status=404)
             
-            with db_transaction.atomic():
-                # Create local transaction
-                transfer_tx = Transaction(
-                    sender=sender,
-                    receiver=receiver,
-                    amount=amount
-                )
-                transfer_tx.save()
-
-                # Update balances in local DB
-                sender_account.balance -= amount
-                sender_account.save()
-
-                try:
-                    receiver_account = Account.objects.get(user=receiver)
-                    receiver_account.balance += amount
-                    receiver_account.save()
-                except Account.DoesNotExist:
-                    receiver_account = Account(
-                        user=receiver,
-                        number=generate_account_number(),
-                        balance=amount
-                    )
-                    receiver_account.save()
-
-            # Sync with Stellar backend outside the atomic block so a blockchain
-            # failure does not roll back the already-committed balance changes.
+            # The balance read above is only a fast pre-check; transfer_funds
+            # re-checks it on the locked row.
             try:
-                sync_data = sync_transaction(transfer_tx)
-                BlockchainProof.objects.update_or_create(
-                    reference_id=sync_data['reference_id'],
-                    defaults={
-                        'stellar_transaction_hash': sync_data.get('stellar_transaction_hash') or f"pending-{transfer_tx.id}",
-                        'proof_hash': sync_data.get('proof_hash') or f"pending-proof-{transfer_tx.id}",
-                        'status': 'CONFIRMED' if sync_data.get('stellar_transaction_hash') else 'PENDING',
-                        'local_transaction_id': transfer_tx.id,
-                        'amount': float(sync_data.get('amount')),
-                        'currency': sync_data.get('currency', 'FCFA'),
-                        'synced_at': timezone.now() if sync_data.get('stellar_transaction_hash') else None,
-                    }
-                )
-                log_activity(
-                    request,
-                    action='TRANSFER',
-                    status='SUCCESS',
-                    user=sender,
-                    detail=f'Transfer #{transfer_tx.id} sent to user {receiver.user_id} for {amount}'
-                )
-            except BlockchainSyncError as e:
-                # The local transfer has already been committed; record the proof
-                # as PENDING so it can be reconciled later via the webhook.
-                # Use "local-" prefix (distinct from sync_transaction's "tx-" prefix)
-                # to avoid any reference_id collision.
-                BlockchainProof.objects.update_or_create(
-                    reference_id=f"local-{transfer_tx.id}",
-                    defaults={
-                        'stellar_transaction_hash': f"unsynced-{transfer_tx.id}",
-                        'proof_hash': f"unsynced-proof-{transfer_tx.id}",
-                        'status': 'PENDING',
-                        'local_transaction_id': transfer_tx.id,
-                        'amount': float(transfer_tx.amount),
-                        'currency': 'FCFA',
-                    }
+                transfer_tx, sender_balance = transfer_funds(
+                    sender,
+                    receiver,
+                    amount,
+                    open_account=lambda user: Account(user=user, number=generate_account_number(), balance=Decimal('0.00')),
                 )
+            except InsufficientFunds as exc:
+                sender_account.balance = exc.balance
                 log_activity(
                     request,
                     action='TRANSFER',
-                    status='SUCCESS',
+                    status='FAILED',
                     user=sender,
-                    detail=f'Transfer #{transfer_tx.id} completed (blockchain sync pending: {str(e)})'
+                    detail=f'Insufficient funds for transfer of {amount}'
                 )
+                return respond_error(f'Insufficient balance. Your balance: {exc.balance} FCFA')
+            sender_account.balance = sender_balance
+
+            log_activity(
+                request,
+                action='TRANSFER',
+                status='SUCCESS',
+                user=sender,
+                detail=f'Transfer #{transfer_tx.id} sent to user {receiver.user_id} for {amount} (blockchain sync queued)'
+            )
 
             # Success response
             context = {
@@ -468,7 +430,7 @@ def transfer(request):
                         'success': True,
                         'message': context['success'],
                         'transaction_id': transfer_tx.id,
-                        'available_balance': float(sender_account.balance),
+                        'available_balance': money_json(sender_account.balance),
                         'receipt_url': receipt_url,
                     }
                 )
@@ -482,6 +444,64 @@ def transfer(request):
     # GET request - display transfer form
     return render(request, 'transfer.html', build_context())
 
+def bulk_transfer_api(request):
+    """Pay many recipients in one request (payroll).
+
+    Accepts a JSON body (``{"transfers": [...]}``) or an uploaded CSV/JSON
+    file in the ``file`` field, and returns one result per line.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    user_id = request.session.get('user_id')
+    sender = User.objects.filter(user_id=user_id).first() if user_id else None
+    if not sender:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+            lines = parse_batch(upload.read().decode('utf-8-sig'), fmt)
+        else:
+            lines = parse_batch(request.body.decode('utf-8'), 'json')
+    except (InvalidBatch, UnicodeDecodeError) as exc:
+        log_activity(request, action='BULK_TRANSFER', status='FAILED', user=sender, detail=f'Invalid batch: {exc}')
+        return JsonResponse({'success': False, 'error': str(exc) or 'Invalid batch'}, status=400)
+
+    max_lines = getattr(settings, 'BULK_TRANSFER_MAX_LINES', 1000)
+    if not lines or len(lines) > max_lines:
+        return JsonResponse({'success': False, 'error': f'A batch must contain between 1 and {max_lines} transfers'}, status=400)
+
+    try:
+        results, balance = bulk_transfer(
+            sender,
+            lines,
+            open_account=lambda user: Account(user=user, number=generate_account_number(), balance=Decimal('0.00')),
+        )
+    except InsufficientFunds as exc:
+        log_activity(request, action='BULK_TRANSFER', status='FAILED', user=sender, detail=f'Insufficient funds for a batch of {len(lines)} transfers')
+        return JsonResponse({'success': False, 'error': f'Insufficient balance. Your balance: {exc.balance} FCFA'}, status=400)
+    except AccountNotFound:
+        log_activity(request, action='BULK_TRANSFER', status='FAILED', user=sender, detail='Sender account not found')
+        return JsonResponse({'success': False, 'error': 'Sender account not found'}, status=404)
+
+    succeeded = sum(1 for result in results if result['status'] == 'SUCCESS')
+    log_activity(
+        request,
+        action='BULK_TRANSFER',
+        status='SUCCESS' if succeeded else 'FAILED',
+        user=sender,
+        detail=f'Bulk transfer: {succeeded}/{len(results)} lines applied (blockchain sync queued)'
+    )
+    return JsonResponse({
+        'success': succeeded > 0,
+        'applied': succeeded,
+        'failed': len(results) - succeeded,
+        'available_balance': money_json(balance),
+        'results': results,
+    })
+
 def transaction_receipt(request, tx_id):
     """Display a transaction processing animation and receipt for a completed transfer."""
     user_id = request.session.get('user_id')
@@ -516,28 +536,48 @@ def transaction_receipt(request, tx_id):
 def get_recipient_name(request):
     """AJAX endpoint to fetch recipient name by email"""
     if request.method == 'GET':
-        email = request.GET.get('email', '')
-        
-        try:
-            user = User.objects.get(email=email)
+        email = request.GET.get('email', '').strip()
+
+        recipient = resolve_recipient('email', email) if is_valid_email(email) else None
+        if recipient:
             return JsonResponse({
                 'success': True,
-                'name': f"{user.name} {user.prenom}"
-            })
-        except User.DoesNotExist:
-            return JsonResponse({
-                'success': False,
-                'error': 'User not found'
+                'name': recipient['name']
             })
+        return JsonResponse({
+            'success': False,
+            'error': 'User not found'
+        })
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 def get_recipient_info(request):
-    """AJAX endpoint to fetch recipient info by email, phone, or account number"""
+    """AJAX endpoint to fetch recipient info by email, phone, or account number.
+
+    With ``mode=suggest`` it returns the recipients whose identifier starts
+    with ``value``, masked unless typed in full (autocomplete; logged-in
+    users only, throttled).
+    """
     if request.method == 'GET':
         lookup_type = request.GET.get('type', 'email')
         lookup_value = request.GET.get('value', '').strip()
 
+        if lookup_type not in ('email', 'phone', 'account'):
+            return JsonResponse({'success': False, 'error': 'Invalid lookup type'})
+
+        if request.GET.get('mode') == 'suggest':
+            if not request.session.get('user_id'):
+                return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+            # Prefix walks would enumerate the customer base.
+            if not hit_all(zip(suggest_limits(), (request.session['user_id'], get_client_ip(request)))):
+                return JsonResponse({'success': False, 'error': 'Too many requests'}, status=429)
+            if len(lookup_value) > 254 or not is_safe_text(lookup_value):
+                return JsonResponse({'success': False, 'error': 'Invalid prefix'})
+            return JsonResponse({
+                'success': True,
+                'suggestions': suggest_recipients(lookup_type, lookup_value),
+            })
+
         # Validate the lookup value format before querying the database
         if lookup_type == 'email':
             if not is_valid_email(lookup_value):
@@ -548,28 +588,18 @@ def get_recipient_info(request):
         elif lookup_type == 'account':
             if not is_valid_account_number(lookup_value):
                 return JsonResponse({'success': False, 'error': 'Invalid account number format'})
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid lookup type'})
-
-        try:
-            if lookup_type == 'email':
-                user = User.objects.get(email=lookup_value)
-            elif lookup_type == 'phone':
-                user = User.objects.get(phone=lookup_value)
-            else:  # account
-                account = Account.objects.get(number=lookup_value)
-                user = account.user
 
+        recipient = resolve_recipient(lookup_type, lookup_value)
+        if recipient:
             return JsonResponse({
                 'success': True,
-                'name': f"{user.name} {user.prenom}",
-                'user_id': user.user_id
-            })
-        except (User.DoesNotExist, Account.DoesNotExist):
-            return JsonResponse({
-                'success': False,
-                'error': 'User not found'
+                'name': recipient['name'],
+                'user_id': recipient['user_id']
             })
+        return JsonResponse({
+            'success': False,
+            'error': 'User not found'
+        })
 
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
@@ -596,105 +626,24 @@ def home(request):
             return redirect('login')
     
     if user:
-        try:
-            account = Account.objects.get(user=user)
-            nfc_card = NFCCard.objects.filter(user=user).first()
-
-            # If user registered before NFC feature, create a virtual card now
-            if not nfc_card and account:
-                nfc_card = NFCCard.objects.create(
-                    nfc_number=generate_nfc_number(),
-                    user=user,
-                    account=account,
-                    status='VIRTUAL',
-                    label=f"Carte de {user.prenom}",
-                )
+        # If user registered before NFC feature, create a virtual card now
+        def create_virtual_card(account):
+            return NFCCard.objects.create(
+                nfc_number=generate_nfc_number(),
+                user=user,
+                account=account,
+                status='VIRTUAL',
+                label=f"Carte de {user.prenom}",
+            )
 
-            # Compute today's NFC spending
-            from django.db.models import Sum
-            today = timezone.now().date()
-            today_spent = Decimal('0.00')
-            if nfc_card and nfc_card.status == 'ACTIVE':
-                today_spent = NFCPaymentTransaction.objects.filter(
-                    nfc_card=nfc_card,
-                    status='SUCCESS',
-                    created_at__date=today,
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-            sent_transactions = Transaction.objects.filter(
-                sender=user
-            ).select_related('receiver').order_by('-timestamp')[:5]
-
-            received_transactions = Transaction.objects.filter(
-                receiver=user
-            ).exclude(sender=user).select_related('sender').order_by('-timestamp')[:5]
-
-            mm_transactions = MobileMoneyTransaction.objects.filter(
-                user=user
-            ).order_by('-created_at')[:8]
-
-            nfc_transactions = NFCPaymentTransaction.objects.filter(
-                user=user
-            ).select_related('terminal').order_by('-created_at')[:8]
-
-            recent_operations = []
-
-            for transaction in sent_transactions:
-                recent_operations.append({
-                    'kind': 'TRANSFER_SENT',
-                    'title': f"To: {transaction.receiver.name} {transaction.receiver.prenom}",
-                    'amount_prefix': '-',
-                    'amount': transaction.amount,
-                    'timestamp': transaction.timestamp,
-                    'status': 'SUCCESS',
-                    'icon': '📤',
-                })
-
-            for transaction in received_transactions:
-                recent_operations.append({
-                    'kind': 'TRANSFER_RECEIVED',
-                    'title': f"From: {transaction.sender.name} {transaction.sender.prenom}",
-                    'amount_prefix': '+',
-                    'amount': transaction.amount,
-                    'timestamp': transaction.timestamp,
-                    'status': 'SUCCESS',
-                    'icon': '📥',
-                })
-
-            for operation in mm_transactions:
-                recent_operations.append({
-                    'kind': operation.direction,
-                    'title': f"{operation.direction.title()} {operation.operator} ({operation.customer_phone_masked})",
-                    'amount_prefix': '+' if operation.direction == 'DEPOSIT' else '-',
-                    'amount': operation.amount,
-                    'timestamp': operation.created_at,
-                    'status': operation.status,
-                    'icon': '➕' if operation.direction == 'DEPOSIT' else '➖',
-                })
-
-            for nfc_tx in nfc_transactions:
-                merchant = nfc_tx.terminal.merchant_name if nfc_tx.terminal else 'NFC Payment'
-                recent_operations.append({
-                    'kind': 'NFC_PAYMENT',
-                    'title': f"NFC: {merchant}",
-                    'amount_prefix': '-',
-                    'amount': nfc_tx.amount,
-                    'timestamp': nfc_tx.created_at,
-                    'status': nfc_tx.status,
-                    'icon': '📶',
-                })
-
-            recent_operations.sort(key=lambda item: item['timestamp'], reverse=True)
-            recent_operations = recent_operations[:8]
-            
-            context['user'] = user
-            context['account'] = account
-            context['nfc_card'] = nfc_card
-            context['today_spent'] = today_spent
-            context['recent_operations'] = recent_operations
-        except Account.DoesNotExist:
-            context['user'] = user
-            context['account'] = None
+        snapshot = get_dashboard_snapshot(user, create_nfc_card=create_virtual_card)
+
+        context['user'] = user
+        context['account'] = snapshot['account']
+        if snapshot['account']:
+            context['nfc_card'] = snapshot['nfc_card']
+            context['today_spent'] = snapshot['today_spent']
+            context['recent_operations'] = snapshot['recent_operations']
 
     if user and user.last_profile_update:
         next_allowed = user.last_profile_update + timedelta(days=90)
@@ -767,12 +716,15 @@ def update_profile(request):
         params = urlencode({'error': 'Email already used by another account'})
         return redirect(f"{reverse('home')}?{params}")
 
+    previous_lookups = [('email', user.email), ('phone', user.phone)]
     user.name = name
     user.prenom = prenom
     user.email = email
     user.phone = phone
     user.last_profile_update = timezone.now()
     user.save(update_fields=['name', 'prenom', 'email', 'phone', 'last_profile_update'])
+    account_number = Account.objects.filter(user=user).values_list('number', flat=True).first()
+    invalidate_recipient(*previous_lookups, ('email', email), ('phone', phone), ('account', account_number))
     log_activity(request, action='PROFILE_UPDATE', status='SUCCESS', user=user, detail='Profile updated')
 
     request.session['user_email'] = user.email
@@ -896,7 +848,20 @@ def process_mobile_money(request):
         params = urlencode({'error': f'Insufficient balance. Current: {account.balance} FCFA'})
         return redirect(f"{target_url}?{params}")
 
+    # Fail fast while the operator is known to be down instead of holding this
+    # worker for the whole API timeout.
+    circuit_open = operator_breaker(operator).state == CIRCUIT_OPEN
+    queue_when_unavailable = getattr(settings, 'MOBILE_MONEY_CIRCUIT_OPEN_POLICY', 'reject') == 'queue'
+    if circuit_open and not queue_when_unavailable:
+        log_activity(request, action=direction, status='FAILED', user=actor, detail=f'{operator} circuit open, operation rejected')
+        params = urlencode({'error': 'Operator service unavailable. Please try again later.'})
+        return redirect(f"{target_url}?{params}")
+
     external_reference = f"mm-{actor.user_id}-{uuid.uuid4().hex[:18]}"
+    customer_name = f"{actor.name} {actor.prenom}"
+    # Deferred: the request ends with the INSERTs below and the
+    # run_mobile_money_dispatcher worker talks to the operator.
+    deferred = getattr(settings, 'MOBILE_MONEY_DISPATCH_MODE', 'inline') == 'deferred'
 
     with db_transaction.atomic():
         account = Account.objects.select_for_update().get(user=actor)
@@ -917,6 +882,30 @@ def process_mobile_money(request):
             customer_phone_hash=hash_phone_number(normalized_phone),
             status='PENDING',
         )
+        add_to_totals(actor.user_id, operations=1)
+        invalidate_dashboard(actor.user_id)
+
+        if deferred:
+            enqueue_dispatch(mm_transaction, normalized_phone, customer_name)
+
+    def queue_operation():
+        with db_transaction.atomic():
+            mm_transaction.response_code = 'QUEUED'
+            mm_transaction.response_message = 'Operator unavailable, queued for dispatch'
+            mm_transaction.save(update_fields=['response_code', 'response_message', 'updated_at'])
+            if not deferred:
+                enqueue_dispatch(mm_transaction, normalized_phone, customer_name)
+        log_activity(request, action=direction, status='SUCCESS', user=actor, detail=f'{operator} circuit open, operation queued. Ref: {external_reference}')
+        params = urlencode({'message': 'Operator temporarily unavailable. Your operation is queued and will be sent automatically.'})
+        return redirect(f"{target_url}?{params}")
+
+    if circuit_open:
+        return queue_operation()
+
+    if deferred:
+        log_activity(request, action=direction, status='SUCCESS', user=actor, detail=f'Mobile money {direction.lower()} via {operator} queued. Ref: {external_reference}')
+        params = urlencode({'message': 'Operation initiated. Awaiting operator confirmation.'})
+        return redirect(f"{target_url}?{params}")
 
     try:
         operator_response = initiate_mobile_money_transaction(
@@ -925,12 +914,17 @@ def process_mobile_money(request):
             phone_number=normalized_phone,
             amount=amount,
             external_reference=external_reference,
-            customer_name=f"{actor.name} {actor.prenom}",
+            customer_name=customer_name,
         )
+    except OperatorUnavailable as error:
+        if queue_when_unavailable:
+            return queue_operation()
+        settle_mobile_money(mm_transaction.id, 'FAILED', message=sanitize_error_message(error))
+        log_activity(request, action=direction, status='FAILED', user=actor, detail=f'{operator} circuit open, operation rejected')
+        params = urlencode({'error': 'Operator service unavailable. Please try again later.'})
+        return redirect(f"{target_url}?{params}")
     except MobileMoneyAPIError as error:
-        mm_transaction.status = 'FAILED'
-        mm_transaction.response_message = sanitize_error_message(error)
-        mm_transaction.save(update_fields=['status', 'response_message', 'updated_at'])
+        settle_mobile_money(mm_transaction.id, 'FAILED', message=sanitize_error_message(error), dispatched=True)
         log_activity(request, action=direction, status='FAILED', user=actor, detail='Mobile money API error')
         params = urlencode({'error': 'Operator service unavailable. Please try again later.'})
         return redirect(f"{target_url}?{params}")
@@ -939,30 +933,14 @@ def process_mobile_money(request):
     if status_value not in {'PENDING', 'SUCCESS', 'FAILED'}:
         status_value = 'PENDING'
 
-    with db_transaction.atomic():
-        account = Account.objects.select_for_update().get(user=actor)
-        mm_transaction = MobileMoneyTransaction.objects.select_for_update().get(id=mm_transaction.id)
-
-        mm_transaction.status = status_value
-        mm_transaction.operator_reference = operator_response.get('operator_reference', '')[:100]
-        mm_transaction.response_code = operator_response.get('response_code', '')[:30]
-        mm_transaction.response_message = sanitize_error_message(operator_response.get('message', ''))
-
-        if status_value == 'SUCCESS':
-            if direction == 'DEPOSIT':
-                account.balance += amount
-            else:
-                if account.balance < amount:
-                    mm_transaction.status = 'FAILED'
-                    mm_transaction.response_message = 'Insufficient balance during settlement'
-                else:
-                    account.balance -= amount
-
-        if mm_transaction.status in {'SUCCESS', 'FAILED'}:
-            mm_transaction.processed_at = timezone.now()
-
-        account.save(update_fields=['balance'])
-        mm_transaction.save()
+    mm_transaction, account = settle_mobile_money(
+        mm_transaction.id,
+        status_value,
+        operator_reference=operator_response.get('operator_reference', ''),
+        response_code=operator_response.get('response_code', ''),
+        message=sanitize_error_message(operator_response.get('message', '')),
+        dispatched=True,
+    )
 
     final_action = 'DEPOSIT' if direction == 'DEPOSIT' else 'WITHDRAW'
     final_status = 'SUCCESS' if mm_transaction.status == 'SUCCESS' else 'FAILED' if mm_transaction.status == 'FAILED' else 'SUCCESS'
@@ -991,6 +969,7 @@ def history(request):
     context = {
         'user': None,
         'all_operations': [],
+        'next_cursor': None,
         'total_sent': 0,
         'total_received': 0,
         'total_deposit': 0,
@@ -1002,104 +981,114 @@ def history(request):
     if user_id:
         try:
             user = User.objects.get(user_id=user_id)
-            
-            sent_transactions = Transaction.objects.filter(
-                sender=user
-            ).select_related('receiver').order_by('-timestamp')
-            
-            received_transactions = Transaction.objects.filter(
-                receiver=user
-            ).select_related('sender').order_by('-timestamp')
 
-            mobile_money_transactions = MobileMoneyTransaction.objects.filter(
-                user=user
-            ).order_by('-created_at')
+            # Only the first page is rendered; the rest is loaded by the
+            # infinite scroll through history_feed.
+            all_operations, next_cursor = fetch_operations(user)
+
+            totals = get_user_totals(user)
 
-            nfc_payment_transactions = NFCPaymentTransaction.objects.filter(
-                user=user
-            ).select_related('terminal', 'nfc_card').order_by('-created_at')
-            
-            total_sent = sum(t.amount for t in sent_transactions)
-            total_received = sum(t.amount for t in received_transactions)
-            total_deposit = sum(t.amount for t in mobile_money_transactions if t.direction == 'DEPOSIT' and t.status == 'SUCCESS')
-            total_withdraw = sum(t.amount for t in mobile_money_transactions if t.direction == 'WITHDRAW' and t.status == 'SUCCESS')
-            total_nfc = sum(t.amount for t in nfc_payment_transactions if t.status == 'SUCCESS')
-
-            all_operations = []
-
-            for transfer in sent_transactions:
-                all_operations.append({
-                    'type': 'sent',
-                    'title': 'Sent Money',
-                    'counterparty_label': 'To',
-                    'counterparty': f"{transfer.receiver.name} {transfer.receiver.prenom}",
-                    'date_label': 'Date',
-                    'date': transfer.timestamp,
-                    'amount_prefix': '-',
-                    'amount': transfer.amount,
-                    'status': 'SUCCESS',
-                })
-
-            for transfer in received_transactions:
-                all_operations.append({
-                    'type': 'received',
-                    'title': 'Received Money',
-                    'counterparty_label': 'From',
-                    'counterparty': f"{transfer.sender.name} {transfer.sender.prenom}",
-                    'date_label': 'Date',
-                    'date': transfer.timestamp,
-                    'amount_prefix': '+',
-                    'amount': transfer.amount,
-                    'status': 'SUCCESS',
-                })
-
-            for mm in mobile_money_transactions:
-                mm_type = 'deposit' if mm.direction == 'DEPOSIT' else 'withdraw'
-                amount_prefix = '+' if mm.direction == 'DEPOSIT' else '-'
-                all_operations.append({
-                    'type': mm_type,
-                    'title': 'Mobile Money Deposit' if mm.direction == 'DEPOSIT' else 'Mobile Money Withdrawal',
-                    'counterparty_label': 'Operator',
-                    'counterparty': f"{mm.operator} ({mm.customer_phone_masked})",
-                    'date_label': 'Created',
-                    'date': mm.created_at,
-                    'amount_prefix': amount_prefix,
-                    'amount': mm.amount,
-                    'status': mm.status,
-                })
-
-            for nfc_tx in nfc_payment_transactions:
-                merchant = nfc_tx.terminal.merchant_name if nfc_tx.terminal else 'NFC Payment'
-                all_operations.append({
-                    'type': 'nfc_payment',
-                    'title': 'NFC Payment',
-                    'counterparty_label': 'Merchant',
-                    'counterparty': merchant,
-                    'date_label': 'Date',
-                    'date': nfc_tx.created_at,
-                    'amount_prefix': '-',
-                    'amount': nfc_tx.amount,
-                    'status': nfc_tx.status,
-                })
-            
-            all_operations.sort(
-                key=lambda x: x['date'],
-                reverse=True
-            )
-            
             context['user'] = user
             context['all_operations'] = all_operations
-            context['total_sent'] = float(total_sent)
-            context['total_received'] = float(total_received)
-            context['total_deposit'] = float(total_deposit)
-            context['total_withdraw'] = float(total_withdraw)
-            context['total_nfc'] = float(total_nfc)
-            context['total_count'] = len(all_operations)
+            context['next_cursor'] = next_cursor
+            context['total_sent'] = totals.total_sent
+            context['total_received'] = totals.total_received
+            context['total_deposit'] = totals.total_deposit
+            context['total_withdraw'] = totals.total_withdraw
+            context['total_nfc'] = totals.total_nfc
+            context['total_count'] = totals.operation_count
         except User.DoesNotExist:
             pass
     
     return render(request, 'history.html', context)
 
+
+def history_feed(request):
+    """AJAX endpoint returning the next page of the operation history"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    user_id = request.session.get('user_id')
+    if not user_id:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    user = User.objects.filter(user_id=user_id).first()
+    if not user:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+
+    try:
+        operations, next_cursor = fetch_operations(user, cursor=request.GET.get('cursor') or None, limit=limit)
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'operations': [
+            {
+                'type': operation['type'],
+                'title': operation['title'],
+                'counterparty': operation['counterparty'],
+                'date': operation['date'].isoformat(),
+                'date_display': date_format(timezone.localtime(operation['date']), 'd M Y · H:i'),
+                'amount_prefix': operation['amount_prefix'],
+                'amount': str(operation['amount']),
+                'amount_display': fcfa(operation['amount']),
+                'status': operation['status'],
+            }
+            for operation in operations
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+def statement_export(request):
+    """Stream the user's statement for a date range as CSV or PDF.
+
+    Query string: ``start`` and ``end`` (YYYY-MM-DD, both included, default
+    the current month) and ``format`` (csv or pdf).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    user_id = request.session.get('user_id')
+    user = User.objects.filter(user_id=user_id).first() if user_id else None
+    if not user:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    export_format = request.GET.get('format', 'csv').lower()
+    if export_format not in {'csv', 'pdf'}:
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+
+    today = timezone.localdate()
+    try:
+        start_date = date.fromisoformat(request.GET.get('start') or today.replace(day=1).isoformat())
+        end_date = date.fromisoformat(request.GET.get('end') or today.isoformat())
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date (expected YYYY-MM-DD)'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'success': False, 'error': 'start must not be after end'}, status=400)
+
+    start, end = statement_window(start_date, end_date)
+    operations = statement_operations(user, start, end)
+    account = Account.objects.filter(user=user).first()
+    filename = f"statement-{account.number if account else user.user_id}-{start_date}-{end_date}.{export_format}"
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_chunks(operations), content_type='text/csv; charset=utf-8')
+    else:
+        title = statement_title(user, account, start_date, end_date)
+        response = StreamingHttpResponse(pdf_chunks(operations, title), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    log_activity(request, action='STATEMENT_EXPORT', status='SUCCESS', user=user,
+                 detail=f'{export_format.upper()} statement {start_date} - {end_date}')
+    return response
+
 def logout(request):
     """Logout user and clear session"""
     user = None
@@ -1111,126 +1100,96 @@ def logout(request):
     return redirect('login')
 
 
-@csrf_exempt
-def blockchain_webhook(request):
+def _webhook_events(request, expected_token):
+    """Authenticate a webhook call and return ``(events, is_batch, error_response)``."""
     if request.method != 'POST':
-        return JsonResponse({'error': 'Method not allowed'}, status=405)
+        return None, False, JsonResponse({'error': 'Method not allowed'}, status=405)
 
-    expected_token = settings.BLOCKCHAIN_WEBHOOK_TOKEN.strip()
     provided_token = request.headers.get('X-Webhook-Token', '').strip()
     if expected_token and provided_token != expected_token:
-        return JsonResponse({'error': 'Unauthorized webhook'}, status=401)
+        return None, False, JsonResponse({'error': 'Unauthorized webhook'}, status=401)
 
     try:
         payload = json.loads(request.body.decode('utf-8'))
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        events, is_batch = split_events(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError, InvalidPayload):
+        return None, False, JsonResponse({'error': 'Invalid JSON body'}, status=400)
 
-    reference_id = payload.get('reference_id', '').strip()
-    if not reference_id:
-        return JsonResponse({'error': 'reference_id is required'}, status=400)
-
-    status_value = str(payload.get('status', 'CONFIRMED')).upper()
-    if status_value not in {'PENDING', 'CONFIRMED', 'FAILED'}:
-        return JsonResponse({'error': 'Invalid status value'}, status=400)
-
-    stellar_hash = str(payload.get('stellar_transaction_hash', '')).strip()
-    proof_hash = str(payload.get('proof_hash', '')).strip()
-    error_detail = str(payload.get('error_detail', '')).strip()
-
-    proof, _created = BlockchainProof.objects.get_or_create(
-        reference_id=reference_id,
-        defaults={
-            'stellar_transaction_hash': stellar_hash or f"pending-{reference_id}"[:100],
-            'proof_hash': proof_hash or f"pending-proof-{reference_id}"[:64],
-            'status': status_value,
-            'amount': float(payload.get('amount')) if payload.get('amount') is not None else None,
-            'currency': payload.get('currency', 'FCFA'),
-            'local_transaction_id': payload.get('local_transaction_id'),
-            'error_detail': error_detail,
-            'synced_at': timezone.now(),
-        }
-    )
+    max_events = getattr(settings, 'WEBHOOK_MAX_BATCH_SIZE', 1000)
+    if is_batch and not 1 <= len(events) <= max_events:
+        return None, False, JsonResponse({'error': f'A batch must contain between 1 and {max_events} events'}, status=400)
 
-    if not _created:
-        if stellar_hash:
-            proof.stellar_transaction_hash = stellar_hash
-        if proof_hash:
-            proof.proof_hash = proof_hash
-        if payload.get('amount') is not None:
-            proof.amount = float(payload.get('amount'))
-        if payload.get('currency'):
-            proof.currency = payload.get('currency')
-        if payload.get('local_transaction_id') is not None:
-            proof.local_transaction_id = payload.get('local_transaction_id')
+    return events, is_batch, None
 
-        proof.status = status_value
-        proof.error_detail = error_detail
-        proof.synced_at = timezone.now()
-        proof.save()
 
-    return JsonResponse({'success': True, 'reference_id': reference_id, 'status': status_value})
+def _webhook_batch_response(results):
+    return JsonResponse({'success': True, 'summary': summarize(results), 'results': results})
 
 
 @csrf_exempt
-def mobile_money_webhook(request):
-    if request.method != 'POST':
-        return JsonResponse({'error': 'Method not allowed'}, status=405)
-
-    expected_token = settings.MOBILE_MONEY_WEBHOOK_TOKEN.strip()
-    provided_token = request.headers.get('X-Webhook-Token', '').strip()
-    if expected_token and provided_token != expected_token:
-        return JsonResponse({'error': 'Unauthorized webhook'}, status=401)
-
-    try:
-        payload = json.loads(request.body.decode('utf-8'))
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
-
-    external_reference = str(payload.get('reference', '')).strip()
-    if not external_reference:
-        return JsonResponse({'error': 'reference is required'}, status=400)
-
-    status_value = str(payload.get('status', 'PENDING')).upper().strip()
-    if status_value not in {'PENDING', 'SUCCESS', 'FAILED'}:
-        return JsonResponse({'error': 'Invalid status value'}, status=400)
-
-    mm_transaction = MobileMoneyTransaction.objects.filter(external_reference=external_reference).first()
-    if not mm_transaction:
-        return JsonResponse({'error': 'Transaction not found'}, status=404)
-
-    with db_transaction.atomic():
-        mm_transaction = MobileMoneyTransaction.objects.select_for_update().get(id=mm_transaction.id)
-        account = Account.objects.select_for_update().get(id=mm_transaction.account_id)
-
-        previous_status = mm_transaction.status
-        mm_transaction.status = status_value
-        mm_transaction.operator_reference = str(payload.get('operator_reference', '')).strip()[:100]
-        mm_transaction.response_code = str(payload.get('code', '')).strip()[:30]
-        mm_transaction.response_message = sanitize_error_message(payload.get('message', ''))
-
-        if status_value in {'SUCCESS', 'FAILED'}:
-            mm_transaction.processed_at = timezone.now()
+def blockchain_webhook(request):
+    """Blockchain backend callback: one event, or a batch applied in one transaction."""
+    events, is_batch, error_response = _webhook_events(request, settings.BLOCKCHAIN_WEBHOOK_TOKEN.strip())
+    if error_response:
+        return error_response
+
+    results = ingest_blockchain_events(events)
+    if is_batch:
+        return _webhook_batch_response(results)
+
+    result = results[0]
+    if result['result'] == WEBHOOK_INVALID:
+        return JsonResponse({'error': result['error']}, status=400)
+    return JsonResponse({
+        'success': True,
+        'reference_id': result['reference_id'],
+        'status': str(events[0].get('status', 'CONFIRMED')).upper(),
+    })
 
-        if previous_status != 'SUCCESS' and status_value == 'SUCCESS':
-            if mm_transaction.direction == 'DEPOSIT':
-                account.balance += mm_transaction.amount
-                account.save(update_fields=['balance'])
-            elif mm_transaction.direction == 'WITHDRAW' and account.balance >= mm_transaction.amount:
-                account.balance -= mm_transaction.amount
-                account.save(update_fields=['balance'])
 
-        mm_transaction.save()
+@csrf_exempt
+def mobile_money_webhook(request):
+    """Operator callback: one event, or a batch applied in one transaction.
 
-    log_activity(
-        request,
-        action='MM_WEBHOOK',
-        status='SUCCESS',
-        user=mm_transaction.user,
-        detail=f'Mobile money webhook processed for ref {external_reference}'
-    )
+    Retries of an event already applied are acknowledged without effect.
+    """
+    events, is_batch, error_response = _webhook_events(request, settings.MOBILE_MONEY_WEBHOOK_TOKEN.strip())
+    if error_response:
+        return error_response
+
+    results = ingest_mobile_money_events(events)
+    if is_batch:
+        summary = summarize(results)
+        log_activity(
+            request,
+            action='MM_WEBHOOK',
+            status='SUCCESS',
+            detail=(f"Mobile money webhook batch: {summary.get('applied', 0)} applied, "
+                    f"{summary.get('duplicate', 0)} duplicate(s), {summary.get('not_found', 0)} not found, "
+                    f"{summary.get('invalid', 0)} invalid"),
+        )
+        return _webhook_batch_response(results)
+
+    result = results[0]
+    if result['result'] == WEBHOOK_INVALID:
+        return JsonResponse({'error': result['error']}, status=400)
+    if result['result'] == WEBHOOK_NOT_FOUND:
+        return JsonResponse({'error': result['error']}, status=404)
+
+    if result['result'] == WEBHOOK_APPLIED:
+        log_activity(
+            request,
+            action='MM_WEBHOOK',
+            status='SUCCESS',
+            user=User.objects.filter(user_id=result['user_id']).first(),
+            detail=f"Mobile money webhook processed for ref {result['reference']}"
+        )
 
-    return JsonResponse({'success': True, 'reference': external_reference, 'status': status_value})
+    return JsonResponse({
+        'success': True,
+        'reference': result['reference'],
+        'status': str(events[0].get('status', 'PENDING')).upper().strip(),
+    })
 
 
 # ──────────────────────────────────────────────
@@ -1276,6 +1235,7 @@ def order_nfc_card(request):
     nfc_card.status = 'ORDERED'
     nfc_card.ordered_at = timezone.now()
     nfc_card.save(update_fields=['status', 'ordered_at', 'updated_at'])
+    invalidate_dashboard(user.user_id)
 
     log_activity(request, action='NFC_ORDER', status='SUCCESS', user=user,
                  detail=f'Physical NFC card ordered (card {nfc_card.nfc_number})')
@@ -1301,6 +1261,7 @@ def unlink_nfc_card(request, nfc_id):
 
     nfc_number = nfc_card.nfc_number
     nfc_card.delete()
+    invalidate_dashboard(user_id)
 
     log_activity(request, action='NFC_UNLINK', status='SUCCESS',
                  user=User.objects.filter(user_id=user_id).first(),
@@ -1331,6 +1292,7 @@ def block_nfc_card(request, nfc_id):
 
     nfc_card.status = 'BLOCKED'
     nfc_card.save(update_fields=['status', 'updated_at'])
+    invalidate_dashboard(nfc_card.user_id)
 
     log_activity(request, action='NFC_BLOCK', status='SUCCESS',
                  user=nfc_card.user,
@@ -1384,13 +1346,20 @@ def nfc_payment(request):
         return JsonResponse({'error': 'Amount must be greater than zero'}, status=400)
 
     # ── Authenticate terminal ──
+    # Rejected keys are counted; past the limit, refuse before hashing anything.
+    throttle_keys = list(zip(nfc_limits(), (get_client_ip(request), terminal_id)))
+    if any_exceeded(throttle_keys):
+        return JsonResponse({'error': 'Too many failed authentication attempts'}, status=429)
+
     terminal_key = request.headers.get('X-Terminal-Key', '').strip()
     try:
         terminal = NFCTerminal.objects.get(terminal_id=terminal_id, is_active=True)
     except NFCTerminal.DoesNotExist:
+        hit_all(throttle_keys)
         return JsonResponse({'error': 'Unknown or inactive terminal'}, status=403)
 
-    if not check_password(terminal_key, terminal.api_key_hash):
+    if not verify_terminal_key(terminal, terminal_key):
+        hit_all(throttle_keys)
         return JsonResponse({'error': 'Invalid terminal credentials'}, status=403)
 
     # ── Locate NFC card ──
@@ -1408,12 +1377,15 @@ def nfc_payment(request):
 
     # ── Per-transaction limit ──
     if amount > nfc_card.per_transaction_limit:
-        tx = NFCPaymentTransaction.objects.create(
-            reference=reference, nfc_card=nfc_card, terminal=terminal,
-            user=user, account=account, amount=amount, currency=currency,
-            status='DECLINED', decline_reason='Per-transaction limit exceeded',
-            processed_at=timezone.now(),
-        )
+        with db_transaction.atomic():
+            NFCPaymentTransaction.objects.create(
+                reference=reference, nfc_card=nfc_card, terminal=terminal,
+                user=user, account=account, amount=amount, currency=currency,
+                status='DECLINED', decline_reason='Per-transaction limit exceeded',
+                processed_at=timezone.now(),
+            )
+            add_to_totals(user.user_id, operations=1)
+            invalidate_dashboard(user.user_id)
         log_activity(request, action='NFC_PAY', status='FAILED', user=user,
                      detail=f'NFC payment declined: per-tx limit (ref {reference})')
         return JsonResponse({
@@ -1421,30 +1393,26 @@ def nfc_payment(request):
             'status': 'DECLINED', 'reason': 'Per-transaction limit exceeded',
         }, status=200)
 
-    # ── Daily limit ──
-    from django.db.models import Sum
-    today = timezone.now().date()
-    spent_today = NFCPaymentTransaction.objects.filter(
-        nfc_card=nfc_card, status='SUCCESS', created_at__date=today,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    if spent_today + amount > nfc_card.daily_limit:
-        tx = NFCPaymentTransaction.objects.create(
-            reference=reference, nfc_card=nfc_card, terminal=terminal,
-            user=user, account=account, amount=amount, currency=currency,
-            status='DECLINED', decline_reason='Daily limit exceeded',
-            processed_at=timezone.now(),
-        )
-        log_activity(request, action='NFC_PAY', status='FAILED', user=user,
-                     detail=f'NFC payment declined: daily limit (ref {reference})')
-        return JsonResponse({
-            'success': False, 'reference': reference,
-            'status': 'DECLINED', 'reason': 'Daily limit exceeded',
-        }, status=200)
-
-    # ── Balance check & debit (atomic) ──
+    # ── Daily limit, balance check & debit (atomic) ──
     with db_transaction.atomic():
         account = Account.objects.select_for_update().get(number=account.number)
+        daily_spend = lock_daily_spend(nfc_card)
+
+        if daily_spend.amount + amount > nfc_card.daily_limit:
+            NFCPaymentTransaction.objects.create(
+                reference=reference, nfc_card=nfc_card, terminal=terminal,
+                user=user, account=account, amount=amount, currency=currency,
+                status='DECLINED', decline_reason='Daily limit exceeded',
+                processed_at=timezone.now(),
+            )
+            add_to_totals(user.user_id, operations=1)
+            invalidate_dashboard(user.user_id)
+            log_activity(request, action='NFC_PAY', status='FAILED', user=user,
+                         detail=f'NFC payment declined: daily limit (ref {reference})')
+            return JsonResponse({
+                'success': False, 'reference': reference,
+                'status': 'DECLINED', 'reason': 'Daily limit exceeded',
+            }, status=200)
 
         if account.balance < amount:
             NFCPaymentTransaction.objects.create(
@@ -1453,6 +1421,8 @@ def nfc_payment(request):
                 status='DECLINED', decline_reason='Insufficient balance',
                 processed_at=timezone.now(),
             )
+            add_to_totals(user.user_id, operations=1)
+            invalidate_dashboard(user.user_id)
             log_activity(request, action='NFC_PAY', status='FAILED', user=user,
                          detail=f'NFC payment declined: insufficient balance (ref {reference})')
             return JsonResponse({
@@ -1463,12 +1433,18 @@ def nfc_payment(request):
         # Debit account
         account.balance -= amount
         account.save(update_fields=['balance'])
+        ledger.post('NFC_PAYMENT', [
+            (account.number, -amount), (ledger.nfc_merchant_account(terminal.terminal_id), amount),
+        ], reference=reference)
+        record_daily_spend(daily_spend, amount)
 
         tx = NFCPaymentTransaction.objects.create(
             reference=reference, nfc_card=nfc_card, terminal=terminal,
             user=user, account=account, amount=amount, currency=currency,
             status='SUCCESS', processed_at=timezone.now(),
         )
+        add_to_totals(user.user_id, operations=1, total_nfc=amount)
+        invalidate_dashboard(user.user_id)
 
     log_activity(request, action='NFC_PAY', status='SUCCESS', user=user,
                  detail=f'NFC payment of {amount} {currency} at {terminal.merchant_name} (ref {reference})')
@@ -1477,8 +1453,8 @@ def nfc_payment(request):
         'success': True,
         'reference': reference,
         'status': 'SUCCESS',
-        'amount': float(amount),
+        'amount': money_json(amount),
         'currency': currency,
         'merchant': terminal.merchant_name,
-        'new_balance': float(account.balance),
+        'new_balance': money_json(account.balance),
     })
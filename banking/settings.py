@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import sys
 import dj_database_url
 from pathlib import Path
 
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Rift_pay.middleware.AuditFlushMiddleware',
 ]
 
 ROOT_URLCONF = 'banking.urls'
@@ -162,19 +164,69 @@ BLOCKCHAIN_API_KEY_HEADER = os.getenv('BLOCKCHAIN_API_KEY_HEADER', 'X-API-Key')
 BLOCKCHAIN_API_TIMEOUT = int(os.getenv('BLOCKCHAIN_API_TIMEOUT', '15'))
 BLOCKCHAIN_WEBHOOK_TOKEN = os.getenv('BLOCKCHAIN_WEBHOOK_TOKEN', 'dev-webhook-token')
 
+# Outbox worker (python manage.py run_blockchain_sync)
+BLOCKCHAIN_SYNC_BATCH_SIZE = int(os.getenv('BLOCKCHAIN_SYNC_BATCH_SIZE', '50'))
+BLOCKCHAIN_SYNC_MAX_IN_FLIGHT = int(os.getenv('BLOCKCHAIN_SYNC_MAX_IN_FLIGHT', '4'))
+BLOCKCHAIN_SYNC_MAX_ATTEMPTS = int(os.getenv('BLOCKCHAIN_SYNC_MAX_ATTEMPTS', '8'))
+BLOCKCHAIN_SYNC_BACKOFF_SECONDS = int(os.getenv('BLOCKCHAIN_SYNC_BACKOFF_SECONDS', '5'))
+BLOCKCHAIN_SYNC_BACKOFF_MAX_SECONDS = int(os.getenv('BLOCKCHAIN_SYNC_BACKOFF_MAX_SECONDS', '900'))
+BLOCKCHAIN_SYNC_LEASE_SECONDS = int(os.getenv('BLOCKCHAIN_SYNC_LEASE_SECONDS', '120'))
+
+# Outbound HTTP (blockchain + operator APIs): keep-alive pool per host, connect
+# timeout shared by every host (read timeouts are the *_API_TIMEOUT settings)
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+
+# Circuit breaker: consecutive failures that open the circuit, and seconds
+# before a half-open probe is allowed through
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+CIRCUIT_BREAKER_RESET_TIMEOUT = int(os.getenv('CIRCUIT_BREAKER_RESET_TIMEOUT', '30'))
+
 MOBILE_MONEY_MODE = os.getenv('MOBILE_MONEY_MODE', 'manual')
 MOBILE_MONEY_API_TIMEOUT = int(os.getenv('MOBILE_MONEY_API_TIMEOUT', '20'))
 MOBILE_MONEY_WEBHOOK_TOKEN = os.getenv('MOBILE_MONEY_WEBHOOK_TOKEN', 'dev-mm-webhook-token')
+# What process_mobile_money does while an operator's circuit is open:
+# 'reject' refuses the operation at once, 'queue' records it as PENDING for
+# later dispatch
+MOBILE_MONEY_CIRCUIT_OPEN_POLICY = os.getenv('MOBILE_MONEY_CIRCUIT_OPEN_POLICY', 'reject')
+
+# 'inline' calls the operator during the request; 'deferred' only records the
+# PENDING operation and leaves the call to run_mobile_money_dispatcher
+MOBILE_MONEY_DISPATCH_MODE = os.getenv('MOBILE_MONEY_DISPATCH_MODE', 'inline')
+MOBILE_MONEY_DISPATCH_BATCH_SIZE = int(os.getenv('MOBILE_MONEY_DISPATCH_BATCH_SIZE', '50'))
+MOBILE_MONEY_DISPATCH_MAX_IN_FLIGHT = int(os.getenv('MOBILE_MONEY_DISPATCH_MAX_IN_FLIGHT', '8'))
+MOBILE_MONEY_DISPATCH_LEASE_SECONDS = int(os.getenv('MOBILE_MONEY_DISPATCH_LEASE_SECONDS', '120'))
+
+# Blockchain and mobile money webhooks accept batches of at most this many events
+WEBHOOK_MAX_BATCH_SIZE = int(os.getenv('WEBHOOK_MAX_BATCH_SIZE', '1000'))
+
+# Reconciliation sweeper (python manage.py reconcile): rows PENDING for longer
+# than RECONCILE_STALE_SECONDS are retried, each row at most once per
+# RECONCILE_RETRY_SECONDS
+RECONCILE_STALE_SECONDS = int(os.getenv('RECONCILE_STALE_SECONDS', '900'))
+RECONCILE_RETRY_SECONDS = int(os.getenv('RECONCILE_RETRY_SECONDS', '600'))
+RECONCILE_CHUNK_SIZE = int(os.getenv('RECONCILE_CHUNK_SIZE', '200'))
+RECONCILE_MAX_IN_FLIGHT = int(os.getenv('RECONCILE_MAX_IN_FLIGHT', '8'))
+
+# Ledger balance snapshots (python manage.py snapshot_balances) stop this many
+# seconds in the past so in-flight transactions are not missed
+LEDGER_SNAPSHOT_LAG_SECONDS = int(os.getenv('LEDGER_SNAPSHOT_LAG_SECONDS', '60'))
+
+# Rows fetched per round trip (server-side cursor) when streaming statements
+STATEMENT_CHUNK_SIZE = int(os.getenv('STATEMENT_CHUNK_SIZE', '2000'))
 
 ORANGE_MONEY_BASE_URL = os.getenv('ORANGE_MONEY_BASE_URL', '')
 ORANGE_MONEY_TOKEN = os.getenv('ORANGE_MONEY_TOKEN', '')
 ORANGE_MONEY_COLLECTION_PATH = os.getenv('ORANGE_MONEY_COLLECTION_PATH', '/api/collections')
 ORANGE_MONEY_DISBURSEMENT_PATH = os.getenv('ORANGE_MONEY_DISBURSEMENT_PATH', '/api/disbursements')
+ORANGE_MONEY_STATUS_PATH = os.getenv('ORANGE_MONEY_STATUS_PATH', '/api/transactions/status')
 
 MTN_MONEY_BASE_URL = os.getenv('MTN_MONEY_BASE_URL', '')
 MTN_MONEY_TOKEN = os.getenv('MTN_MONEY_TOKEN', '')
 MTN_MONEY_COLLECTION_PATH = os.getenv('MTN_MONEY_COLLECTION_PATH', '/api/collections')
 MTN_MONEY_DISBURSEMENT_PATH = os.getenv('MTN_MONEY_DISBURSEMENT_PATH', '/api/disbursements')
+MTN_MONEY_STATUS_PATH = os.getenv('MTN_MONEY_STATUS_PATH', '/api/transactions/status')
 
 # ─── Production security (only when DEBUG = False) ───
 if not DEBUG:
@@ -195,8 +247,92 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL') or os.getenv('EMAIL_HOST_USER', 'noreply@riftpay.local')
 
+# Outbound email queue (python manage.py send_queued_mail)
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv('EMAIL_QUEUE_BATCH_SIZE', '50'))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('EMAIL_QUEUE_MAX_ATTEMPTS', '5'))
+EMAIL_QUEUE_BACKOFF_SECONDS = int(os.getenv('EMAIL_QUEUE_BACKOFF_SECONDS', '5'))
+EMAIL_QUEUE_BACKOFF_MAX_SECONDS = int(os.getenv('EMAIL_QUEUE_BACKOFF_MAX_SECONDS', '600'))
+EMAIL_QUEUE_LEASE_SECONDS = int(os.getenv('EMAIL_QUEUE_LEASE_SECONDS', '120'))
+# Sent and failed emails kept this long, then deleted by `send_queued_mail --purge`
+EMAIL_QUEUE_RETENTION_DAYS = int(os.getenv('EMAIL_QUEUE_RETENTION_DAYS', '7'))
+EMAIL_QUEUE_PURGE_CHUNK_SIZE = int(os.getenv('EMAIL_QUEUE_PURGE_CHUNK_SIZE', '1000'))
+
+# ─── Cache ──────────────────────────────────────────────────────────────────
+# Point REDIS_URL at a Redis instance so every gunicorn worker shares the same
+# cache (terminal credentials, invalidations, throttle counters); without it
+# each process keeps its own in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# How long a verified NFC terminal key is trusted before re-hashing (seconds)
+NFC_TERMINAL_AUTH_CACHE_TTL = int(os.getenv('NFC_TERMINAL_AUTH_CACHE_TTL', '300'))
+
+# Lifetime of the cached dashboard snapshot (seconds); balance-changing paths
+# also invalidate it on commit
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+
+# Recipient lookups (transfer form): shared-cache lifetime of hits and misses,
+# size and lifetime of the per-worker LRU, and autocomplete settings
+RECIPIENT_CACHE_TTL = int(os.getenv('RECIPIENT_CACHE_TTL', '300'))
+RECIPIENT_NEGATIVE_CACHE_TTL = int(os.getenv('RECIPIENT_NEGATIVE_CACHE_TTL', '30'))
+RECIPIENT_LRU_SIZE = int(os.getenv('RECIPIENT_LRU_SIZE', '1024'))
+RECIPIENT_LOCAL_TTL = int(os.getenv('RECIPIENT_LOCAL_TTL', '10'))
+RECIPIENT_SUGGEST_MIN_LENGTH = int(os.getenv('RECIPIENT_SUGGEST_MIN_LENGTH', '3'))
+RECIPIENT_SUGGEST_LIMIT = int(os.getenv('RECIPIENT_SUGGEST_LIMIT', '5'))
+
+# Maximum number of lines accepted by the bulk transfer (payroll) endpoint
+BULK_TRANSFER_MAX_LINES = int(os.getenv('BULK_TRANSFER_MAX_LINES', '1000'))
+
+# ─── Audit log (SystemActivity) ──────────────────────────────────────────────
+# 'buffered' batches events per worker and writes them with bulk_create;
+# 'sync' writes each event immediately (default under `manage.py test`).
+AUDIT_LOG_MODE = os.getenv('AUDIT_LOG_MODE', 'sync' if 'test' in sys.argv[1:2] else 'buffered')
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', '100'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '2'))
+
 # OTP validity duration in minutes
 OTP_EXPIRY_MINUTES = int(os.getenv('OTP_EXPIRY_MINUTES', '10'))
+# Expired OTP rows deleted per statement by `manage.py purge_otps`
+OTP_PURGE_CHUNK_SIZE = int(os.getenv('OTP_PURGE_CHUNK_SIZE', '1000'))
+
+# Attempt throttling, '<attempts>/<seconds>' over a sliding window ('0/60'
+# disables a limit). Counters live in the cache: set REDIS_URL so that every
+# worker shares them. NFC limits only count rejected terminal keys.
+THROTTLE_LOGIN_IP = os.getenv('THROTTLE_LOGIN_IP', '30/60')
+THROTTLE_LOGIN_EMAIL = os.getenv('THROTTLE_LOGIN_EMAIL', '10/300')
+THROTTLE_OTP_IP = os.getenv('THROTTLE_OTP_IP', '30/60')
+THROTTLE_OTP_EMAIL = os.getenv('THROTTLE_OTP_EMAIL', '5/300')
+THROTTLE_NFC_IP_FAILURES = os.getenv('THROTTLE_NFC_IP_FAILURES', '20/60')
+THROTTLE_NFC_TERMINAL_FAILURES = os.getenv('THROTTLE_NFC_TERMINAL_FAILURES', '10/60')
+THROTTLE_SUGGEST_USER = os.getenv('THROTTLE_SUGGEST_USER', '30/60')
+THROTTLE_SUGGEST_IP = os.getenv('THROTTLE_SUGGEST_IP', '60/60')
+
+# Account, card and NFC numbers (services/numbers.py). Each process reserves
+# NUMBER_BLOCK_SIZE values at a time from the PostgreSQL sequences. The key decides
+# which number every counter value maps to: set it explicitly in production and
+# never change it once numbers have been issued (it defaults to SECRET_KEY).
+NUMBER_BLOCK_SIZE = int(os.getenv('NUMBER_BLOCK_SIZE', '100'))
+NUMBER_PERMUTATION_KEY = os.getenv('NUMBER_PERMUTATION_KEY', SECRET_KEY)
+
+# Webhook events remembered for idempotency (must outlast operator retries),
+# then deleted by `manage.py purge_webhook_events`
+WEBHOOK_EVENT_RETENTION_DAYS = int(os.getenv('WEBHOOK_EVENT_RETENTION_DAYS', '30'))
+WEBHOOK_EVENT_PURGE_CHUNK_SIZE = int(os.getenv('WEBHOOK_EVENT_PURGE_CHUNK_SIZE', '1000'))
+
+# Rows per transaction in `manage.py import_users`
+USER_IMPORT_CHUNK_SIZE = int(os.getenv('USER_IMPORT_CHUNK_SIZE', '500'))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file